@@ -1,5 +1,12 @@
 from django.contrib import admin
-from .models import Category, Transaction, Budget, SpendingPattern, UserPreferences, Notification
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+from .models import (
+    Category, Transaction, TransactionSource, Budget, SpendingPattern, UserPreferences, Notification, NotificationCounter,
+    NotificationArchive, ImportJob, IdempotencyKey, RequestProfile, SlowQuery
+)
 
 
 @admin.register(Category)
@@ -9,8 +16,16 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ['name', 'description']
 
 
+class TransactionSourceInline(admin.StackedInline):
+    model = TransactionSource
+    fields = ['kind', 'text', 'blocks', 'created_at']
+    readonly_fields = ['created_at']
+    extra = 0
+
+
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
+    inlines = [TransactionSourceInline]
     list_display = ['user', 'category', 'amount', 'transaction_date', 'created_at']
     list_filter = ['transaction_date', 'category', 'created_at']
     search_fields = ['user__username', 'description']
@@ -46,3 +61,112 @@ class NotificationAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
     readonly_fields = ['created_at', 'read_at']
 
+
+@admin.register(NotificationCounter)
+class NotificationCounterAdmin(admin.ModelAdmin):
+    list_display = ['user', 'unread_count', 'version', 'updated_at']
+    search_fields = ['user__username']
+    readonly_fields = ['unread_count', 'version', 'updated_at']
+
+
+@admin.register(NotificationArchive)
+class NotificationArchiveAdmin(admin.ModelAdmin):
+    list_display = ['user_id', 'type', 'title', 'is_read', 'created_at', 'archived_at']
+    list_filter = ['type', 'is_read']
+    search_fields = ['title', 'message']
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ['user', 'file_name', 'file_format', 'status', 'processed_rows', 'created_count', 'created_at']
+    list_filter = ['status', 'file_format', 'created_at']
+    search_fields = ['user__username', 'file_name']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ['user', 'endpoint', 'key', 'response_status', 'created_at', 'expires_at']
+    list_filter = ['endpoint', 'response_status']
+    search_fields = ['user__username', 'key']
+    readonly_fields = ['request_hash', 'response_body', 'created_at', 'expires_at']
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'method', 'path', 'user', 'status_code', 'duration_ms', 'query_count',
+                    'sql_time_ms', 'trigger', 'download_link']
+    list_filter = ['trigger', 'method', 'status_code', 'created_at']
+    search_fields = ['path', 'user__username']
+    exclude = ['profile_data', 'queries']
+    readonly_fields = ['user', 'trigger', 'method', 'path', 'query_string', 'status_code', 'duration_ms',
+                       'query_count', 'sql_time_ms', 'created_at', 'download_link', 'stats_text', 'sql_queries']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download_view),
+                 name='finance_requestprofile_download'),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        """Tải file .prof (định dạng pstats: snakeviz, flameprof, python -m pstats)"""
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        response = HttpResponse(bytes(profile.profile_data), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="profile-{profile.pk}.prof"'
+        return response
+
+    @admin.display(description='File .prof')
+    def download_link(self, obj):
+        return format_html('<a href="{}">Tải về</a>', reverse('admin:finance_requestprofile_download', args=[obj.pk]))
+
+    @admin.display(description='SQL (kèm EXPLAIN)')
+    def sql_queries(self, obj):
+        return format_html_join(
+            '',
+            '<div style="margin-bottom:12px"><b>{} ms</b><pre style="white-space:pre-wrap">{}</pre>'
+            '<pre style="white-space:pre-wrap;color:#555">{}</pre><pre style="color:#264">{}</pre></div>',
+            ((query['time_ms'], query['sql'], ', '.join(query['params']), query['explain']) for query in obj.queries)
+        )
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ['short_sql', 'calls', 'avg_time', 'max_time_ms', 'total_time_ms', 'endpoint_list', 'last_seen']
+    list_filter = ['last_seen']
+    search_fields = ['normalized_sql', 'fingerprint']
+    exclude = ['plan', 'sample_sql']
+    readonly_fields = ['fingerprint', 'normalized_sql', 'sample_sql_block', 'sample_params', 'plan_block',
+                       'plan_captured_at', 'endpoints', 'calls', 'total_time_ms', 'max_time_ms',
+                       'first_seen', 'last_seen']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='SQL')
+    def short_sql(self, obj):
+        return obj.normalized_sql[:120]
+
+    @admin.display(description='TB (ms)')
+    def avg_time(self, obj):
+        return f'{obj.avg_time_ms:.1f}'
+
+    @admin.display(description='Endpoints')
+    def endpoint_list(self, obj):
+        return ', '.join(obj.endpoints)
+
+    @admin.display(description='SQL mẫu (chậm nhất)')
+    def sample_sql_block(self, obj):
+        return format_html('<pre style="white-space:pre-wrap">{}</pre>', obj.sample_sql)
+
+    @admin.display(description='Kế hoạch thực thi')
+    def plan_block(self, obj):
+        return format_html('<pre style="white-space:pre-wrap">{}</pre>', obj.plan)
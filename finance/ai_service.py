@@ -4,27 +4,67 @@ AI Service for trend analysis, predictions, and anomaly detection
 from datetime import datetime, timedelta
 from decimal import Decimal
 from typing import Dict, List, Optional
-from django.db.models import Sum, Avg, Count, Q
+from django.db.models import Avg, Count, Q
 from django.contrib.auth.models import User
+from .category_registry import category_registry
+from .instrumentation import timed
 from .models import Transaction, Category, SpendingPattern
 
 
 class AIService:
     """Service để phân tích AI cho hệ thống tài chính"""
     
+    # Các cột cần cho mọi phân tích, lấy bằng một query duy nhất
+    WINDOW_FIELDS = [
+        'id', 'amount', 'transaction_date', 'description', 'type', 'category_id',
+        'category__name', 'category__icon', 'category__color',
+    ]
+    
     @staticmethod
-    def analyze_spending_trends(user: User, days: int = 30) -> Dict:
+    @timed('ai.load_window')
+    def load_window(user: User, start_date, end_date) -> List[Dict]:
+        """
+        Lấy tất cả giao dịch trong khoảng thời gian (một query, kèm thông tin category)
+        Kết quả có thể dùng chung cho nhiều phân tích (xem dashboard)
+        """
+        return list(
+            Transaction.objects.filter(
+                user=user,
+                transaction_date__gte=start_date,
+                transaction_date__lte=end_date
+            ).order_by('-transaction_date', '-created_at').values(*AIService.WINDOW_FIELDS)
+        )
+    
+    @staticmethod
+    def _window(user: User, start_date, end_date, rows: Optional[List[Dict]] = None,
+                category_type: Optional[str] = None) -> List[Dict]:
+        """Lọc các dòng trong khoảng thời gian (nạp từ DB nếu chưa có rows dùng chung)"""
+        if rows is None:
+            rows = AIService.load_window(user, start_date, end_date)
+        return [
+            row for row in rows
+            if start_date <= row['transaction_date'] <= end_date
+            and (category_type is None or row['type'] == category_type)
+        ]
+    
+    @staticmethod
+    def _sum(rows: List[Dict], category_type: Optional[str] = None) -> Decimal:
+        return sum(
+            (row['amount'] for row in rows if category_type is None or row['type'] == category_type),
+            Decimal('0')
+        )
+    
+    @staticmethod
+    @timed('ai.analyze_spending_trends')
+    def analyze_spending_trends(user: User, days: int = 30, rows: Optional[List[Dict]] = None) -> Dict:
         """
         Phân tích xu hướng chi tiêu
+        rows: giao dịch đã nạp sẵn (AIService.load_window) bao trùm khoảng thời gian
         """
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days)
         
-        transactions = Transaction.objects.filter(
-            user=user,
-            transaction_date__gte=start_date,
-            transaction_date__lte=end_date
-        )
+        transactions = AIService._window(user, start_date, end_date, rows)
         
         # Tính toán theo tuần
         weekly_data = []
@@ -33,18 +73,13 @@ class AIService:
             week_start = current_date
             week_end = min(current_date + timedelta(days=6), end_date)
             
-            week_transactions = transactions.filter(
-                transaction_date__gte=week_start,
-                transaction_date__lte=week_end
-            )
+            week_transactions = [
+                row for row in transactions
+                if week_start <= row['transaction_date'] <= week_end
+            ]
             
-            total_expense = week_transactions.filter(
-                category__type='expense'
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            
-            total_income = week_transactions.filter(
-                category__type='income'
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+            total_expense = AIService._sum(week_transactions, 'expense')
+            total_income = AIService._sum(week_transactions, 'income')
             
             weekly_data.append({
                 'week': week_start.strftime('%Y-%m-%d'),
@@ -77,7 +112,8 @@ class AIService:
         }
     
     @staticmethod
-    def predict_next_month_spending(user: User) -> Dict:
+    @timed('ai.predict_next_month_spending')
+    def predict_next_month_spending(user: User, rows: Optional[List[Dict]] = None) -> Dict:
         """
         Dự đoán chi tiêu tháng tiếp theo
         """
@@ -85,12 +121,7 @@ class AIService:
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=90)
         
-        transactions = Transaction.objects.filter(
-            user=user,
-            transaction_date__gte=start_date,
-            transaction_date__lte=end_date,
-            category__type='expense'
-        )
+        transactions = AIService._window(user, start_date, end_date, rows, 'expense')
         
         # Tính trung bình theo tháng
         monthly_totals = []
@@ -102,10 +133,10 @@ class AIService:
             else:
                 month_end = datetime(month_start.year, month_start.month + 1, 1).date() - timedelta(days=1)
             
-            month_total = transactions.filter(
-                transaction_date__gte=month_start,
-                transaction_date__lte=min(month_end, end_date)
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+            month_total = AIService._sum([
+                row for row in transactions
+                if month_start <= row['transaction_date'] <= min(month_end, end_date)
+            ])
             
             monthly_totals.append(float(month_total))
             current_date = month_end + timedelta(days=1)
@@ -122,22 +153,18 @@ class AIService:
         }
     
     @staticmethod
-    def detect_anomalies(user: User, days: int = 30) -> List[Dict]:
+    @timed('ai.detect_anomalies')
+    def detect_anomalies(user: User, days: int = 30, rows: Optional[List[Dict]] = None) -> List[Dict]:
         """
         Phát hiện bất thường trong chi tiêu
         """
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days)
         
-        transactions = Transaction.objects.filter(
-            user=user,
-            transaction_date__gte=start_date,
-            transaction_date__lte=end_date,
-            category__type='expense'
-        )
+        transactions = AIService._window(user, start_date, end_date, rows, 'expense')
         
         # Tính trung bình và độ lệch chuẩn
-        amounts = [float(t.amount) for t in transactions]
+        amounts = [float(t['amount']) for t in transactions]
         if not amounts:
             return []
         
@@ -150,22 +177,23 @@ class AIService:
         anomalies = []
         
         for transaction in transactions:
-            if float(transaction.amount) > threshold:
+            if float(transaction['amount']) > threshold:
                 anomalies.append({
-                    'id': transaction.id,
-                    'amount': float(transaction.amount),
-                    'category': transaction.category.name if transaction.category else 'Unknown',
-                    'category_icon': transaction.category.icon if transaction.category else '💰',
-                    'date': transaction.transaction_date.strftime('%d/%m/%Y'),
-                    'description': transaction.description or 'Không có mô tả',
-                    'deviation': round((float(transaction.amount) - mean) / std_dev, 2) if std_dev > 0 else 0,
+                    'id': transaction['id'],
+                    'amount': float(transaction['amount']),
+                    'category': transaction['category__name'] or 'Unknown',
+                    'category_icon': transaction['category__icon'] if transaction['category_id'] else '💰',
+                    'date': transaction['transaction_date'].strftime('%d/%m/%Y'),
+                    'description': transaction['description'] or 'Không có mô tả',
+                    'deviation': round((float(transaction['amount']) - mean) / std_dev, 2) if std_dev > 0 else 0,
                     'avg_amount': round(mean, 2),  # Số tiền trung bình để so sánh
                 })
         
         return sorted(anomalies, key=lambda x: x['amount'], reverse=True)
     
     @staticmethod
-    def suggest_savings_plan(user: User) -> Dict:
+    @timed('ai.suggest_savings_plan')
+    def suggest_savings_plan(user: User, rows: Optional[List[Dict]] = None) -> Dict:
         """
         Gợi ý kế hoạch tiết kiệm chi tiết và cụ thể
         """
@@ -173,29 +201,28 @@ class AIService:
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=30)
         
-        transactions = Transaction.objects.filter(
-            user=user,
-            transaction_date__gte=start_date,
-            transaction_date__lte=end_date,
-            category__type='expense'
-        )
+        window = AIService._window(user, start_date, end_date, rows)
+        transactions = [row for row in window if row['type'] == 'expense']
         
         # Lấy tổng thu nhập
-        income_transactions = Transaction.objects.filter(
-            user=user,
-            transaction_date__gte=start_date,
-            transaction_date__lte=end_date,
-            category__type='income'
-        )
-        total_income = income_transactions.aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        
-        category_totals = transactions.values('category__name', 'category__id').annotate(
-            total=Sum('amount'),
-            count=Count('id'),
-            avg_amount=Avg('amount')
-        ).order_by('-total')
+        total_income = AIService._sum(window, 'income')
+        
+        # Tổng hợp theo danh mục
+        grouped = {}
+        for row in transactions:
+            item = grouped.setdefault(row['category_id'], {
+                'category__name': row['category__name'],
+                'category__id': row['category_id'],
+                'total': Decimal('0'),
+                'count': 0,
+            })
+            item['total'] += row['amount']
+            item['count'] += 1
+        for item in grouped.values():
+            item['avg_amount'] = item['total'] / item['count']
+        category_totals = sorted(grouped.values(), key=lambda x: x['total'], reverse=True)
         
-        total_expense = transactions.aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        total_expense = AIService._sum(transactions)
         
         # Lấy budgets để so sánh
         from .models import Budget
@@ -358,6 +385,7 @@ class AIService:
         }
     
     @staticmethod
+    @timed('ai.update_spending_patterns')
     def update_spending_patterns(user: User):
         """
         Cập nhật mẫu chi tiêu cho phân tích
@@ -369,7 +397,7 @@ class AIService:
             user=user,
             transaction_date__gte=start_date,
             transaction_date__lte=end_date,
-            category__type='expense'
+            type='expense'
         )
         
         # Tính toán mẫu cho mỗi category
@@ -380,7 +408,7 @@ class AIService:
         
         for stat in category_stats:
             if stat['category']:
-                category = Category.objects.get(id=stat['category'])
+                category = category_registry.get(stat['category']) or Category.objects.get(id=stat['category'])
                 last_transaction = transactions.filter(
                     category=category
                 ).order_by('-transaction_date').first()
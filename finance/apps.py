@@ -5,3 +5,11 @@ class FinanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'finance'
 
+    def ready(self):
+        from django.conf import settings
+        from . import signals  # noqa: F401
+        from . import slow_queries  # noqa: F401
+        if getattr(settings, 'OCR_PRELOAD', False):
+            from .ocr_service import OCRService
+            OCRService.warm_up()
+
@@ -0,0 +1,77 @@
+"""
+Async views cho các phân tích AI: chạy các phân tích độc lập song song
+(phục vụ tốt nhất qua ASGI - mysite/asgi.py, vẫn chạy được dưới WSGI)
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import JsonResponse
+
+from .ai_service import AIService
+from .authentication import authenticate_request
+from .instrumentation import track_queries
+
+
+# Pool giới hạn số luồng (và số kết nối database) dùng cho phân tích AI
+_analysis_pool = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'AI_ANALYSIS_WORKERS', 4),
+    thread_name_prefix='ai-analysis'
+)
+
+
+def _run_with_connection_cleanup(func, *args, **kwargs):
+    """Chạy một phân tích trong luồng của pool, đóng kết nối DB khi xong"""
+    close_old_connections()
+    try:
+        with track_queries():
+            return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def _run_analysis(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # Chép context để các span đo trong luồng của pool vẫn gắn với request
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _analysis_pool,
+        lambda: context.run(_run_with_connection_cleanup, func, *args, **kwargs)
+    )
+
+
+async def ai_insights(request):
+    """
+    Tất cả phân tích AI trong một request: xu hướng, dự đoán, bất thường, gợi ý tiết kiệm
+    Các phân tích chạy song song nên thời gian phản hồi ~ phân tích chậm nhất
+    Query params:
+    - days: số ngày cho xu hướng và bất thường (mặc định 30)
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+    user = await sync_to_async(authenticate_request)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        return JsonResponse({'error': 'days phải là số nguyên'}, status=400)
+
+    trends, predictions, anomalies, savings = await asyncio.gather(
+        _run_analysis(AIService.analyze_spending_trends, user, days),
+        _run_analysis(AIService.predict_next_month_spending, user),
+        _run_analysis(AIService.detect_anomalies, user, days),
+        _run_analysis(AIService.suggest_savings_plan, user),
+    )
+
+    return JsonResponse({
+        'trends': trends,
+        'predictions': predictions,
+        'anomalies': anomalies,
+        'savings': savings,
+    }, json_dumps_params={'ensure_ascii': False})
@@ -0,0 +1,209 @@
+"""
+Token authentication có cache: token -> user được nhớ trong process (LRU + TTL)
+và trong cache dùng chung (settings.CACHES), bỏ query token JOIN user ở mỗi request
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import List
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+
+DEFAULT_TOKEN_AUTH_CACHE = {
+    'LOCAL_SIZE': 1024,
+    'LOCAL_TTL': 60,
+    'SHARED_TTL': 300,
+    'CACHE_ALIAS': 'default',
+}
+
+
+class TokenCache:
+    """
+    Cache hai tầng cho token -> các field của user
+    Lưu giá trị field thay vì model instance để mỗi request nhận một User mới
+    (tránh dùng chung các related object đã cache giữa các request)
+    Không lưu hash mật khẩu: User lấy từ cache có mật khẩu không dùng được, cần kiểm tra
+    / đổi mật khẩu thì lấy lại user từ database
+    """
+
+    def __init__(self):
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0}
+
+    @property
+    def config(self):
+        return {**DEFAULT_TOKEN_AUTH_CACHE, **getattr(settings, 'TOKEN_AUTH_CACHE', {})}
+
+    @property
+    def shared(self):
+        """
+        Cache dùng chung giữa các process, None nếu CACHES[CACHE_ALIAS] chỉ nằm trong process
+        (LocMemCache / DummyCache): bản sao riêng ở mỗi worker không bị xóa khi worker khác
+        thu hồi token nên không được dùng làm tầng chung
+        """
+        cache = caches[self.config['CACHE_ALIAS']]
+        if isinstance(cache, (LocMemCache, DummyCache)):
+            return None
+        return cache
+
+    @staticmethod
+    def shared_key(key: str) -> str:
+        """Không dùng token gốc làm key của cache dùng chung"""
+        return 'auth:token:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get(self, key: str):
+        """Trả về User (instance mới) hoặc None nếu không có trong cache"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                values, expires = entry
+                if expires > now:
+                    self._local.move_to_end(key)
+                    self.stats['local_hits'] += 1
+                    return self._build_user(values)
+                del self._local[key]
+
+        shared = self.shared
+        values = shared.get(self.shared_key(key)) if shared is not None else None
+        if values is not None:
+            self._count('shared_hits')
+            self._set_local(key, values)
+            return self._build_user(values)
+
+        self._count('misses')
+        return None
+
+    def set(self, key: str, user):
+        values = {field.attname: getattr(user, field.attname) for field in user._meta.concrete_fields
+                  if field.attname != 'password'}
+        self._set_local(key, values)
+        shared = self.shared
+        if shared is not None:
+            shared.set(self.shared_key(key), values, self.config['SHARED_TTL'])
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._local.pop(key, None)
+            self.stats['invalidations'] += 1
+        shared = self.shared
+        if shared is not None:
+            shared.delete(self.shared_key(key))
+
+    def invalidate_remote(self, event):
+        """
+        Sự kiện 'user_tokens' từ process khác (không query DB): {'user_id': ..., 'keys': [shared_key...]}
+        Xóa khỏi LRU cục bộ mọi token của user và các token trong keys, rồi xóa các key đó
+        khỏi tầng dùng chung (nếu process gửi chưa xóa, vd. token chỉ còn trong tầng chung)
+        """
+        if not isinstance(event, dict):
+            # Định dạng cũ (chỉ user_id) trong lúc deploy
+            event = {'user_id': event}
+        user_id = event.get('user_id')
+        hashed = set(event.get('keys') or [])
+        with self._lock:
+            for key in [key for key, (values, _) in self._local.items()
+                        if values.get('id') == user_id or self.shared_key(key) in hashed]:
+                hashed.add(self.shared_key(key))
+                del self._local[key]
+                self.stats['invalidations'] += 1
+        shared = self.shared
+        if shared is not None and hashed:
+            shared.delete_many(list(hashed))
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def _set_local(self, key, values):
+        config = self.config
+        with self._lock:
+            self._local[key] = (values, time.monotonic() + config['LOCAL_TTL'])
+            self._local.move_to_end(key)
+            while len(self._local) > config['LOCAL_SIZE']:
+                self._local.popitem(last=False)
+
+    @staticmethod
+    def _build_user(values):
+        User = get_user_model()
+        values = {**values, 'password': make_password(None)}
+        # from_db gán giá trị theo thứ tự field của model
+        names = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+        return User.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+token_cache = TokenCache()
+
+
+def invalidate_user_tokens(user_id: int) -> List[str]:
+    """
+    Xóa cache của mọi token thuộc user (đổi mật khẩu, khóa tài khoản...)
+    Trả về shared_key của các token để gửi cho process khác
+    """
+    from rest_framework.authtoken.models import Token
+    keys = list(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+    for key in keys:
+        token_cache.invalidate(key)
+    return [TokenCache.shared_key(key) for key in keys]
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Giống TokenAuthentication của DRF nhưng tra token qua token_cache trước,
+    chỉ query database khi cache miss
+    """
+
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        if user is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            user = token.user
+            if user.is_active:
+                token_cache.set(key, user)
+        else:
+            # Token dựng lại từ cache (không query), request.auth vẫn là một Token
+            token = self.get_model().from_db(DEFAULT_DB_ALIAS, ['key', 'user_id'], [key, user.pk])
+            token.user = user
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (user, token)
+
+
+def authenticate_request(request):
+    """
+    Xác thực HttpRequest bằng các authentication classes của DRF (Token, Session...)
+    ngoài APIView (async view, middleware). Trả về user hoặc None
+    """
+    drf_request = Request(
+        request,
+        authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    try:
+        user = drf_request.user
+    except exceptions.APIException:
+        return None
+    return user if user and user.is_authenticated else None
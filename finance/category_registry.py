@@ -0,0 +1,94 @@
+"""
+Registry danh mục trong process: nạp bảng Category một lần, tra cứu bằng dict,
+làm mới khi Category thay đổi (signals trong finance/signals.py)
+"""
+import threading
+import unicodedata
+from types import MappingProxyType
+from typing import Optional
+
+from .metrics import CACHE_REQUESTS
+from .models import Category
+
+
+def normalize_name(name: str) -> str:
+    """Chuẩn hóa tên để so khớp: bỏ dấu, viết thường, gộp khoảng trắng ('Ăn  uống' -> 'an uong')"""
+    text = unicodedata.normalize('NFD', (name or '').replace('đ', 'd').replace('Đ', 'D'))
+    text = ''.join(ch for ch in text if unicodedata.category(ch) != 'Mn')
+    return ' '.join(text.lower().split())
+
+
+class CategorySnapshot:
+    """
+    Ảnh chụp bất biến của bảng Category tại một version
+    Các Category instance được dùng chung giữa các request: chỉ đọc, không sửa
+    """
+
+    def __init__(self, version: int, categories):
+        from .serializers import CategorySerializer
+
+        self.version = version
+        self.categories = tuple(categories)
+        self.by_id = MappingProxyType({c.id: c for c in self.categories})
+        self.by_name = MappingProxyType({c.name: c for c in self.categories})
+        self.by_normalized = MappingProxyType({normalize_name(c.name): c for c in self.categories})
+        self.data = tuple(dict(item) for item in CategorySerializer(self.categories, many=True).data)
+        self._json = None
+
+    @property
+    def json(self) -> bytes:
+        """Danh sách categories đã render JSON (tính một lần cho mỗi version)"""
+        if self._json is None:
+            from .renderers import FastJSONRenderer
+            self._json = FastJSONRenderer().render(list(self.data))
+        return self._json
+
+
+class CategoryRegistry:
+    """Giữ snapshot hiện tại, nạp lại lần đầu được dùng sau khi bị invalidate"""
+
+    def __init__(self):
+        self._snapshot = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> CategorySnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            CACHE_REQUESTS.inc(cache='categories', result='hit')
+            return snapshot
+        CACHE_REQUESTS.inc(cache='categories', result='miss')
+        with self._lock:
+            if self._snapshot is None:
+                version = self._version
+                loaded = CategorySnapshot(version, Category.objects.all())
+                # Không lưu nếu đã bị invalidate trong lúc đang nạp
+                if version == self._version:
+                    self._snapshot = loaded
+                return loaded
+            return self._snapshot
+
+    def invalidate(self):
+        self._version += 1
+        self._snapshot = None
+
+    def get(self, category_id) -> Optional[Category]:
+        try:
+            return self.snapshot().by_id.get(int(category_id))
+        except (TypeError, ValueError):
+            return None
+
+    def get_by_name(self, name: str) -> Optional[Category]:
+        """Tra theo tên chính xác (giống Category.objects.filter(name=...))"""
+        if not name:
+            return None
+        return self.snapshot().by_name.get(name)
+
+    def get_by_normalized_name(self, name: str) -> Optional[Category]:
+        """Tra theo tên đã chuẩn hóa: không phân biệt hoa thường, dấu, khoảng trắng thừa"""
+        if not name:
+            return None
+        return self.snapshot().by_normalized.get(normalize_name(name))
+
+
+category_registry = CategoryRegistry()
@@ -0,0 +1,139 @@
+"""
+Dashboard Service: tính tất cả widgets của dashboard trong một request,
+dùng chung một lần quét giao dịch cho mọi phân tích
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List
+
+from django.contrib.auth.models import User
+
+from .ai_service import AIService
+from .instrumentation import timed
+from .models import Transaction
+from .notification_service import get_unread_count
+from .read_serializers import ValuesReader
+from .serializers import TransactionSerializer
+
+
+class DashboardService:
+    """Service để lập kế hoạch và tính các widgets của dashboard"""
+
+    # Widget -> số ngày giao dịch cần nạp (0 = không cần cửa sổ giao dịch)
+    WIDGETS = {
+        'summary': 30,
+        'by_category': 30,
+        'by_date': 30,
+        'recent_transactions': 0,
+        'trends': 30,
+        'predictions': 90,
+        'anomalies': 30,
+        'savings': 30,
+        'unread_notifications': 0,
+    }
+
+    # Dùng khi người dùng chưa chọn widgets trong UserPreferences
+    DEFAULT_WIDGETS = ['summary', 'by_category', 'by_date', 'recent_transactions']
+
+    RECENT_LIMIT = 5
+
+    @staticmethod
+    def resolve_widgets(requested, preferences) -> List[str]:
+        """Danh sách widgets cần tính: tham số request > preferences > mặc định"""
+        for widgets in (requested, preferences.dashboard_widgets if preferences else None):
+            # Bỏ widget không hợp lệ, giữ thứ tự, bỏ trùng; không còn widget nào thì dùng nguồn tiếp theo
+            widgets = [w for w in dict.fromkeys(widgets or []) if w in DashboardService.WIDGETS]
+            if widgets:
+                return widgets
+        return list(DashboardService.DEFAULT_WIDGETS)
+
+    @staticmethod
+    def summarize(rows: List[Dict]) -> Dict:
+        """Thống kê tổng, theo danh mục và theo ngày (giống /transactions/statistics/)"""
+        total_income = Decimal('0')
+        total_expense = Decimal('0')
+        by_category = {}
+        by_date = {}
+        for row in rows:
+            amount = row['amount']
+            category_type = row['type']
+            if category_type == 'income':
+                total_income += amount
+            elif category_type == 'expense':
+                total_expense += amount
+
+            item = by_category.setdefault(row['category_id'], {
+                'category__name': row['category__name'],
+                'category__type': category_type,
+                'category__icon': row['category__icon'],
+                'category__color': row['category__color'],
+                'total': Decimal('0'),
+                'count': 0,
+            })
+            item['total'] += amount
+            item['count'] += 1
+
+            day = by_date.setdefault(row['transaction_date'], {'income': Decimal('0'), 'expense': Decimal('0')})
+            if category_type in day:
+                day[category_type] += amount
+
+        return {
+            'summary': {
+                'total_income': float(total_income),
+                'total_expense': float(total_expense),
+                'balance': float(total_income - total_expense),
+            },
+            'by_category': sorted(by_category.values(), key=lambda x: x['total'], reverse=True),
+            'by_date': [
+                {
+                    'date': day.strftime('%Y-%m-%d'),
+                    'income': float(values['income']),
+                    'expense': float(values['expense']),
+                }
+                for day, values in sorted(by_date.items())
+            ],
+        }
+
+    @staticmethod
+    @timed('dashboard.build')
+    def build(user: User, widgets: List[str]) -> Dict:
+        """
+        Tính dữ liệu cho các widgets:
+        1. Xác định cửa sổ thời gian lớn nhất cần dùng
+        2. Nạp giao dịch trong cửa sổ đó bằng một query
+        3. Mỗi widget tính từ các dòng đã nạp
+        """
+        window_days = max([DashboardService.WIDGETS[w] for w in widgets] or [0])
+        end_date = datetime.now().date()
+        rows = AIService.load_window(user, end_date - timedelta(days=window_days), end_date) if window_days else []
+
+        data = {}
+        if {'summary', 'by_category', 'by_date'} & set(widgets):
+            stats_start = end_date - timedelta(days=30)
+            stats = DashboardService.summarize([r for r in rows if r['transaction_date'] >= stats_start])
+            for key in ('summary', 'by_category', 'by_date'):
+                if key in widgets:
+                    data[key] = stats[key]
+
+        if 'recent_transactions' in widgets:
+            recent = Transaction.objects.filter(user=user)[:DashboardService.RECENT_LIMIT]
+            data['recent_transactions'] = ValuesReader(TransactionSerializer).read(recent)
+        if 'trends' in widgets:
+            data['trends'] = AIService.analyze_spending_trends(user, 30, rows=rows)
+        if 'predictions' in widgets:
+            data['predictions'] = AIService.predict_next_month_spending(user, rows=rows)
+        if 'anomalies' in widgets:
+            data['anomalies'] = AIService.detect_anomalies(user, 30, rows=rows)
+        if 'savings' in widgets:
+            data['savings'] = AIService.suggest_savings_plan(user, rows=rows)
+        if 'unread_notifications' in widgets:
+            data['unread_notifications'] = get_unread_count(user)
+
+        return {
+            'widgets': widgets,
+            'period': {
+                'start_date': (end_date - timedelta(days=30)).strftime('%Y-%m-%d'),
+                'end_date': end_date.strftime('%Y-%m-%d'),
+            },
+            'data': data,
+        }
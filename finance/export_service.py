@@ -0,0 +1,145 @@
+"""
+Export Service để xuất giao dịch dạng stream (CSV, NDJSON, XLSX)
+"""
+import csv
+import json
+import tempfile
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+
+class _EchoBuffer:
+    """File-like object trả lại giá trị được ghi, dùng cho csv.writer"""
+    def write(self, value):
+        return value
+
+
+class ExportService:
+    """Service để xuất giao dịch mà không nạp toàn bộ dữ liệu vào bộ nhớ"""
+    
+    # (field trong values_list, tên cột khi xuất)
+    COLUMNS = [
+        ('id', 'id'),
+        ('transaction_date', 'date'),
+        ('amount', 'amount'),
+        ('category__name', 'category'),
+        ('type', 'type'),
+        ('description', 'description'),
+        ('created_at', 'created_at'),
+    ]
+    
+    # format -> (content type, phần mở rộng)
+    FORMATS = {
+        'csv': ('text/csv; charset=utf-8', 'csv'),
+        'ndjson': ('application/x-ndjson; charset=utf-8', 'ndjson'),
+        'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    }
+    
+    CHUNK_SIZE = 2000  # Số dòng mỗi lần fetch từ database
+    ROWS_PER_WRITE = 500  # Số dòng gộp lại trước khi đẩy ra response
+    
+    @staticmethod
+    def iter_rows(queryset, chunk_size: int = CHUNK_SIZE) -> Iterator[tuple]:
+        """Duyệt giao dịch theo từng chunk, chỉ lấy các cột cần xuất"""
+        fields = [field for field, _ in ExportService.COLUMNS]
+        return (
+            queryset.order_by('-transaction_date', '-id')
+            .values_list(*fields)
+            .iterator(chunk_size=chunk_size)
+        )
+    
+    @staticmethod
+    def iter_csv(rows: Iterable[tuple]) -> Iterator[str]:
+        """Sinh nội dung CSV (có BOM để Excel đọc đúng tiếng Việt)"""
+        writer = csv.writer(_EchoBuffer())
+        buffer = ['\ufeff' + writer.writerow([name for _, name in ExportService.COLUMNS])]
+        for row in rows:
+            buffer.append(writer.writerow([
+                value.isoformat() if hasattr(value, 'isoformat') else value
+                for value in row
+            ]))
+            if len(buffer) >= ExportService.ROWS_PER_WRITE:
+                yield ''.join(buffer)
+                buffer = []
+        if buffer:
+            yield ''.join(buffer)
+    
+    @staticmethod
+    def iter_ndjson(rows: Iterable[tuple]) -> Iterator[str]:
+        """Sinh nội dung NDJSON, mỗi giao dịch một dòng JSON"""
+        names = [name for _, name in ExportService.COLUMNS]
+        buffer = []
+        for row in rows:
+            buffer.append(json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+            if len(buffer) >= ExportService.ROWS_PER_WRITE:
+                yield ''.join(buffer)
+                buffer = []
+        if buffer:
+            yield ''.join(buffer)
+    
+    @staticmethod
+    def write_xlsx(rows: Iterable[tuple], fileobj):
+        """
+        Ghi XLSX bằng openpyxl ở chế độ write-only (các dòng được ghi ra đĩa,
+        không giữ trong bộ nhớ)
+        """
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise ImportError('Xuất XLSX cần cài openpyxl: pip install openpyxl')
+        
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Transactions')
+        sheet.append([name for _, name in ExportService.COLUMNS])
+        for row in rows:
+            # openpyxl không hỗ trợ datetime có timezone
+            sheet.append([
+                timezone.localtime(value).replace(tzinfo=None)
+                if isinstance(value, datetime) and timezone.is_aware(value) else value
+                for value in row
+            ])
+        workbook.save(fileobj)
+    
+    @staticmethod
+    def iter_xlsx(rows: Iterable[tuple], block_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Ghi XLSX vào file tạm rồi stream ra theo từng block"""
+        with tempfile.TemporaryFile() as tmp:
+            ExportService.write_xlsx(rows, tmp)
+            tmp.seek(0)
+            while True:
+                block = tmp.read(block_size)
+                if not block:
+                    break
+                yield block
+    
+    @staticmethod
+    def iter_export(queryset, file_format: str, chunk_size: int = CHUNK_SIZE) -> Iterator:
+        """Sinh nội dung file export theo định dạng"""
+        rows = ExportService.iter_rows(queryset, chunk_size)
+        if file_format == 'ndjson':
+            return ExportService.iter_ndjson(rows)
+        if file_format == 'xlsx':
+            return ExportService.iter_xlsx(rows)
+        return ExportService.iter_csv(rows)
+    
+    @staticmethod
+    def stream_response(queryset, file_format: str) -> StreamingHttpResponse:
+        """Tạo StreamingHttpResponse cho file export"""
+        if file_format == 'xlsx':
+            # Kiểm tra sớm để trả lỗi trước khi bắt đầu stream
+            import importlib.util
+            if importlib.util.find_spec('openpyxl') is None:
+                raise ImportError('Xuất XLSX cần cài openpyxl: pip install openpyxl')
+        
+        content_type, extension = ExportService.FORMATS[file_format]
+        response = StreamingHttpResponse(
+            ExportService.iter_export(queryset, file_format),
+            content_type=content_type
+        )
+        filename = f'transactions_{timezone.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
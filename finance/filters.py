@@ -0,0 +1,26 @@
+"""
+Bộ lọc dùng chung cho danh sách giao dịch (API, export, ...)
+"""
+
+
+def filter_transactions(queryset, params):
+    """
+    Áp dụng các bộ lọc của TransactionViewSet lên queryset
+    params: dict-like (request.query_params hoặc options của management command)
+    - category: ID danh mục
+    - start_date, end_date: YYYY-MM-DD
+    """
+    # Filter theo category
+    category_id = params.get('category', None)
+    if category_id:
+        queryset = queryset.filter(category_id=category_id)
+    
+    # Filter theo khoảng thời gian
+    start_date = params.get('start_date', None)
+    end_date = params.get('end_date', None)
+    if start_date:
+        queryset = queryset.filter(transaction_date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(transaction_date__lte=end_date)
+    
+    return queryset
@@ -0,0 +1,185 @@
+"""
+Hỗ trợ header Idempotency-Key cho các endpoint tạo dữ liệu (mobile app tự gửi lại khi mạng chập chờn)
+
+- Request đầu tiên với một key: giữ chỗ trong bảng IdempotencyKey, chạy view, lưu response
+- Gửi lại cùng key: trả lại response đã lưu, không chạy lại view
+- Request trùng đang chạy song song: 409 (client thử lại sau)
+- Cùng key nhưng nội dung request khác: 422
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, transaction as db_transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+from .renderers import FastJSONRenderer
+
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+DEFAULT_IDEMPOTENCY = {
+    'TTL_HOURS': 24,
+    'LOCK_TIMEOUT': 300,
+}
+
+
+def get_config() -> dict:
+    return {**DEFAULT_IDEMPOTENCY, **getattr(settings, 'IDEMPOTENCY', {})}
+
+
+def _fingerprint_value(value):
+    """File upload được hash theo nội dung"""
+    if not isinstance(value, UploadedFile):
+        return value
+    file_hash = hashlib.sha256()
+    for chunk in value.chunks():
+        file_hash.update(chunk)
+    value.seek(0)
+    return f'file:{file_hash.hexdigest()}'
+
+
+def request_fingerprint(request, endpoint: str) -> str:
+    """Hash của endpoint + nội dung request"""
+    data = request.data
+    if hasattr(data, 'items'):
+        data = {name: _fingerprint_value(value) for name, value in data.items()}
+    payload = json.dumps([endpoint, data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _in_progress() -> Response:
+    return Response(
+        {'error': 'Request với Idempotency-Key này đang được xử lý'},
+        status=status.HTTP_409_CONFLICT,
+        headers={'Retry-After': '1'}
+    )
+
+
+def _replay(record) -> HttpResponse:
+    response = HttpResponse(record.response_body, status=record.response_status, content_type='application/json')
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def acquire(user, key: str, endpoint: str, fingerprint: str):
+    """
+    Giữ chỗ cho key. Trả về (record, None) nếu request này được xử lý,
+    hoặc (None, response) nếu phải trả về ngay (replay, 409, 422)
+    """
+    config = get_config()
+    now = timezone.now()
+    expires_at = now + timedelta(hours=config['TTL_HOURS'])
+    try:
+        with db_transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                user=user, key=key, endpoint=endpoint, request_hash=fingerprint,
+                created_at=now, expires_at=expires_at
+            )
+        return record, None
+    except IntegrityError:
+        pass
+
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if record is None:
+        # Bản ghi vừa bị xóa (request trước lỗi): để client thử lại
+        return None, _in_progress()
+
+    stale = record.response_status is None and record.created_at <= now - timedelta(seconds=config['LOCK_TIMEOUT'])
+    if record.expires_at <= now or stale:
+        # Key hết hạn, hoặc request trước bị bỏ dở: chiếm lại bằng update có điều kiện
+        taken = IdempotencyKey.objects.filter(
+            pk=record.pk, created_at=record.created_at, response_status=record.response_status
+        ).update(
+            endpoint=endpoint, request_hash=fingerprint, response_status=None, response_body='',
+            created_at=now, expires_at=expires_at
+        )
+        if taken:
+            record.endpoint, record.request_hash = endpoint, fingerprint
+            record.response_status, record.response_body = None, ''
+            record.created_at, record.expires_at = now, expires_at
+            return record, None
+        return None, _in_progress()
+
+    if record.endpoint != endpoint or record.request_hash != fingerprint:
+        return None, Response(
+            {'error': 'Idempotency-Key đã được dùng cho một request khác'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if record.response_status is None:
+        return None, _in_progress()
+    return None, _replay(record)
+
+
+def complete(record, response):
+    """Lưu response (đã render JSON) để trả lại cho các lần gửi lại"""
+    IdempotencyKey.objects.filter(pk=record.pk).update(
+        response_status=response.status_code,
+        response_body=FastJSONRenderer().render(response.data).decode('utf-8'),
+    )
+
+
+def release(record):
+    """Request lỗi (5xx / exception): bỏ giữ chỗ để client có thể thử lại"""
+    IdempotencyKey.objects.filter(pk=record.pk, response_status__isnull=True).delete()
+
+
+def purge_expired(batch_size: int = 1000):
+    """Xóa các key đã hết hạn theo từng batch. Trả về số dòng đã xóa"""
+    deleted = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+
+
+def idempotent(endpoint: str):
+    """
+    Decorator cho method của ViewSet: áp dụng Idempotency-Key nếu request có header này
+    Response 2xx/4xx (kể cả APIException như ValidationError) được lưu lại; 5xx và exception khác không được lưu
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return view_method(self, request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {'error': f'{HEADER} tối đa {MAX_KEY_LENGTH} ký tự'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            record, early_response = acquire(request.user, key, endpoint, request_fingerprint(request, endpoint))
+            if early_response is not None:
+                return early_response
+
+            try:
+                try:
+                    response = view_method(self, request, *args, **kwargs)
+                except APIException as exc:
+                    # ValidationError, NotFound...: chuyển thành response 4xx như DRF để lưu lại
+                    response = self.handle_exception(exc)
+            except Exception:
+                release(record)
+                raise
+
+            if response.status_code >= 500 or getattr(response, 'data', None) is None:
+                release(record)
+            else:
+                complete(record, response)
+            return response
+        return wrapper
+    return decorator
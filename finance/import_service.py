@@ -0,0 +1,333 @@
+"""
+Import Service để nhập giao dịch hàng loạt từ file CSV / sao kê OFX
+"""
+import csv
+import hashlib
+import io
+import re
+import time
+from datetime import datetime, date
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from django.db import transaction as db_transaction, close_old_connections
+from django.utils import timezone
+
+from .category_registry import category_registry
+from .metrics import IMPORT_JOB_DURATION, IMPORT_JOBS_RUNNING, registry as metrics_registry
+from .models import Category, Transaction, ImportJob
+from .nlp_service import NLPService
+
+
+class ImportService:
+    """Service để import giao dịch: parse theo stream, chống trùng bằng hash, ghi bằng bulk_create"""
+
+    CHUNK_SIZE = 5000  # Số dòng mỗi transaction database
+    BULK_BATCH_SIZE = 1000  # Số dòng mỗi câu INSERT
+    MAX_STORED_ERRORS = 50  # Số lỗi tối đa lưu trong ImportJob
+
+    # Tên cột được chấp nhận trong file CSV (không phân biệt hoa thường)
+    CSV_COLUMNS = {
+        'date': ['date', 'ngày', 'ngay', 'transaction_date', 'ngày giao dịch'],
+        'amount': ['amount', 'số tiền', 'so tien', 'sotien'],
+        'description': ['description', 'mô tả', 'mo ta', 'nội dung', 'noi dung', 'diễn giải'],
+        'category': ['category', 'danh mục', 'danh muc'],
+        'type': ['type', 'loại', 'loai'],
+    }
+
+    DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d', '%d/%m/%y', '%Y%m%d']
+
+    # ---------- Parse ----------
+
+    @staticmethod
+    def parse_amount(value) -> Optional[Decimal]:
+        """Parse số tiền dạng 50000, 50.000, 1,234,567, -50.000đ, 1.234,50"""
+        if value is None:
+            return None
+        text = re.sub(r'[^\d,.\-]', '', str(value))
+        if not text or text in ('-', '.', ','):
+            return None
+
+        if '.' in text and ',' in text:
+            # Dấu xuất hiện sau cùng là dấu thập phân
+            if text.rfind(',') > text.rfind('.'):
+                text = text.replace('.', '').replace(',', '.')
+            else:
+                text = text.replace(',', '')
+        elif ',' in text:
+            parts = text.split(',')
+            text = text.replace(',', '.') if len(parts) == 2 and len(parts[1]) <= 2 else text.replace(',', '')
+        elif '.' in text:
+            parts = text.split('.')
+            if not (len(parts) == 2 and len(parts[1]) <= 2):
+                text = text.replace('.', '')
+
+        try:
+            return Decimal(text)
+        except InvalidOperation:
+            return None
+
+    @staticmethod
+    def parse_date(value) -> Optional[date]:
+        """Parse ngày theo các định dạng phổ biến"""
+        if not value:
+            return None
+        value = str(value).strip()[:10]
+        for fmt in ImportService.DATE_FORMATS:
+            try:
+                return datetime.strptime(value, fmt).date()
+            except ValueError:
+                continue
+        return None
+
+    @staticmethod
+    def iter_csv_rows(fileobj) -> Iterator[Dict]:
+        """Đọc CSV theo stream, trả về dict chuẩn hóa cho từng dòng"""
+        text_stream = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+        reader = csv.DictReader(text_stream)
+
+        # Ánh xạ header của file sang tên chuẩn
+        header_map = {}
+        for header in reader.fieldnames or []:
+            key = header.strip().lower()
+            for name, aliases in ImportService.CSV_COLUMNS.items():
+                if key in aliases:
+                    header_map[header] = name
+
+        for row in reader:
+            yield {header_map[k]: v for k, v in row.items() if k in header_map}
+
+    @staticmethod
+    def iter_ofx_rows(fileobj) -> Iterator[Dict]:
+        """
+        Đọc sao kê OFX (SGML hoặc XML) theo stream, mỗi khối <STMTTRN> là một giao dịch
+        """
+        tag_re = re.compile(r'<(\w+)>([^<\r\n]*)')
+        current = None
+        for raw_line in io.TextIOWrapper(fileobj, encoding='utf-8', errors='replace'):
+            for tag, value in tag_re.findall(raw_line):
+                tag = tag.upper()
+                if tag == 'STMTTRN':
+                    current = {}
+                elif current is not None and value.strip():
+                    current[tag] = value.strip()
+            if current is not None and '</STMTTRN>' in raw_line.upper():
+                yield {
+                    'date': current.get('DTPOSTED', '')[:8],
+                    'amount': current.get('TRNAMT'),
+                    'description': current.get('NAME') or current.get('MEMO', ''),
+                    'external_id': current.get('FITID'),
+                }
+                current = None
+
+    # ---------- Category ----------
+
+    @staticmethod
+    def map_categories(rows: List[Dict], categories: Dict[str, Category]) -> None:
+        """
+        Gán category cho cả chunk một lần:
+        - Dùng cột category nếu có, không thì phân tích mô tả bằng NLPService
+        - Mỗi mô tả chỉ phân tích một lần, mỗi category mới chỉ tạo một lần
+        categories: cache {tên viết thường: Category}, được cập nhật tại chỗ
+        """
+        nlp_cache = {}
+        for row in rows:
+            name = (row.get('category') or '').strip()
+            nlp_type = None
+            if not name and row['description']:
+                key = row['description'].lower()
+                if key not in nlp_cache:
+                    info = NLPService.extract_transaction_info(row['description'])
+                    nlp_cache[key] = (info['category'], info['type'])
+                name, nlp_type = nlp_cache[key]
+                name = name or ''
+
+            category = None
+            if name:
+                category = categories.get(name.lower())
+                if category is None:
+                    category_type = row.get('type') or nlp_type or 'expense'
+                    category = NLPService.get_or_create_category(name, category_type)
+                    categories[name.lower()] = category
+            row['category_obj'] = category
+
+    # ---------- Import ----------
+
+    @staticmethod
+    def compute_hash(user_id: int, row: Dict, occurrence: int = 0) -> str:
+        """Hash nhận diện giao dịch để chống trùng khi import lại cùng một file"""
+        if row.get('external_id'):
+            key = f"{user_id}|id|{row['external_id']}"
+        else:
+            key = f"{user_id}|{row['date'].isoformat()}|{row['amount']}|{row['description'].strip().lower()}|{occurrence}"
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def normalize_row(raw: Dict) -> Dict:
+        """Chuẩn hóa một dòng thô; raise ValueError nếu không hợp lệ"""
+        amount = ImportService.parse_amount(raw.get('amount'))
+        if amount is None or amount == 0:
+            raise ValueError(f"Số tiền không hợp lệ: {raw.get('amount')!r}")
+        transaction_date = ImportService.parse_date(raw.get('date'))
+        if transaction_date is None:
+            raise ValueError(f"Ngày không hợp lệ: {raw.get('date')!r}")
+
+        row_type = (raw.get('type') or '').strip().lower()
+        if row_type in ('thu', 'income', 'credit'):
+            row_type = 'income'
+        elif row_type in ('chi', 'expense', 'debit'):
+            row_type = 'expense'
+        else:
+            # Sao kê ngân hàng: số âm là chi, còn lại xác định theo danh mục
+            row_type = 'expense' if amount < 0 else None
+
+        return {
+            'date': transaction_date,
+            'amount': abs(amount).quantize(Decimal('0.01')),
+            'description': (raw.get('description') or '').strip(),
+            'category': raw.get('category'),
+            'type': row_type,
+            'external_id': raw.get('external_id'),
+        }
+
+    @staticmethod
+    def _write_chunk(user, rows: List[Dict], occurrences: Dict) -> int:
+        """
+        Chống trùng rồi ghi một chunk trong một transaction. Trả về số dòng đã tạo
+        occurrences: số lần đã gặp mỗi dòng giống hệt nhau, dùng chung cho mọi chunk của một file
+        """
+        for row in rows:
+            base = (row['date'], row['amount'], row['description'].lower(), row.get('external_id'))
+            occurrences[base] = occurrences.get(base, -1) + 1
+            row['hash'] = ImportService.compute_hash(user.id, row, occurrences[base])
+
+        with db_transaction.atomic():
+            existing = set(
+                Transaction.objects.filter(
+                    user=user,
+                    import_hash__in=[row['hash'] for row in rows]
+                ).values_list('import_hash', flat=True)
+            )
+            new_rows = [row for row in rows if row['hash'] not in existing]
+            Transaction.objects.bulk_create(
+                [
+                    Transaction(
+                        user=user,
+                        category=row['category_obj'],
+                        # bulk_create không gọi save(): tự gán type như Transaction.save
+                        type=row['category_obj'].type if row['category_obj'] else (row['type'] or 'expense'),
+                        amount=row['amount'],
+                        description=row['description'],
+                        transaction_date=row['date'],
+                        import_hash=row['hash'],
+                    )
+                    for row in new_rows
+                ],
+                batch_size=ImportService.BULK_BATCH_SIZE
+            )
+        return len(new_rows)
+
+    @staticmethod
+    def import_rows(user, raw_rows: Iterable[Dict], progress=None, chunk_size: int = CHUNK_SIZE) -> Dict:
+        """
+        Import các dòng thô theo từng chunk
+        progress: callable(stats) được gọi sau mỗi chunk
+        """
+        stats = {
+            'processed_rows': 0,
+            'created_count': 0,
+            'duplicate_count': 0,
+            'error_count': 0,
+            'errors': [],
+        }
+        categories = {c.name.lower(): c for c in category_registry.snapshot().categories}
+        # Các dòng giống hệt nhau ở khác chunk vẫn phải có hash khác nhau
+        occurrences = {}
+
+        def flush(chunk):
+            ImportService.map_categories(chunk, categories)
+            created = ImportService._write_chunk(user, chunk, occurrences)
+            stats['created_count'] += created
+            stats['duplicate_count'] += len(chunk) - created
+            if progress:
+                progress(stats)
+
+        chunk = []
+        for line_no, raw in enumerate(raw_rows, start=1):
+            stats['processed_rows'] += 1
+            try:
+                chunk.append(ImportService.normalize_row(raw))
+            except ValueError as e:
+                stats['error_count'] += 1
+                if len(stats['errors']) < ImportService.MAX_STORED_ERRORS:
+                    stats['errors'].append({'row': line_no, 'error': str(e)})
+
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+
+        if chunk:
+            flush(chunk)
+        elif progress:
+            progress(stats)
+        return stats
+
+    @staticmethod
+    def iter_file_rows(fileobj, file_format: str) -> Iterator[Dict]:
+        """Chọn parser theo định dạng file"""
+        if file_format == 'ofx':
+            return ImportService.iter_ofx_rows(fileobj)
+        return ImportService.iter_csv_rows(fileobj)
+
+    @staticmethod
+    def run_job(job_id: int):
+        """Chạy một ImportJob (gọi trong thread nền hoặc từ management command)"""
+        from .ai_service import AIService
+
+        job = ImportJob.objects.select_related('user').get(pk=job_id)
+        ImportJob.objects.filter(pk=job.pk).update(status='running', started_at=timezone.now())
+
+        def save_progress(stats):
+            ImportJob.objects.filter(pk=job.pk).update(
+                processed_rows=stats['processed_rows'],
+                created_count=stats['created_count'],
+                duplicate_count=stats['duplicate_count'],
+                error_count=stats['error_count'],
+                errors=stats['errors'],
+            )
+
+        started = time.perf_counter()
+        status = 'failed'
+        IMPORT_JOBS_RUNNING.inc()
+        try:
+            with job.file.open('rb') as f:
+                ImportService.import_rows(
+                    job.user,
+                    ImportService.iter_file_rows(f, job.file_format),
+                    progress=save_progress
+                )
+            # File gốc không cần giữ lại sau khi import xong
+            job.file.delete(save=False)
+            ImportJob.objects.filter(pk=job.pk).update(
+                status='completed',
+                finished_at=timezone.now(),
+                file=''
+            )
+            status = 'completed'
+
+            # Chỉ cập nhật spending patterns một lần cho cả file
+            try:
+                AIService.update_spending_patterns(job.user)
+            except Exception:
+                pass
+        except Exception as e:
+            ImportJob.objects.filter(pk=job.pk).update(
+                status='failed',
+                finished_at=timezone.now(),
+                errors=[{'row': None, 'error': str(e)}]
+            )
+        finally:
+            IMPORT_JOBS_RUNNING.dec()
+            IMPORT_JOB_DURATION.observe(time.perf_counter() - started, status=status)
+            metrics_registry.maybe_flush()
+            close_old_connections()
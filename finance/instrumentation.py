@@ -0,0 +1,146 @@
+"""
+Đo thời gian theo request: số query, thời gian SQL, render và các span có tên
+(ocr.readtext, nlp.extract, ai.detect_anomalies...)
+
+Chỉ request được lấy mẫu (ServerTimingMiddleware) mới có RequestTimer; ngoài request đó
+span() / timed() chỉ tốn một lần đọc contextvar (trừ span có observer của finance/metrics.py)
+"""
+import contextvars
+import functools
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+
+_current_timer = contextvars.ContextVar('finance_request_timer', default=None)
+
+# Tên span -> hàm nhận thời gian (giây), được gọi ở mọi lần chạy span (finance/metrics.py)
+_span_observers = {}
+
+
+class RequestTimer:
+    """Số liệu đo được của một request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.sql_time = 0.0
+        # tên span -> [tổng thời gian (giây), số lần]
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, elapsed: float):
+        with self._lock:
+            span = self.spans.setdefault(name, [0.0, 0])
+            span[0] += elapsed
+            span[1] += 1
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        """connection.execute_wrapper: đếm query và cộng dồn thời gian SQL"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.query_count += 1
+                self.sql_time += elapsed
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+
+def observe_span(name: str, observer):
+    """Đăng ký hàm nhận thời gian của span, kể cả khi request không được lấy mẫu"""
+    _span_observers[name] = observer
+
+
+def _record(timer, name: str, elapsed: float):
+    if timer is not None:
+        timer.add_span(name, elapsed)
+    observer = _span_observers.get(name)
+    if observer is not None:
+        observer(elapsed)
+
+
+def get_current_timer():
+    return _current_timer.get()
+
+
+def activate(timer: RequestTimer):
+    """Gắn timer vào context hiện tại, trả về token để deactivate"""
+    return _current_timer.set(timer)
+
+
+def deactivate(token):
+    _current_timer.reset(token)
+
+
+@contextmanager
+def track_queries():
+    """
+    Đếm query của luồng hiện tại vào timer đang hoạt động
+    (kết nối DB gắn theo luồng: luồng của thread pool cũng phải gọi)
+    """
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timer.sql_wrapper))
+        yield
+
+
+@contextmanager
+def span(name: str):
+    """Đo một đoạn code: with span('ai.build'): ..."""
+    timer = _current_timer.get()
+    if timer is None and name not in _span_observers:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(timer, name, time.perf_counter() - started)
+
+
+def timed(name: str):
+    """Decorator đo thời gian của một hàm (đặt dưới @staticmethod)"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timer = _current_timer.get()
+            if timer is None and name not in _span_observers:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _record(timer, name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def explain(connection, sql: str, params=None, analyze: bool = False) -> str:
+    """
+    Kế hoạch thực thi của một câu SELECT (EXPLAIN trên Postgres, EXPLAIN QUERY PLAN trên SQLite)
+    analyze=True: EXPLAIN (ANALYZE, BUFFERS) trên Postgres - câu SQL được chạy lại để đo thật
+    Câu không phải SELECT trả về ''
+    """
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return ''
+    # WITH có thể chứa INSERT/UPDATE/DELETE: chỉ ANALYZE câu SELECT thuần
+    analyze = analyze and connection.vendor == 'postgresql' and sql.lstrip().upper().startswith('SELECT')
+    options = {'analyze': True, 'buffers': True} if analyze else {}
+    prefix = connection.ops.explain_query_prefix(**options)
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}', params)
+        rows = cursor.fetchall()
+    if connection.vendor == 'sqlite':
+        return '\n'.join(str(row[-1]) for row in rows)
+    return '\n'.join(' | '.join(str(value) for value in row) for row in rows)
@@ -0,0 +1,180 @@
+"""
+Bus làm mới cache giữa các process qua Postgres LISTEN/NOTIFY
+
+- publish(kind, key): gửi sự kiện bằng pg_notify trong transaction hiện tại
+  (Postgres chỉ phát khi commit, rollback thì sự kiện bị hủy)
+- Mỗi worker chạy một luồng listener với kết nối riêng, nhận sự kiện từ các process khác
+  và gọi các handler đã đăng ký để xóa bản cache cục bộ
+- Database không phải Postgres (SQLite khi dev/test): bus không làm gì
+"""
+import json
+import logging
+import os
+import select
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_CACHE_INVALIDATION = {
+    'ENABLED': True,
+    'CHANNEL': 'finance_cache_invalidation',
+    'DATABASE': 'default',
+    'POLL_INTERVAL': 5,  # Giây chờ tối đa mỗi vòng listen (để kiểm tra yêu cầu dừng)
+    'RECONNECT_DELAY': 2,
+}
+
+# kind -> danh sách handler(key)
+_handlers: Dict[str, List[Callable]] = {}
+_listener = None
+_listener_lock = threading.Lock()
+
+# Định danh process hiện tại, để listener bỏ qua sự kiện do chính process này gửi
+ORIGIN = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+
+def get_config() -> dict:
+    return {**DEFAULT_CACHE_INVALIDATION, **getattr(settings, 'CACHE_INVALIDATION', {})}
+
+
+def is_available() -> bool:
+    config = get_config()
+    return config['ENABLED'] and connections[config['DATABASE']].vendor == 'postgresql'
+
+
+def register(kind: str, handler: Callable):
+    """Đăng ký hàm xóa cache cục bộ cho một loại sự kiện"""
+    _handlers.setdefault(kind, []).append(handler)
+
+
+def dispatch(kind: str, key=None):
+    """Gọi các handler của kind (lỗi của một handler không chặn các handler khác)"""
+    for handler in _handlers.get(kind, []):
+        try:
+            handler(key)
+        except Exception:
+            logger.exception('Lỗi khi xử lý sự kiện làm mới cache %s', kind)
+
+
+def publish(kind: str, key=None):
+    """
+    Báo cho các process khác xóa cache (process hiện tại tự xóa trước khi gọi)
+    key phải serialize được sang JSON
+    """
+    if not is_available():
+        return
+    config = get_config()
+    payload = json.dumps({'origin': ORIGIN, 'kind': kind, 'key': key, 'ts': time.time()})
+    with connections[config['DATABASE']].cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [config['CHANNEL'], payload])
+
+
+class InvalidationListener(threading.Thread):
+    """Luồng nền LISTEN trên kênh của bus, tự kết nối lại khi mất kết nối"""
+
+    def __init__(self, on_event: Callable = None):
+        super().__init__(name='cache-invalidation-listener', daemon=True)
+        self.config = get_config()
+        self.on_event = on_event
+        self.ready = threading.Event()
+        self._stop_event = threading.Event()
+        self.stats = {'received': 0, 'ignored_own': 0, 'reconnects': 0}
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            raw = None
+            try:
+                raw = self._connect()
+                self.ready.set()
+                self._listen(raw)
+            except Exception:
+                logger.exception('Listener làm mới cache mất kết nối, thử lại sau')
+                self.stats['reconnects'] += 1
+                self._stop_event.wait(self.config['RECONNECT_DELAY'])
+            finally:
+                if raw is not None:
+                    try:
+                        raw.close()
+                    except Exception:
+                        pass
+
+    def _connect(self):
+        """Kết nối DB-API riêng (không dùng chung với kết nối của request)"""
+        wrapper = connections[self.config['DATABASE']]
+        raw = wrapper.get_new_connection(wrapper.get_connection_params())
+        raw.autocommit = True
+        with raw.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.config["CHANNEL"]}"')
+        return raw
+
+    def _listen(self, raw):
+        timeout = self.config['POLL_INTERVAL']
+        if hasattr(raw, 'poll'):
+            # psycopg2
+            while not self._stop_event.is_set():
+                if select.select([raw], [], [], timeout)[0]:
+                    raw.poll()
+                    while raw.notifies:
+                        self._handle(raw.notifies.pop(0).payload)
+        else:
+            # psycopg 3
+            while not self._stop_event.is_set():
+                for notify in raw.notifies(timeout=timeout):
+                    self._handle(notify.payload)
+
+    def _handle(self, payload: str):
+        received_at = time.time()
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        if event.get('origin') == ORIGIN:
+            self.stats['ignored_own'] += 1
+            return
+        self.stats['received'] += 1
+        dispatch(event.get('kind'), event.get('key'))
+        if self.on_event:
+            self.on_event(event, received_at)
+
+
+def start_listener() -> bool:
+    """Khởi động listener cho process hiện tại (gọi nhiều lần không sao)"""
+    global _listener
+    if _listener is not None and _listener.is_alive():
+        return True
+    if not is_available():
+        return False
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = InvalidationListener()
+            _listener.start()
+    return True
+
+
+def wait_listener_ready(timeout: float) -> bool:
+    """Chờ listener của process hiện tại kết nối xong (False nếu chưa khởi động / quá thời gian)"""
+    listener = _listener
+    return listener is not None and listener.ready.wait(timeout)
+
+
+def _reset_after_fork():
+    """Process con (gunicorn --preload, multiprocessing) không kế thừa luồng listener"""
+    global _listener, ORIGIN, _listener_lock
+    ORIGIN = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+    _listener_lock = threading.Lock()
+    if _listener is not None:
+        _listener = None
+        start_listener()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
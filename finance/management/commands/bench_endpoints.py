@@ -0,0 +1,338 @@
+"""
+Management command benchmark hồi quy cho mọi route trong finance/urls.py:
+số query của mỗi endpoint không được vượt ngân sách, độ trễ p50 so với file baseline
+"""
+import json
+import os
+import platform
+import statistics
+import time
+from collections import namedtuple
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import URLResolver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from finance import urls as finance_urls
+from finance.instrumentation import RequestTimer, activate, deactivate, track_queries
+from finance.models import Budget, Category, ImportJob, Notification, Transaction
+
+
+# path / body có thể là hàm nhận context (id của dữ liệu benchmark)
+# auth: 'user' (user benchmark), 'staff', 'none'
+Case = namedtuple('Case', 'name url_name method path body max_queries auth', defaults=('user',))
+
+# Ngân sách số query của mỗi case; không phụ thuộc số giao dịch của user (tăng theo dữ liệu = N+1)
+CASES = [
+    Case('api_root', 'api-root', 'GET', '/api/', None, 0),
+    Case('register', 'register', 'POST', '/api/auth/register/', lambda ctx: {
+        'username': f'{ctx["prefix"]}_reg_{ctx.next_id()}', 'password': 'bench-Pass-123',
+        'password_confirm': 'bench-Pass-123', 'email': 'bench@example.com',
+    }, 8, 'none'),
+    Case('login', 'login', 'POST', '/api/auth/login/', lambda ctx: {
+        'username': ctx['username'], 'password': ctx['password'],
+    }, 4, 'none'),
+    Case('profile', 'user-profile', 'GET', '/api/auth/profile/', None, 0),
+    Case('preferences_get', 'user-preferences', 'GET', '/api/auth/preferences/', None, 1),
+    Case('preferences_patch', 'user-preferences', 'PATCH', '/api/auth/preferences/', {'default_report_period': 'month'}, 3),
+    Case('categories', 'category-list', 'GET', '/api/categories/', None, 0),
+    Case('category_detail', 'category-detail', 'GET', lambda ctx: f'/api/categories/{ctx["category_id"]}/', None, 1),
+    Case('transactions_page', 'transaction-list', 'GET', '/api/transactions/', None, 2),
+    Case('transactions_limit', 'transaction-list', 'GET', '/api/transactions/?limit=50&omit_count=1', None, 1),
+    Case('transaction_create', 'transaction-list', 'POST', '/api/transactions/', lambda ctx: {
+        'amount': '45000', 'category': ctx['category_id'], 'description': 'Benchmark',
+        'transaction_date': date.today().isoformat(),
+    }, 45),
+    Case('transaction_detail', 'transaction-detail', 'GET', lambda ctx: f'/api/transactions/{ctx["transaction_id"]}/', None, 1),
+    Case('statistics', 'transaction-statistics', 'GET', '/api/transactions/statistics/', None, 4),
+    Case('transactions_sync', 'transaction-sync', 'GET', '/api/transactions/sync/', None, 2),
+    Case('bulk_sync', 'transaction-bulk-sync', 'POST', '/api/transactions/bulk_sync/', lambda ctx: {
+        'transactions': [
+            {'amount': '30000', 'category': ctx['category_id'], 'description': 'Benchmark sync',
+             'transaction_date': date.today().isoformat()}
+            for _ in range(5)
+        ],
+        'deleted_ids': [],
+    }, 45),
+    Case('export_csv', 'transaction-export', 'GET', '/api/transactions/export/?start_date=2000-01-01', None, 2),
+    Case('nlp_input', 'transaction-nlp-input', 'POST', '/api/transactions/nlp_input/', {'text': 'Chi 50k ăn sáng'}, 45),
+    Case('nlp_query', 'transaction-nlp-query', 'POST', '/api/transactions/nlp_query/', {'text': 'Tháng này chi bao nhiêu'}, 4),
+    Case('budgets', 'budget-list', 'GET', '/api/budgets/', None, 2),
+    Case('budget_detail', 'budget-detail', 'GET', lambda ctx: f'/api/budgets/{ctx["budget_id"]}/', None, 2),
+    Case('budgets_sync', 'budget-sync', 'GET', '/api/budgets/sync/', None, 2),
+    Case('notifications', 'notification-list', 'GET', '/api/notifications/?limit=10&omit_count=1', None, 3),
+    Case('notification_detail', 'notification-detail', 'GET',
+         lambda ctx: f'/api/notifications/{ctx["notification_id"]}/', None, 1),
+    Case('notification_mark_read', 'notification-mark-read', 'POST',
+         lambda ctx: f'/api/notifications/{ctx["notification_id"]}/mark_read/', None, 4),
+    Case('notifications_unread', 'notification-unread-count', 'GET', '/api/notifications/unread_count/', None, 2),
+    Case('notifications_mark_all', 'notification-mark-all-read', 'POST', '/api/notifications/mark_all_read/', None, 4),
+    Case('imports', 'import-job-list', 'GET', '/api/imports/', None, 2),
+    Case('import_detail', 'import-job-detail', 'GET', lambda ctx: f'/api/imports/{ctx["import_job_id"]}/', None, 1),
+    Case('custom_report', 'custom-report', 'POST', '/api/reports/custom/', {'period': 'month'}, 5),
+    Case('dashboard', 'dashboard', 'GET', '/api/dashboard/', None, 6),
+    Case('ai_trends', 'ai-trends', 'GET', '/api/ai/trends/', None, 2),
+    Case('ai_predictions', 'ai-predictions', 'GET', '/api/ai/predictions/', None, 2),
+    Case('ai_anomalies', 'ai-anomalies', 'GET', '/api/ai/anomalies/', None, 2),
+    Case('ai_savings', 'ai-savings', 'GET', '/api/ai/savings-suggestions/', None, 2),
+    Case('ai_insights', 'ai-insights', 'GET', '/api/ai/insights/', None, 5),
+    Case('chatbot', 'chatbot', 'POST', '/api/chatbot/', {'message': 'Tháng này tôi chi bao nhiêu?'}, 4),
+    Case('sync_all', 'sync-all', 'GET', '/api/sync/all/', None, 4),
+    Case('metrics', 'metrics', 'GET', '/api/metrics/', None, 0, 'staff'),
+]
+
+# Route không đo được trong benchmark (lý do)
+SKIPPED = {
+    'transaction-ocr-receipt': 'cần model EasyOCR',
+    'transaction-import-file': 'import chạy trong thread nền',
+    'logout': 'thu hồi token của user benchmark',
+    'change-password': 'đổi mật khẩu và token của user benchmark',
+}
+
+
+class BenchContext(dict):
+    """Id của dữ liệu benchmark cho path/body của các case"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._counter = 0
+
+    def next_id(self):
+        self._counter += 1
+        return f'{os.getpid()}_{int(time.time())}_{self._counter}'
+
+
+def route_names():
+    """Tên của mọi route trong finance/urls.py (kể cả route của router)"""
+    names = set()
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+            elif pattern.name:
+                names.add(pattern.name)
+
+    walk(finance_urls.urlpatterns)
+    return names
+
+
+class Command(BaseCommand):
+    help = ('Benchmark mọi endpoint với user có 1k/100k/1M giao dịch: kiểm tra ngân sách số query '
+            'và so sánh độ trễ p50 với file baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=str, default='1000',
+                            help='Số giao dịch của user benchmark, cách nhau bởi dấu phẩy (vd. 1000,100000,1000000)')
+        parser.add_argument('--prefix', type=str, default='bench', help='Tiền tố username của user benchmark')
+        parser.add_argument('--repeat', type=int, default=5, help='Số lần đo mỗi endpoint (sau một lần chạy nóng)')
+        parser.add_argument('--cases', type=str, default='', help='Chỉ chạy các case này (cách nhau bởi dấu phẩy)')
+        parser.add_argument('--baseline', type=str,
+                            default=os.path.join(settings.BASE_DIR, 'bench_endpoints_baseline.json'))
+        parser.add_argument('--update-baseline', action='store_true', help='Ghi kết quả lần chạy này làm baseline')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Tỉ lệ chậm hơn baseline bị coi là hồi quy (0.25 = 25%%)')
+        parser.add_argument('--min-delta-ms', type=float, default=5,
+                            help='Bỏ qua chênh lệch nhỏ hơn số ms này (nhiễu đo)')
+        parser.add_argument('--json', dest='json_output', type=str, help='Ghi kết quả ra file JSON')
+
+    def handle(self, *args, **options):
+        uncovered = route_names() - {case.url_name for case in CASES} - set(SKIPPED)
+        if uncovered:
+            raise CommandError(f'Route chưa có case benchmark: {", ".join(sorted(uncovered))}')
+
+        cases = CASES
+        if options['cases']:
+            selected = {name.strip() for name in options['cases'].split(',') if name.strip()}
+            cases = [case for case in CASES if case.name in selected]
+            if len(cases) != len(selected):
+                raise CommandError(f'Case không tồn tại: {", ".join(selected - {c.name for c in CASES})}')
+
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError('--sizes phải là các số nguyên')
+
+        results = {}
+        failures = []
+        # Tắt Server-Timing log và profiler lấy mẫu để không ảnh hưởng số đo
+        with override_settings(SERVER_TIMING={'ENABLED': False}, REQUEST_PROFILER={'ENABLED': False}):
+            for size in sizes:
+                results[str(size)] = self._run_size(size, cases, options, failures)
+
+        baseline = None
+        if os.path.exists(options['baseline']):
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+        if baseline is not None and not options['update_baseline']:
+            failures.extend(self._compare(results, baseline['results'], options))
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'repeat': options['repeat'],
+            },
+            'results': results,
+        }
+        if options['json_output']:
+            with open(options['json_output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+        if options['update_baseline']:
+            with open(options['baseline'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f'Đã ghi baseline: {options["baseline"]}')
+        elif baseline is None:
+            self.stdout.write(f'Chưa có baseline ({options["baseline"]}), chạy lại với --update-baseline để tạo')
+
+        if failures:
+            for failure in failures:
+                self.stderr.write(f'  - {failure}')
+            raise CommandError(f'{len(failures)} endpoint vượt ngân sách query hoặc chậm hơn baseline')
+        self.stdout.write(
+            self.style.SUCCESS(f'\nHoàn thành! {len(cases)} case x {len(sizes)} kích thước dữ liệu đều đạt')
+        )
+
+    def _ensure_users(self, size, prefix):
+        """User benchmark có `size` giao dịch (sinh bằng generate_synthetic_data nếu chưa có) và user staff"""
+        user_prefix = f'{prefix}{size}'
+        username = f'{user_prefix}_00000'
+        if not User.objects.filter(username=username).exists():
+            self.stdout.write(f'Sinh {size} giao dịch cho {username}...')
+            call_command(
+                'generate_synthetic_data', users=1, transactions=size, prefix=user_prefix,
+                password='synth12345', stdout=self.stdout
+            )
+        user = User.objects.get(username=username)
+        staff, _ = User.objects.get_or_create(username=f'{prefix}_staff', defaults={'is_staff': True})
+        return user, staff
+
+    def _build_context(self, user, prefix):
+        """Dữ liệu cho các route chi tiết; tạo notification / import job mẫu nếu user chưa có"""
+        category = Category.objects.filter(type='expense').order_by('id').first()
+        transaction = Transaction.objects.filter(user=user).order_by('-id').first()
+        budget = Budget.objects.filter(user=user).order_by('id').first()
+        notification = Notification.objects.filter(user=user).order_by('-id').first()
+        if notification is None:
+            notification = Notification.objects.create(
+                user=user, type='system', title='Benchmark', message='Thông báo mẫu cho benchmark'
+            )
+        import_job = ImportJob.objects.filter(user=user).order_by('-id').first()
+        if import_job is None:
+            import_job = ImportJob.objects.create(user=user, status='completed', file_name='benchmark.csv')
+        return BenchContext(
+            prefix=prefix, username=user.username, password='synth12345',
+            category_id=category.id, transaction_id=transaction.id if transaction else 0,
+            budget_id=budget.id if budget else 0, notification_id=notification.id, import_job_id=import_job.id,
+        )
+
+    def _run_size(self, size, cases, options, failures):
+        user, staff = self._ensure_users(size, options['prefix'])
+        context = self._build_context(user, options['prefix'])
+        clients = {
+            'user': Client(HTTP_AUTHORIZATION=f'Token {Token.objects.get_or_create(user=user)[0].key}'),
+            'staff': Client(HTTP_AUTHORIZATION=f'Token {Token.objects.get_or_create(user=staff)[0].key}'),
+            'none': Client(),
+        }
+        last_transaction_id = Transaction.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        last_notification_id = Notification.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+        count = Transaction.objects.filter(user=user).count()
+        self.stdout.write(f'\n{user.username}: {count} giao dịch')
+        self.stdout.write(f'{"Case":<26}{"status":>7}{"query":>7}{"ngân sách":>11}{"p50 ms":>10}{"max ms":>10}')
+        results = {}
+        # Wrapper cố định của kết nối (slow query log): gỡ ra để được gắn lại khi kết nối mở
+        # trong request đầu tiên, như ở một worker / luồng mới
+        wrappers = [type(wrapper).__name__ for wrapper in connection.execute_wrappers]
+        connection.close()
+        connection.execute_wrappers.clear()
+        try:
+            for case in cases:
+                # Mở kết nối mới cho mỗi case như CONN_MAX_AGE=0 (lần chạy nóng không được tính)
+                connection.close()
+                row = self._run_case(case, clients[case.auth], context, options['repeat'])
+                results[case.name] = row
+                # Wrapper gắn khi mở kết nối không được rò rỉ hay bị gỡ nhầm qua các request
+                current = [type(wrapper).__name__ for wrapper in connection.execute_wrappers]
+                if current != wrappers:
+                    failures.append(f'[{size}] {case.name}: connection.execute_wrappers {wrappers} -> {current}')
+                    wrappers = current
+                over = row['queries'] > case.max_queries
+                line = (f'{case.name:<26}{row["status"]:>7}{row["queries"]:>7}{case.max_queries:>11}'
+                        f'{row["p50_ms"]:>10.1f}{row["max_ms"]:>10.1f}')
+                self.stdout.write(self.style.ERROR(line) if over or row['status'] >= 400 else line)
+                if over:
+                    failures.append(f'[{size}] {case.name}: {row["queries"]} query > ngân sách {case.max_queries}')
+                if row['status'] >= 400:
+                    failures.append(f'[{size}] {case.name}: status {row["status"]}')
+        finally:
+            # Dọn dữ liệu do các case POST tạo ra để lần chạy sau có cùng kích thước dữ liệu
+            Transaction.objects.filter(user=user, id__gt=last_transaction_id).delete()
+            Notification.objects.filter(user=user, id__gt=last_notification_id).delete()
+            User.objects.filter(username__startswith=f'{options["prefix"]}_reg_').delete()
+        return results
+
+    @staticmethod
+    def _run_case(case, client, context, repeat):
+        path = case.path(context) if callable(case.path) else case.path
+        latencies = []
+        queries = 0
+        status_code = 0
+        # Lần đầu chạy nóng (cache token, danh mục...), không tính
+        for attempt in range(repeat + 1):
+            body = case.body(context) if callable(case.body) else case.body
+            timer = RequestTimer()
+            token = activate(timer)
+            try:
+                with track_queries():
+                    started = time.perf_counter()
+                    if case.method == 'GET':
+                        response = client.get(path)
+                    else:
+                        response = getattr(client, case.method.lower())(
+                            path, data=json.dumps(body or {}), content_type='application/json'
+                        )
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    elapsed = time.perf_counter() - started
+            finally:
+                deactivate(token)
+            if attempt:
+                latencies.append(elapsed * 1000)
+                queries = max(queries, timer.query_count)
+                status_code = max(status_code, response.status_code)
+
+        latencies.sort()
+        return {
+            'status': status_code,
+            'queries': queries,
+            'p50_ms': round(statistics.median(latencies), 2),
+            'max_ms': round(latencies[-1], 2),
+        }
+
+    @staticmethod
+    def _compare(results, baseline, options):
+        """Các case chậm hơn baseline quá threshold (và quá min-delta-ms)"""
+        regressions = []
+        for size, rows in results.items():
+            for name, row in rows.items():
+                previous = baseline.get(size, {}).get(name)
+                if previous is None:
+                    continue
+                limit = previous['p50_ms'] * (1 + options['threshold'])
+                if row['p50_ms'] > limit and row['p50_ms'] - previous['p50_ms'] > options['min_delta_ms']:
+                    regressions.append(
+                        f'[{size}] {name}: p50 {row["p50_ms"]:.1f} ms > baseline {previous["p50_ms"]:.1f} ms '
+                        f'(+{(row["p50_ms"] / previous["p50_ms"] - 1) * 100:.0f}%)'
+                    )
+                if row['queries'] > previous['queries']:
+                    regressions.append(f'[{size}] {name}: {row["queries"]} query > baseline {previous["queries"]}')
+        return regressions
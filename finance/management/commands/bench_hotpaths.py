@@ -0,0 +1,232 @@
+"""
+Management command micro-benchmark các đoạn Python thuần chạy nhiều:
+NLPService (extract_transaction_info, parse_query), OCRService.parse_receipt_text
+và các vòng tính toán của AIService (trên dữ liệu giả lập trong bộ nhớ)
+"""
+import json
+import math
+import platform
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from finance.ai_service import AIService
+from finance.management.commands.generate_synthetic_data import DESCRIPTIONS, EXPENSE_PROFILES, INCOME_PROFILES
+from finance.nlp_service import NLPService
+from finance.ocr_service import OCRService
+
+
+# Câu nhập liệu tiếng Việt thường gặp (chat, nhập nhanh trên mobile)
+NLP_INPUTS = [
+    'Hôm nay chi 50k ăn sáng',
+    'Chi 200k mua quần áo',
+    'Nhận lương 15 triệu',
+    'hôm qua đổ xăng 80.000đ',
+    'Trả tiền điện tháng này 450.000 đồng',
+    'cà phê với bạn 45k',
+    'Grab đi làm 32000',
+    'Mua sách lập trình 235.000 vnd',
+    'Thanh toán học phí 3,5 triệu',
+    'Bán đồ cũ được 300 nghìn',
+    'đi siêu thị mua đồ gia dụng hết 1.250.000đ cho cả tuần',
+    'Khám bệnh và mua thuốc 620 ngàn',
+]
+
+QUERY_INPUTS = [
+    'Tháng này tôi chi bao nhiêu?',
+    'Tôi đã chi bao nhiêu cho cà phê trong tháng 12?',
+    'Tuần này tiêu bao nhiêu cho ăn uống',
+    'Thu nhập năm nay là bao nhiêu',
+    'Trung bình mỗi ngày tôi chi bao nhiêu cho di chuyển',
+    'Có bao nhiêu giao dịch mua sắm tháng trước',
+]
+
+# Text OCR của hóa đơn (giống kết quả EasyOCR: mỗi dòng một khối text)
+RECEIPT_TEXTS = [
+    """HIGHLANDS COFFEE
+Chi nhánh Nguyễn Huệ
+Ngày: 15/03/2025 08:42
+Phin Sữa Đá x2 58.000đ
+Bánh mì thịt 35.000đ
+Tổng cộng: 93.000 VND
+Cảm ơn quý khách""",
+    """CO.OPMART
+Hóa đơn bán lẻ
+2025-02-28
+Sữa tươi 1L 32,500
+Gạo ST25 5kg 185,000
+Nước giặt 159,000
+Tong cong 376,500
+Tiền khách đưa 500,000
+Tiền thối 123,500""",
+    """Cửa hàng tiện lợi Circle K
+17-01-2025
+Mì ly 12.000
+Nước suối 8.000
+Total 20.000 đ""",
+    """BENH VIEN DA KHOA
+BIEN LAI THU TIEN
+Ngay 03/11/24
+Kham benh 150.000
+Thuoc 470.000
+Tong: 620.000 dong""",
+]
+
+
+def build_rows(count: int, seed: int = 42):
+    """Giao dịch giả lập dạng AIService.WINDOW_FIELDS trong 120 ngày gần nhất"""
+    rng = random.Random(seed)
+    end_date = date.today()
+    names = list(EXPENSE_PROFILES)
+    weights = [EXPENSE_PROFILES[name][0] for name in names]
+    category_ids = {name: index + 1 for index, name in enumerate(names + [item[0] for item in INCOME_PROFILES])}
+    rows = []
+    for index in range(count):
+        if rng.random() < 0.05:
+            name, median, _ = rng.choice(INCOME_PROFILES)
+            category_type, sigma, description = 'income', 0.2, name
+        else:
+            name = rng.choices(names, weights)[0]
+            _, median, sigma, _ = EXPENSE_PROFILES[name]
+            category_type, description = 'expense', rng.choice(DESCRIPTIONS[name])
+        rows.append({
+            'id': index + 1,
+            'amount': Decimal(max(1000, round(median * rng.lognormvariate(0, sigma), -3))),
+            'transaction_date': end_date - timedelta(days=rng.randrange(120)),
+            'description': description,
+            'type': category_type,
+            'category_id': category_ids[name],
+            'category__name': name,
+            'category__icon': '',
+            'category__color': '#000000',
+        })
+    rows.sort(key=lambda row: row['transaction_date'], reverse=True)
+    return rows
+
+
+def measure(func, min_time: float, min_rounds: int, max_rounds: int):
+    """
+    Đo kiểu pytest-benchmark: chạy nóng, hiệu chỉnh số lần gọi mỗi round (>= 1 ms),
+    chạy đủ min_time giây / min_rounds round. Trả về thống kê theo giây cho một lần gọi
+    """
+    func()
+    started = time.perf_counter()
+    func()
+    single = max(time.perf_counter() - started, 1e-7)
+    iterations = max(1, int(0.001 / single))
+
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < max_rounds and (len(samples) < min_rounds or time.perf_counter() < deadline):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        samples.append((time.perf_counter() - started) / iterations)
+
+    mean = statistics.fmean(samples)
+    return {
+        'min': min(samples),
+        'max': max(samples),
+        'mean': mean,
+        'median': statistics.median(samples),
+        'stddev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'rounds': len(samples),
+        'iterations': iterations,
+        'ops': 1 / mean if mean else math.inf,
+    }
+
+
+def _format_time(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f'{seconds * 1e3:.3f} ms'
+    return f'{seconds * 1e6:.2f} µs'
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark NLPService, phân tích hóa đơn OCR và các phép tính của AIService, xuất JSON để so sánh'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filter', type=str, default='', help='Chỉ chạy benchmark có tên chứa chuỗi này')
+        parser.add_argument('--rows', type=int, default=5000, help='Số giao dịch giả lập cho AIService')
+        parser.add_argument('--min-time', type=float, default=0.5, help='Thời gian đo tối thiểu mỗi benchmark (giây)')
+        parser.add_argument('--min-rounds', type=int, default=5)
+        parser.add_argument('--max-rounds', type=int, default=1000)
+        parser.add_argument('--json', dest='json_output', type=str, help='Ghi kết quả ra file JSON')
+        parser.add_argument('--compare', type=str, help='File JSON của lần chạy trước để so sánh median')
+        parser.add_argument('--fail-threshold', type=float, default=None,
+                            help='Báo lỗi nếu median chậm hơn lần trước quá tỉ lệ này (vd. 0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        rows = build_rows(options['rows'])
+        # User chưa lưu: các phân tích dùng rows có sẵn, không query giao dịch
+        user = User(id=0, username='bench')
+
+        benchmarks = [
+            ('nlp', f'nlp.extract_transaction_info[{len(NLP_INPUTS)} câu]',
+             lambda: [NLPService.extract_transaction_info(text) for text in NLP_INPUTS]),
+            ('nlp', f'nlp.parse_query[{len(QUERY_INPUTS)} câu]',
+             lambda: [NLPService.parse_query(text) for text in QUERY_INPUTS]),
+            ('ocr', f'ocr.parse_receipt_text[{len(RECEIPT_TEXTS)} hóa đơn]',
+             lambda: [OCRService.parse_receipt_text(text) for text in RECEIPT_TEXTS]),
+            ('ai', f'ai.sum[{len(rows)} dòng]', lambda: AIService._sum(rows, 'expense')),
+            ('ai', f'ai.analyze_spending_trends[{len(rows)} dòng]',
+             lambda: AIService.analyze_spending_trends(user, 30, rows=rows)),
+            ('ai', f'ai.predict_next_month_spending[{len(rows)} dòng]',
+             lambda: AIService.predict_next_month_spending(user, rows=rows)),
+            ('ai', f'ai.detect_anomalies[{len(rows)} dòng]',
+             lambda: AIService.detect_anomalies(user, 30, rows=rows)),
+            # Có một query budgets (user không tồn tại nên rỗng)
+            ('ai', f'ai.suggest_savings_plan[{len(rows)} dòng]',
+             lambda: AIService.suggest_savings_plan(user, rows=rows)),
+        ]
+        benchmarks = [item for item in benchmarks if options['filter'] in item[1]]
+        if not benchmarks:
+            raise CommandError(f'Không có benchmark nào khớp "{options["filter"]}"')
+
+        previous = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                previous = {item['name']: item['stats'] for item in json.load(f)['benchmarks']}
+
+        results = []
+        regressions = []
+        self.stdout.write(f'{"Benchmark":<44}{"min":>12}{"median":>12}{"mean":>12}{"stddev":>12}{"rounds":>8}  so với trước')
+        for group, name, func in benchmarks:
+            stats = measure(func, options['min_time'], options['min_rounds'], options['max_rounds'])
+            results.append({'group': group, 'name': name, 'stats': stats})
+
+            change = ''
+            if name in previous:
+                ratio = stats['median'] / previous[name]['median'] - 1
+                change = f'{ratio * 100:+.1f}%'
+                if options['fail_threshold'] is not None and ratio > options['fail_threshold']:
+                    regressions.append(f'{name}: median chậm hơn {ratio * 100:.1f}%')
+            self.stdout.write(
+                f'{name:<44}{_format_time(stats["min"]):>12}{_format_time(stats["median"]):>12}'
+                f'{_format_time(stats["mean"]):>12}{_format_time(stats["stddev"]):>12}{stats["rounds"]:>8}  {change}'
+            )
+
+        if options['json_output']:
+            with open(options['json_output'], 'w', encoding='utf-8') as f:
+                json.dump({
+                    'machine_info': {
+                        'python': platform.python_version(),
+                        'implementation': platform.python_implementation(),
+                        'machine': platform.machine(),
+                    },
+                    'datetime': timezone.now().isoformat(),
+                    'options': {'rows': options['rows'], 'min_time': options['min_time']},
+                    'benchmarks': results,
+                }, f, indent=2, ensure_ascii=False)
+
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(f'  - {regression}')
+            raise CommandError(f'{len(regressions)} benchmark chậm hơn lần trước quá ngưỡng')
+        self.stdout.write(self.style.SUCCESS(f'\nHoàn thành! Đã chạy {len(results)} benchmark'))
@@ -0,0 +1,186 @@
+"""
+Management command để đo độ trễ của bus làm mới cache (Postgres LISTEN/NOTIFY)
+giữa nhiều process chạy cùng một database, và kiểm tra token bị thu hồi ở một process
+bị từ chối (401) ngay ở process khác
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from finance import invalidation_bus
+from finance.management.commands.load_test import percentile
+
+
+class Command(BaseCommand):
+    help = 'Chạy N process listener, gửi sự kiện qua invalidation bus và đo độ trễ nhận (p50/p95/max)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Số process listener')
+        parser.add_argument('--events', type=int, default=200, help='Số sự kiện cần gửi')
+        parser.add_argument('--interval', type=float, default=0.01, help='Khoảng cách giữa hai sự kiện (giây)')
+        parser.add_argument('--timeout', type=float, default=30, help='Thời gian chờ tối đa của mỗi process (giây)')
+        parser.add_argument('--json', dest='json_output', type=str, help='Ghi kết quả ra file JSON')
+        # Dùng nội bộ: chạy ở chế độ process listener
+        parser.add_argument('--worker', action='store_true', help='(nội bộ) chạy một process listener')
+        parser.add_argument('--auth-worker', action='store_true',
+                            help='(nội bộ) process gửi request bằng token cho đến khi bị từ chối')
+
+    def handle(self, *args, **options):
+        if not invalidation_bus.is_available():
+            raise CommandError('Invalidation bus cần database Postgres và CACHE_INVALIDATION["ENABLED"]')
+        if options['worker']:
+            return self._run_worker(options)
+        if options['auth_worker']:
+            return self._run_auth_worker(options)
+
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'bench_invalidation', '--worker',
+            '--events', str(options['events']), '--timeout', str(options['timeout']),
+        ]
+        workers = [
+            subprocess.Popen(command, stdout=subprocess.PIPE, text=True, env=os.environ.copy())
+            for _ in range(options['workers'])
+        ]
+        try:
+            # Chờ mọi listener sẵn sàng trước khi gửi
+            for worker in workers:
+                if worker.stdout.readline().strip() != 'READY':
+                    raise CommandError(f'Process {worker.pid} không khởi động được listener')
+
+            self.stdout.write(f'{len(workers)} listener sẵn sàng, gửi {options["events"]} sự kiện...')
+            for seq in range(options['events']):
+                invalidation_bus.publish('bench', seq)
+                time.sleep(options['interval'])
+
+            results = [json.loads(worker.communicate(timeout=options['timeout'] + 5)[0]) for worker in workers]
+        finally:
+            for worker in workers:
+                if worker.poll() is None:
+                    worker.kill()
+
+        report = {'workers': len(workers), 'events': options['events'], 'per_worker': [], 'overall': {}}
+        all_lags = []
+        self.stdout.write(f'\n{"pid":<10}{"nhận":>8}{"mất":>6}{"p50 ms":>10}{"p95 ms":>10}{"max ms":>10}')
+        for result in results:
+            lags = sorted(result['lags_ms'])
+            all_lags.extend(lags)
+            row = self._summarize(lags, options['events'])
+            row['pid'] = result['pid']
+            report['per_worker'].append(row)
+            self.stdout.write(
+                f'{row["pid"]:<10}{row["received"]:>8}{row["missed"]:>6}'
+                f'{row["p50_ms"]:>10.2f}{row["p95_ms"]:>10.2f}{row["max_ms"]:>10.2f}'
+            )
+
+        report['overall'] = self._summarize(sorted(all_lags), options['events'] * len(workers))
+        overall = report['overall']
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nHoàn thành! Độ trễ làm mới cache: p50 {overall["p50_ms"]:.2f} ms, '
+                f'p95 {overall["p95_ms"]:.2f} ms, max {overall["max_ms"]:.2f} ms, mất {overall["missed"]} sự kiện'
+            )
+        )
+        report['revocation'] = self._check_revocation(options)
+        if options['json_output']:
+            with open(options['json_output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+        if report['revocation']['status'] != 401:
+            raise CommandError(f'Token đã thu hồi vẫn được process khác chấp nhận '
+                               f'(status {report["revocation"]["status"]})')
+
+    @staticmethod
+    def _summarize(sorted_lags, expected):
+        return {
+            'received': len(sorted_lags),
+            'missed': expected - len(sorted_lags),
+            'p50_ms': round(percentile(sorted_lags, 50), 3),
+            'p95_ms': round(percentile(sorted_lags, 95), 3),
+            'max_ms': round(sorted_lags[-1], 3) if sorted_lags else 0,
+        }
+
+    def _run_worker(self, options):
+        """Process listener: ghi nhận độ trễ của từng sự kiện 'bench', in kết quả JSON khi xong"""
+        lags = []
+        done = threading.Event()
+
+        def on_event(event, received_at):
+            if event.get('kind') == 'bench':
+                lags.append((received_at - event['ts']) * 1000)
+                if len(lags) >= options['events']:
+                    done.set()
+
+        listener = invalidation_bus.InvalidationListener(on_event=on_event)
+        listener.start()
+        if not listener.ready.wait(10):
+            raise CommandError('Không kết nối được listener')
+        self.stdout.write('READY')
+        self.stdout.flush()
+
+        done.wait(options['timeout'])
+        listener.stop()
+        self.stdout.write(json.dumps({'pid': os.getpid(), 'lags_ms': lags}))
+
+    def _check_revocation(self, options):
+        """
+        Process khác đã cache token (cục bộ và tầng dùng chung) phải trả 401 ngay sau khi
+        token bị xóa ở process này. Trả về {'status', 'ms'}: status cuối cùng process kia nhận được
+        """
+        user, _ = User.objects.get_or_create(username='bench_invalidation_revoke')
+        token, _ = Token.objects.get_or_create(user=user)
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'bench_invalidation', '--auth-worker',
+            '--timeout', str(options['timeout']),
+        ]
+        worker = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+                                  env=os.environ.copy())
+        try:
+            # Token gửi qua stdin, không nằm trong danh sách tham số của process
+            worker.stdin.write(f'{token.key}\n')
+            worker.stdin.flush()
+            if worker.stdout.readline().strip() != 'READY':
+                raise CommandError(f'Process {worker.pid} không xác thực được bằng token')
+            token.delete()
+            worker.stdin.write('REVOKED\n')
+            worker.stdin.flush()
+            result = json.loads(worker.communicate(timeout=options['timeout'] + 5)[0])
+        finally:
+            if worker.poll() is None:
+                worker.kill()
+            user.delete()
+
+        line = f'Thu hồi token: process {result["pid"]} nhận status {result["status"]} sau {result["ms"]:.1f} ms'
+        self.stdout.write(line if result['status'] == 401 else self.style.ERROR(line))
+        return {'status': result['status'], 'ms': result['ms']}
+
+    def _run_auth_worker(self, options):
+        """Process gửi request bằng token (đã cache), sau REVOKED gửi lại cho tới khi nhận 401"""
+        key = sys.stdin.readline().strip()
+        client = Client(HTTP_AUTHORIZATION=f'Token {key}')
+        path = reverse('user-profile')
+        # Request đầu nạp token vào cache và khởi động listener, request sau đọc từ cache
+        statuses = [client.get(path).status_code for _ in range(2)]
+        if statuses != [200, 200] or not invalidation_bus.wait_listener_ready(10):
+            raise CommandError(f'Không xác thực được bằng token: {statuses}')
+        self.stdout.write('READY')
+        self.stdout.flush()
+
+        sys.stdin.readline()
+        started = time.perf_counter()
+        deadline = started + options['timeout']
+        status = client.get(path).status_code
+        while status != 401 and time.perf_counter() < deadline:
+            time.sleep(0.005)
+            status = client.get(path).status_code
+        self.stdout.write(json.dumps({
+            'pid': os.getpid(), 'status': status, 'ms': (time.perf_counter() - started) * 1000,
+        }))
@@ -0,0 +1,176 @@
+"""
+Management command đo partition pruning trên finance_transaction đã partition (PostgreSQL):
+với các query của AIService và báo cáo, đếm số partition thực sự được quét trên tổng số,
+số buffer đọc và thời gian p50; so với cùng câu SQL trên bảng cũ (finance_transaction_unpartitioned)
+nếu bảng này còn giữ sau `partition_transactions convert`
+"""
+import json
+import re
+import statistics
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from finance import partitioning
+from finance.ai_service import AIService
+from finance.instrumentation import explain
+from finance.models import Transaction
+
+
+# build nhận context (user, hôm nay) và trả về queryset; pruned: query có lọc theo transaction_date
+PruningCase = namedtuple('PruningCase', 'name source build pruned')
+
+
+def _window(ctx, start, end):
+    return Transaction.objects.filter(user=ctx['user'], transaction_date__gte=start, transaction_date__lte=end)
+
+
+def _month_range(today):
+    start = today.replace(day=1)
+    return start, partitioning.next_period(start, 'month') - timedelta(days=1)
+
+
+CASES = [
+    PruningCase('ai_window_30d', 'AIService.load_window (analyze_spending_trends)',
+                lambda ctx: _window(ctx, ctx['today'] - timedelta(days=30), ctx['today'])
+                .order_by('-transaction_date', '-created_at').values(*AIService.WINDOW_FIELDS), True),
+    PruningCase('ai_window_90d', 'AIService.load_window (predict_next_month_spending)',
+                lambda ctx: _window(ctx, ctx['today'] - timedelta(days=90), ctx['today'])
+                .order_by('-transaction_date', '-created_at').values(*AIService.WINDOW_FIELDS), True),
+    PruningCase('report_month_by_category', 'generate_custom_report (period=month)',
+                lambda ctx: _window(ctx, *_month_range(ctx['today'])).values('category__name', 'type')
+                .annotate(total=Sum('amount'), count=Count('id')).order_by('-total'), True),
+    PruningCase('report_year_by_day', 'generate_custom_report (period=year)',
+                lambda ctx: _window(ctx, date(ctx['today'].year, 1, 1), date(ctx['today'].year, 12, 31))
+                .values('transaction_date').annotate(
+                    income=Sum('amount', filter=Q(type='income')),
+                    expense=Sum('amount', filter=Q(type='expense'))).order_by('transaction_date'), True),
+    # Đối chứng: không lọc theo transaction_date nên phải quét mọi partition
+    PruningCase('sync_updated_at', 'TransactionViewSet.sync',
+                lambda ctx: Transaction.objects.filter(user=ctx['user'], updated_at__gt=ctx['now'] - timedelta(days=1))
+                .order_by('-updated_at', '-created_at')[:100], False),
+]
+
+PARTITION_RE = re.compile(rf'\bon ({re.escape(partitioning.TABLE)}_(?:y\d{{4}}(?:m\d{{2}})?|default))\b')
+BUFFERS_RE = re.compile(r'Buffers: shared(?: hit=(\d+))?(?: read=(\d+))?')
+
+
+class Command(BaseCommand):
+    help = ('Đo partition pruning của finance_transaction trên các query AI và báo cáo: '
+            'số partition được quét, buffer và thời gian so với bảng chưa partition')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Số user giả lập cần có')
+        parser.add_argument('--transactions', type=int, default=5000, help='Số giao dịch chi tiêu mỗi user')
+        parser.add_argument('--months', type=int, default=36, help='Trải dữ liệu giả lập trong bao nhiêu tháng')
+        parser.add_argument('--prefix', type=str, default='pruning', help='Tiền tố username của user giả lập')
+        parser.add_argument('--repeat', type=int, default=5, help='Số lần đo mỗi query (sau một lần chạy nóng)')
+        parser.add_argument('--verbose-plans', action='store_true', help='In toàn bộ kế hoạch thực thi')
+        parser.add_argument('--json', dest='json_output', type=str, help='Ghi kết quả ra file JSON')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partition chỉ hỗ trợ PostgreSQL')
+        if not partitioning.is_partitioned():
+            raise CommandError(f'{partitioning.TABLE} chưa được partition, chạy `partition_transactions convert` trước')
+
+        user = self._ensure_data(options)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(partitioning.TABLE)}')
+        total = len(partitioning.list_partitions())
+        legacy = partitioning.table_exists(partitioning.LEGACY_TABLE)
+        ctx = {'user': user, 'today': timezone.localdate(), 'now': timezone.now()}
+
+        self.stdout.write(f'{partitioning.TABLE}: {total} partition'
+                          + ('' if legacy else f' ({partitioning.LEGACY_TABLE} đã xóa, bỏ qua so sánh)'))
+        self.stdout.write(f'{"Case":<28}{"partition":>11}{"buffers":>10}{"p50 ms":>10}'
+                          f'{"bảng cũ buffers":>17}{"bảng cũ p50":>13}  nguồn')
+
+        failures = []
+        report = {}
+        for case in CASES:
+            sql, params = case.build(ctx).query.sql_with_params()
+            plan = explain(connection, sql, params, analyze=True)
+            scanned = sorted(set(PARTITION_RE.findall(plan)))
+            result = {
+                'source': case.source,
+                'partitions_scanned': scanned,
+                'partitions_total': total,
+                'buffers': self._buffers(plan),
+                'p50_ms': self._p50(sql, params, options['repeat']),
+                'plan': plan,
+            }
+            if legacy:
+                legacy_sql = sql.replace(f'"{partitioning.TABLE}"', f'"{partitioning.LEGACY_TABLE}"')
+                legacy_plan = explain(connection, legacy_sql, params, analyze=True)
+                result['legacy'] = {
+                    'buffers': self._buffers(legacy_plan),
+                    'p50_ms': self._p50(legacy_sql, params, options['repeat']),
+                    'plan': legacy_plan,
+                }
+            report[case.name] = result
+
+            # Query lọc theo transaction_date chỉ được quét các partition giao với khoảng ngày
+            failed = case.pruned and len(scanned) >= total
+            if failed:
+                failures.append(f'{case.name}: quét cả {total} partition')
+            old = result.get('legacy')
+            old_buffers = str(old['buffers']) if old else '-'
+            old_p50 = f'{old["p50_ms"]:.2f}' if old else '-'
+            line = (f'{case.name:<28}{f"{len(scanned)}/{total}":>11}{result["buffers"]:>10}{result["p50_ms"]:>10.2f}'
+                    f'{old_buffers:>17}{old_p50:>13}  {case.source}')
+            self.stdout.write(self.style.ERROR(line) if failed else line)
+            if failed or options['verbose_plans']:
+                for plan_line in plan.splitlines():
+                    self.stdout.write(f'    {plan_line}')
+
+        if options['json_output']:
+            with open(options['json_output'], 'w', encoding='utf-8') as f:
+                json.dump({'table': partitioning.TABLE, 'partitions': total,
+                           'rows': Transaction.objects.count(), 'cases': report}, f, indent=2, ensure_ascii=False)
+
+        if failures:
+            for failure in failures:
+                self.stderr.write(f'  - {failure}')
+            raise CommandError(f'{len(failures)} query không được partition pruning')
+        self.stdout.write(self.style.SUCCESS(f'\nHoàn thành! Đã đo {len(CASES)} query trên {total} partition'))
+
+    def _ensure_data(self, options):
+        """Sinh user giả lập trải nhiều tháng bằng generate_synthetic_data nếu chưa đủ; trả về user đầu tiên"""
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_').count() < options['users']:
+            self.stdout.write(f'Sinh {options["users"]} user x {options["transactions"]} giao dịch '
+                              f'trong {options["months"]} tháng...')
+            User.objects.filter(username__startswith=f'{prefix}_').delete()
+            call_command(
+                'generate_synthetic_data', users=options['users'], transactions=options['transactions'],
+                months=options['months'], prefix=prefix, stdout=self.stdout
+            )
+        return User.objects.filter(username__startswith=f'{prefix}_').order_by('username').first()
+
+    @staticmethod
+    def _buffers(plan: str) -> int:
+        """Số buffer (hit + read) của node gốc"""
+        match = BUFFERS_RE.search(plan)
+        if not match:
+            return 0
+        return sum(int(value) for value in match.groups() if value)
+
+    @staticmethod
+    def _p50(sql: str, params, repeat: int) -> float:
+        timings = []
+        with connection.cursor() as cursor:
+            for attempt in range(repeat + 1):
+                started = time.perf_counter()
+                cursor.execute(sql, params)
+                cursor.fetchall()
+                if attempt:
+                    timings.append((time.perf_counter() - started) * 1000)
+        return round(statistics.median(timings), 2)
@@ -0,0 +1,99 @@
+"""
+Management command để đo thời gian serialize + render danh sách giao dịch:
+đường DRF hiện tại so với đường đọc bằng values() và FastJSONRenderer
+"""
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from finance.models import Transaction
+from finance.read_serializers import ValuesReader
+from finance.renderers import FastJSONRenderer, orjson
+from finance.serializers import TransactionSerializer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark serialize N giao dịch: DRF serializer vs values() reader, JSONRenderer vs FastJSONRenderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000, help='Số giao dịch cần serialize')
+        parser.add_argument('--user', type=str, help='Username (mặc định: user có nhiều giao dịch nhất)')
+        parser.add_argument('--repeat', type=int, default=5, help='Số lần chạy mỗi kịch bản (lấy median)')
+        parser.add_argument('--json', dest='json_output', type=str, help='Ghi kết quả ra file JSON')
+
+    def handle(self, *args, **options):
+        user = self._get_user(options['user'])
+        queryset = Transaction.objects.filter(user=user)[:options['count']]
+        count = queryset.count()
+        if count == 0:
+            raise CommandError('User không có giao dịch. Hãy chạy generate_synthetic_data trước')
+
+        drf_renderer = JSONRenderer()
+        fast_renderer = FastJSONRenderer()
+        reader = ValuesReader(TransactionSerializer)
+        related_qs = Transaction.objects.filter(user=user).select_related('category')[:options['count']]
+
+        # Tên kịch bản -> hàm trả về body JSON (.all() để không dùng lại cache của queryset)
+        scenarios = {
+            'drf (hiện tại)': lambda: drf_renderer.render(TransactionSerializer(queryset.all(), many=True).data),
+            'drf + select_related': lambda: drf_renderer.render(TransactionSerializer(related_qs.all(), many=True).data),
+            'values reader': lambda: drf_renderer.render(reader.read(queryset)),
+            'values + fast renderer': lambda: fast_renderer.render(reader.read(queryset)),
+        }
+
+        # Đường mới phải cho ra JSON giống hệt đường cũ
+        if json.loads(scenarios['drf + select_related']()) != json.loads(scenarios['values + fast renderer']()):
+            raise CommandError('Kết quả của values reader khác với TransactionSerializer')
+
+        self.stdout.write(
+            f'Serialize {count} giao dịch của {user.username}, {options["repeat"]} lần mỗi kịch bản '
+            f'(orjson: {"có" if orjson else "không"})'
+        )
+        self.stdout.write(f'\n{"Kịch bản":<26}{"median ms":>12}{"min ms":>10}{"queries":>9}{"KB":>9}')
+
+        report = {'count': count, 'orjson': orjson is not None, 'scenarios': {}}
+        for name, run in scenarios.items():
+            timings = []
+            for _ in range(options['repeat']):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    body = run()
+                    timings.append((time.perf_counter() - started) * 1000)
+            row = {
+                'median_ms': round(statistics.median(timings), 2),
+                'min_ms': round(min(timings), 2),
+                'queries': len(queries),
+                'bytes': len(body),
+            }
+            report['scenarios'][name] = row
+            self.stdout.write(
+                f'{name:<26}{row["median_ms"]:>12.1f}{row["min_ms"]:>10.1f}{row["queries"]:>9}{row["bytes"] / 1024:>9.0f}'
+            )
+
+        baseline = report['scenarios']['drf (hiện tại)']['median_ms']
+        fastest = report['scenarios']['values + fast renderer']['median_ms']
+        self.stdout.write(
+            self.style.SUCCESS(f'\nHoàn thành! values + fast renderer nhanh hơn {baseline / fastest:.1f} lần so với DRF hiện tại')
+        )
+        if options['json_output']:
+            with open(options['json_output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+
+    def _get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" không tồn tại')
+
+        user = User.objects.annotate(n=Count('transactions')).order_by('-n').first()
+        if user is None:
+            raise CommandError('Chưa có user nào')
+        return user
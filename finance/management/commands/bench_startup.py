@@ -0,0 +1,100 @@
+"""
+Management command để đo thời gian khởi động process (import time, boot tới response đầu tiên)
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Chạy trong process con: setup Django, nạp WSGI app, gửi request đầu tiên
+BOOT_SCRIPT = '''
+import os, time, json
+started = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "{settings_module}")
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+import finance.views  # Nạp toàn bộ views như khi resolve URL
+booted = time.perf_counter()
+from django.test import Client
+response = Client().get("/api/")
+done = time.perf_counter()
+import sys
+print(json.dumps({{
+    "boot_ms": (booted - started) * 1000,
+    "first_response_ms": (done - started) * 1000,
+    "status": response.status_code,
+    "heavy_modules_loaded": sorted(m for m in ("torch", "easyocr", "cv2") if m in sys.modules),
+}}))
+'''
+
+IMPORTTIME_RE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(.*)$')
+
+
+class Command(BaseCommand):
+    help = 'Đo thời gian khởi động worker: python -X importtime và thời gian boot tới response đầu tiên'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Số lần chạy để lấy trung bình')
+        parser.add_argument('--top', type=int, default=15, help='Số module import chậm nhất cần in')
+        parser.add_argument('--json', dest='json_output', type=str, help='Ghi kết quả ra file JSON')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        env.pop('OCR_PRELOAD', None)
+        script = BOOT_SCRIPT.format(settings_module=os.environ.get('DJANGO_SETTINGS_MODULE', 'mysite.settings'))
+        cwd = str(settings.BASE_DIR)
+
+        # 1. Boot tới response đầu tiên
+        runs = []
+        for _ in range(options['runs']):
+            started = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, '-c', script], cwd=cwd, env=env,
+                capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            result['process_ms'] = (time.perf_counter() - started) * 1000
+            runs.append(result)
+
+        def avg(key):
+            return sum(r[key] for r in runs) / len(runs)
+
+        self.stdout.write(f'Boot (setup + nạp views):    {avg("boot_ms"):8.1f} ms')
+        self.stdout.write(f'Tới response đầu tiên:       {avg("first_response_ms"):8.1f} ms')
+        self.stdout.write(f'Tổng thời gian process:      {avg("process_ms"):8.1f} ms')
+        heavy = runs[-1]['heavy_modules_loaded']
+        if heavy:
+            self.stdout.write(self.style.WARNING(f'Module nặng đã bị import: {", ".join(heavy)}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Không import torch/easyocr khi khởi động'))
+
+        # 2. python -X importtime: các module tốn thời gian nhất (cumulative)
+        stderr = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script], cwd=cwd, env=env,
+            capture_output=True, text=True, check=True
+        ).stderr
+        imports = []
+        for line in stderr.splitlines():
+            match = IMPORTTIME_RE.match(line)
+            if match:
+                imports.append((int(match.group(2)), match.group(3).strip()))
+        imports.sort(reverse=True)
+
+        self.stdout.write(f'\nTop {options["top"]} import theo thời gian tích lũy:')
+        for cumulative_us, module in imports[:options['top']]:
+            self.stdout.write(f'{cumulative_us / 1000:10.1f} ms  {module}')
+
+        if options['json_output']:
+            with open(options['json_output'], 'w', encoding='utf-8') as f:
+                json.dump({
+                    'runs': runs,
+                    'boot_ms': avg('boot_ms'),
+                    'first_response_ms': avg('first_response_ms'),
+                    'top_imports': [{'module': m, 'cumulative_ms': us / 1000} for us, m in imports[:options['top']]],
+                }, f, indent=2)
@@ -0,0 +1,182 @@
+"""
+Management command đo ảnh hưởng của việc tách dữ liệu gốc (câu NLP / text OCR) khỏi
+finance_transaction: kích thước bảng, thời gian quét toàn bảng khi tổng hợp và
+kích thước payload của danh sách, so với cách lưu cũ (cột original_nlp_input trong bảng)
+"""
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction as db_transaction
+
+from finance.management.commands.bench_hotpaths import NLP_INPUTS, RECEIPT_TEXTS
+from finance.models import Transaction, TransactionSource
+from finance.read_serializers import ValuesReader
+from finance.renderers import FastJSONRenderer
+from finance.serializers import TransactionSerializer
+
+
+# Bảng tạm mô phỏng cách lưu cũ: dòng giao dịch kèm tối đa 500 ký tự dữ liệu gốc
+INLINE_TABLE = 'bench_transaction_inline'
+# Quét toàn bảng cho các phép tổng hợp không lọc theo user (giống báo cáo / phân tích toàn hệ thống)
+SCAN_SQL = 'SELECT type, SUM(amount), COUNT(*) FROM {table} GROUP BY type'
+
+
+def _ocr_blocks(text: str):
+    """Khối OCR giả lập (mỗi dòng một khối, bbox xếp theo chiều dọc)"""
+    return [
+        {'text': line, 'bbox': [[10.0, 30.0 * i], [400.0, 30.0 * i], [400.0, 30.0 * i + 24], [10.0, 30.0 * i + 24]],
+         'confidence': 0.9}
+        for i, line in enumerate(text.splitlines())
+    ]
+
+
+class Command(BaseCommand):
+    help = ('So sánh kích thước finance_transaction, thời gian quét toàn bảng và payload danh sách '
+            'giữa cách lưu hiện tại (TransactionSource) và cột original_nlp_input trong bảng')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fill-sources', action='store_true',
+                            help='Sinh dữ liệu gốc giả lập cho các giao dịch chưa có (chỉ dùng trên database benchmark)')
+        parser.add_argument('--nlp-ratio', type=float, default=0.3, help='Tỉ lệ giao dịch nhập bằng câu NLP')
+        parser.add_argument('--ocr-ratio', type=float, default=0.05, help='Tỉ lệ giao dịch từ hóa đơn OCR')
+        parser.add_argument('--repeat', type=int, default=5, help='Số lần đo mỗi câu quét (sau một lần chạy nóng)')
+        parser.add_argument('--page-size', type=int, default=100, help='Số giao dịch của trang danh sách')
+        parser.add_argument('--json', dest='json_output', type=str, help='Ghi kết quả ra file JSON')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f'Chưa hỗ trợ database {connection.vendor}')
+        if options['fill_sources']:
+            self._fill_sources(options)
+
+        rows = Transaction.objects.count()
+        sources = TransactionSource.objects.count()
+        if not rows:
+            raise CommandError('Chưa có giao dịch, chạy generate_synthetic_data trước')
+        self.stdout.write(f'{connection.vendor}: {rows} giao dịch, {sources} dòng dữ liệu gốc')
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {INLINE_TABLE}')
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {INLINE_TABLE} AS '
+                f'SELECT t.*, SUBSTR(s.text, 1, 500) AS original_nlp_input '
+                f'FROM finance_transaction t LEFT JOIN finance_transactionsource s ON s.transaction_id = t.id'
+            )
+        try:
+            before = {
+                'table_bytes': self._table_size(INLINE_TABLE, temporary=True),
+                'scan_ms': self._scan_ms(INLINE_TABLE, options['repeat']),
+            }
+            after = {
+                'table_bytes': self._table_size('finance_transaction'),
+                'source_table_bytes': self._table_size('finance_transactionsource'),
+                'scan_ms': self._scan_ms('finance_transaction', options['repeat']),
+            }
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE IF EXISTS {INLINE_TABLE}')
+        before['page_bytes'], after['page_bytes'] = self._page_bytes(options['page_size'])
+
+        self.stdout.write(f'\n{"":<28}{"cột trong bảng":>18}{"TransactionSource":>20}{"thay đổi":>12}')
+        for key, label in (('table_bytes', 'kích thước finance_transaction'), ('scan_ms', 'quét toàn bảng (p50 ms)'),
+                           ('page_bytes', f'payload {options["page_size"]} giao dịch')):
+            old, new = before[key], after[key]
+            change = f'{(new / old - 1) * 100:+.1f}%' if old and new is not None else '-'
+            self.stdout.write(f'{label:<28}{self._format(key, old):>18}{self._format(key, new):>20}{change:>12}')
+        self.stdout.write(f'{"bảng finance_transactionsource":<28}{"":>18}'
+                          f'{self._format("table_bytes", after["source_table_bytes"]):>20}')
+        if connection.vendor == 'postgresql':
+            self.stdout.write('Postgres không trả lại chỗ của cột đã xóa cho tới khi ghi lại bảng '
+                              '(VACUUM FULL finance_transaction hoặc pg_repack)')
+
+        if options['json_output']:
+            with open(options['json_output'], 'w', encoding='utf-8') as f:
+                json.dump({'database': connection.vendor, 'rows': rows, 'sources': sources,
+                           'before': before, 'after': after}, f, indent=2)
+        self.stdout.write(self.style.SUCCESS('\nHoàn thành! Đã đo kích thước bảng, thời gian quét và payload'))
+
+    def _fill_sources(self, options):
+        """Dữ liệu gốc giả lập: câu NLP ngắn cho phần lớn, text + khối OCR cho một phần nhỏ"""
+        rng = random.Random(42)
+        created = 0
+        last_id = 0
+        while True:
+            ids = list(
+                Transaction.objects.filter(id__gt=last_id, source__isnull=True)
+                .order_by('id').values_list('id', flat=True)[:5000]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            batch = []
+            for pk in ids:
+                roll = rng.random()
+                if roll < options['ocr_ratio']:
+                    text = rng.choice(RECEIPT_TEXTS)
+                    batch.append(TransactionSource(transaction_id=pk, kind='ocr', text=text, blocks=_ocr_blocks(text)))
+                elif roll < options['ocr_ratio'] + options['nlp_ratio']:
+                    batch.append(TransactionSource(transaction_id=pk, kind='nlp', text=rng.choice(NLP_INPUTS)))
+            TransactionSource.objects.bulk_create(batch, batch_size=1000)
+            created += len(batch)
+        self.stdout.write(f'Đã sinh {created} dòng dữ liệu gốc')
+
+    @staticmethod
+    def _table_size(table: str, temporary: bool = False):
+        """Số byte của bảng (Postgres: heap + TOAST; SQLite: các trang trong dbstat), None nếu không đo được"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_table_size(%s::regclass)', [table])
+                return cursor.fetchone()[0]
+            try:
+                cursor.execute(f"SELECT SUM(pgsize) FROM dbstat('{'temp' if temporary else 'main'}') WHERE name = %s",
+                               [table])
+            except Exception:
+                # SQLite build không có dbstat
+                return None
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def _scan_ms(table: str, repeat: int) -> float:
+        """p50 thời gian quét toàn bảng (tắt index để hai cách lưu cùng đọc heap)"""
+        if connection.vendor == 'sqlite':
+            sql = SCAN_SQL.format(table=f'{table} NOT INDEXED')
+        else:
+            sql = SCAN_SQL.format(table=table)
+        timings = []
+        with db_transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_indexscan = off')
+                cursor.execute('SET LOCAL enable_indexonlyscan = off')
+                cursor.execute('SET LOCAL enable_bitmapscan = off')
+            for attempt in range(repeat + 1):
+                started = time.perf_counter()
+                cursor.execute(sql)
+                cursor.fetchall()
+                if attempt:
+                    timings.append((time.perf_counter() - started) * 1000)
+        return round(statistics.median(timings), 2)
+
+    @staticmethod
+    def _page_bytes(page_size: int):
+        """Kích thước JSON của một trang danh sách: kèm original_nlp_input (cũ) và hiện tại"""
+        queryset = Transaction.objects.order_by('-id')[:page_size]
+        data = ValuesReader(TransactionSerializer).read(queryset)
+        texts = dict(
+            TransactionSource.objects.filter(transaction_id__in=[item['id'] for item in data])
+            .values_list('transaction_id', 'text')
+        )
+        renderer = FastJSONRenderer()
+        before = [{**item, 'original_nlp_input': texts[item['id']][:500] if item['id'] in texts else None}
+                  for item in data]
+        return len(renderer.render(before)), len(renderer.render(data))
+
+    @staticmethod
+    def _format(key: str, value) -> str:
+        if value is None:
+            return '-'
+        if key.endswith('bytes'):
+            return f'{value / 1024:,.1f} KiB'
+        return f'{value:.2f}'
@@ -0,0 +1,180 @@
+"""
+Management command kiểm tra kế hoạch thực thi (EXPLAIN) của các query phân tích chính
+trên dữ liệu giả lập: mỗi query phải dùng index mong đợi và không quét tuần tự
+bảng finance_transaction khi bảng đủ lớn
+"""
+import json
+import re
+from collections import namedtuple
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from finance.instrumentation import explain
+from finance.partitioning import index_aliases
+from finance.models import Budget, SpendingPattern, Transaction
+
+
+# build nhận context (user, category, ngày) và trả về queryset; indexes: một trong các index phải xuất hiện
+PlanCase = namedtuple('PlanCase', 'name source build indexes')
+
+
+def _window(ctx):
+    return Transaction.objects.filter(
+        user=ctx['user'],
+        transaction_date__gte=ctx['today'] - timedelta(days=90),
+        transaction_date__lte=ctx['today'],
+    )
+
+
+CASES = [
+    PlanCase('transaction_list', 'TransactionViewSet.list',
+             lambda ctx: Transaction.objects.filter(user=ctx['user'])[:50],
+             ('tx_user_date_cover_idx',)),
+    PlanCase('analysis_window', 'AIService.load_window',
+             lambda ctx: _window(ctx).order_by('-transaction_date', '-created_at').values(
+                 'id', 'amount', 'transaction_date', 'type', 'category__name'),
+             ('tx_user_date_cover_idx',)),
+    PlanCase('statistics_total', 'statistics / custom_report',
+             lambda ctx: _window(ctx).filter(type='expense').values('user').annotate(total=Sum('amount')),
+             ('tx_user_type_date_idx',)),
+    PlanCase('statistics_by_category', 'statistics / custom_report',
+             lambda ctx: _window(ctx).values('category__name', 'type').annotate(
+                 total=Sum('amount'), count=Count('id')).order_by('-total'),
+             ('tx_user_date_cover_idx',)),
+    PlanCase('statistics_by_day', 'statistics / custom_report',
+             lambda ctx: _window(ctx).values('transaction_date').annotate(
+                 income=Sum('amount', filter=Q(type='income')),
+                 expense=Sum('amount', filter=Q(type='expense'))).order_by('transaction_date'),
+             ('tx_user_date_cover_idx',)),
+    PlanCase('budget_spent', 'NotificationService.check_budget_exceeded',
+             lambda ctx: Transaction.objects.filter(
+                 user=ctx['user'], category=ctx['category'],
+                 transaction_date__gte=ctx['today'].replace(day=1), transaction_date__lte=ctx['today'],
+                 type='expense').values('user').annotate(total=Sum('amount')),
+             ('tx_user_category_date_idx',)),
+    PlanCase('transaction_sync', 'TransactionViewSet.sync / sync_all',
+             lambda ctx: Transaction.objects.filter(
+                 user=ctx['user'], updated_at__gt=ctx['now'] - timedelta(days=1)
+             ).order_by('-updated_at', '-created_at')[:100],
+             ('tx_user_updated_idx',)),
+    PlanCase('import_dedup', 'ImportService._write_chunk',
+             lambda ctx: Transaction.objects.filter(
+                 user=ctx['user'], import_hash__in=['0' * 40, 'f' * 40]).values_list('import_hash', flat=True),
+             ('tx_user_import_hash_idx',)),
+    PlanCase('budgets_active', 'AIService.suggest_savings_plan',
+             lambda ctx: Budget.objects.filter(
+                 user=ctx['user'], start_date__lte=ctx['today'], end_date__gte=ctx['today'] - timedelta(days=30)),
+             ('budget_user_period_idx',)),
+    PlanCase('budgets_sync', 'BudgetViewSet.sync / sync_all',
+             lambda ctx: Budget.objects.filter(
+                 user=ctx['user'], created_at__gt=ctx['now'] - timedelta(days=1)).order_by('-created_at')[:50],
+             ('budget_user_created_idx',)),
+    PlanCase('spending_pattern', 'AIService.update_spending_patterns',
+             lambda ctx: SpendingPattern.objects.filter(user=ctx['user'], category=ctx['category']),
+             # Index unique của unique_together (tên sinh tự động, hậu tố hash)
+             ('finance_spendingpattern_user_id_category_id',)),
+]
+
+# Quét toàn bảng finance_transaction (kể cả quét hết một index trên SQLite, các partition trên Postgres)
+SEQ_SCAN_RE = {
+    'postgresql': re.compile(r'Seq Scan on finance_transaction(_y\d{4}(m\d{2})?|_default)?\b'),
+    'sqlite': re.compile(r'\bSCAN (TABLE )?finance_transaction\b'),
+}
+
+
+class Command(BaseCommand):
+    help = ('Chạy EXPLAIN cho các query phân tích chính trên dữ liệu giả lập, kiểm tra index được dùng '
+            'và không có Seq Scan trên finance_transaction')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Số user giả lập cần có')
+        parser.add_argument('--transactions', type=int, default=2000, help='Số giao dịch chi tiêu mỗi user')
+        parser.add_argument('--prefix', type=str, default='plans', help='Tiền tố username của user giả lập')
+        parser.add_argument('--min-rows', type=int, default=10000,
+                            help='Chỉ coi Seq Scan là lỗi khi finance_transaction có ít nhất số dòng này')
+        parser.add_argument('--cases', type=str, default='', help='Chỉ chạy các case này (cách nhau bởi dấu phẩy)')
+        parser.add_argument('--verbose-plans', action='store_true', help='In toàn bộ kế hoạch thực thi')
+        parser.add_argument('--json', dest='json_output', type=str, help='Ghi kế hoạch thực thi ra file JSON')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in SEQ_SCAN_RE:
+            raise CommandError(f'Chưa hỗ trợ database {connection.vendor}')
+
+        cases = CASES
+        if options['cases']:
+            selected = {name.strip() for name in options['cases'].split(',') if name.strip()}
+            cases = [case for case in CASES if case.name in selected]
+            if len(cases) != len(selected):
+                raise CommandError(f'Case không tồn tại: {", ".join(selected - {c.name for c in CASES})}')
+
+        user = self._ensure_data(options)
+        # Cập nhật thống kê để planner chọn kế hoạch như trên dữ liệu thật
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        table_rows = Transaction.objects.count()
+        enforce_seq_scan = table_rows >= options['min_rows']
+
+        ctx = {
+            'user': user,
+            'category': Transaction.objects.filter(
+                user=user, type='expense', category__isnull=False).values_list('category', flat=True).first(),
+            'today': timezone.localdate(),
+            'now': timezone.now(),
+        }
+        self.stdout.write(f'{connection.vendor}: finance_transaction có {table_rows} dòng'
+                          + ('' if enforce_seq_scan else f' (< {options["min_rows"]}, bỏ qua kiểm tra Seq Scan)'))
+        self.stdout.write(f'{"Case":<26}{"index":<46}{"kết quả":<10}nguồn')
+
+        failures = []
+        report = {}
+        for case in cases:
+            queryset = case.build(ctx)
+            sql, params = queryset.query.sql_with_params()
+            plan = explain(connection, sql, params)
+            report[case.name] = {'source': case.source, 'sql': sql, 'plan': plan}
+
+            problems = []
+            # Bảng đã partition: plan dùng index con trên từng partition (xem finance/partitioning.py)
+            used = next((name for name in case.indexes
+                         if any(alias in plan for alias in index_aliases(name))), None)
+            if used is None:
+                problems.append(f'không dùng index {" / ".join(case.indexes)}')
+            if enforce_seq_scan and SEQ_SCAN_RE[connection.vendor].search(plan):
+                problems.append('quét tuần tự finance_transaction')
+
+            line = f'{case.name:<26}{(used or "-"):<46}{("lỗi" if problems else "ok"):<10}{case.source}'
+            self.stdout.write(self.style.ERROR(line) if problems else line)
+            if problems or options['verbose_plans']:
+                for plan_line in plan.splitlines():
+                    self.stdout.write(f'    {plan_line}')
+            failures.extend(f'{case.name}: {problem}' for problem in problems)
+
+        if options['json_output']:
+            with open(options['json_output'], 'w', encoding='utf-8') as f:
+                json.dump({'database': connection.vendor, 'rows': table_rows, 'cases': report},
+                          f, indent=2, ensure_ascii=False)
+
+        if failures:
+            for failure in failures:
+                self.stderr.write(f'  - {failure}')
+            raise CommandError(f'{len(failures)} kế hoạch thực thi không đạt')
+        self.stdout.write(self.style.SUCCESS(f'\nHoàn thành! {len(cases)} query đều dùng đúng index'))
+
+    def _ensure_data(self, options):
+        """Sinh user giả lập bằng generate_synthetic_data nếu chưa đủ; trả về user đầu tiên"""
+        prefix = options['prefix']
+        existing = User.objects.filter(username__startswith=f'{prefix}_').count()
+        if existing < options['users']:
+            self.stdout.write(f'Sinh {options["users"]} user x {options["transactions"]} giao dịch...')
+            User.objects.filter(username__startswith=f'{prefix}_').delete()
+            call_command(
+                'generate_synthetic_data', users=options['users'], transactions=options['transactions'],
+                prefix=prefix, stdout=self.stdout
+            )
+        return User.objects.filter(username__startswith=f'{prefix}_').order_by('username').first()
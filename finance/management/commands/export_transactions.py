@@ -0,0 +1,55 @@
+"""
+Management command để xuất giao dịch của một user ra file (CSV, NDJSON, XLSX)
+"""
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.export_service import ExportService
+from finance.filters import filter_transactions
+from finance.models import Transaction
+
+
+class Command(BaseCommand):
+    help = 'Xuất giao dịch dạng stream, bộ nhớ không tăng theo số dòng'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', type=str, help='Username cần xuất giao dịch')
+        parser.add_argument('--format', dest='file_format', choices=list(ExportService.FORMATS), default='csv')
+        parser.add_argument('--output', type=str, help='File đầu ra (mặc định: stdout, không dùng cho xlsx)')
+        parser.add_argument('--category', type=int, help='Lọc theo ID danh mục')
+        parser.add_argument('--start-date', type=str, help='YYYY-MM-DD')
+        parser.add_argument('--end-date', type=str, help='YYYY-MM-DD')
+        parser.add_argument('--chunk-size', type=int, default=ExportService.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Không tìm thấy user: {options["username"]}')
+        
+        queryset = filter_transactions(Transaction.objects.filter(user=user), options)
+        rows = ExportService.iter_rows(queryset, options['chunk_size'])
+        file_format = options['file_format']
+        
+        if file_format == 'xlsx':
+            if not options['output']:
+                raise CommandError('Cần --output khi xuất xlsx')
+            with open(options['output'], 'wb') as f:
+                ExportService.write_xlsx(rows, f)
+        else:
+            iter_content = ExportService.iter_ndjson if file_format == 'ndjson' else ExportService.iter_csv
+            if options['output']:
+                f = open(options['output'], 'w', encoding='utf-8', newline='')
+            else:
+                f = sys.stdout
+            try:
+                for chunk in iter_content(rows):
+                    f.write(chunk)
+            finally:
+                if f is not sys.stdout:
+                    f.close()
+        
+        if options['output']:
+            self.stderr.write(self.style.SUCCESS(f'Đã xuất giao dịch ra {options["output"]}'))
@@ -0,0 +1,190 @@
+"""
+Management command để sinh dữ liệu giả lập quy mô lớn (nhiều user, hàng triệu giao dịch)
+"""
+import itertools
+import math
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+
+from finance.models import Category, Transaction, Budget, UserPreferences
+
+
+# Hồ sơ chi tiêu theo danh mục:
+# (trọng số tần suất, số tiền trung vị, độ phân tán log-normal, mùa cao điểm {tháng: hệ số})
+EXPENSE_PROFILES = {
+    'Ăn uống': (40, 60000, 0.6, {1: 1.3, 2: 1.4, 12: 1.2}),
+    'Di chuyển': (20, 40000, 0.7, {2: 1.3}),
+    'Mua sắm': (10, 350000, 0.9, {1: 1.5, 2: 1.3, 11: 1.6, 12: 1.8}),
+    'Giải trí': (8, 200000, 0.8, {6: 1.3, 7: 1.4, 12: 1.3}),
+    'Y tế': (3, 300000, 1.0, {}),
+    'Học tập': (3, 500000, 0.9, {8: 2.0, 9: 2.0}),
+    'Hóa đơn': (4, 400000, 0.4, {5: 1.3, 6: 1.4, 7: 1.4}),
+    'Khác': (4, 150000, 1.0, {}),
+}
+
+# Thu nhập: (danh mục, số tiền trung vị, số lần mỗi tháng)
+INCOME_PROFILES = [
+    ('Lương', 15000000, 1),
+    ('Thu nhập kinh doanh', 3000000, 0.3),
+    ('Đầu tư', 1000000, 0.2),
+    ('Thu nhập khác', 500000, 0.3),
+]
+
+DESCRIPTIONS = {
+    'Ăn uống': ['Ăn sáng phở', 'Cà phê', 'Ăn trưa văn phòng', 'Trà sữa', 'Đi ăn tối', 'Bún chả'],
+    'Di chuyển': ['Grab đi làm', 'Đổ xăng', 'Taxi', 'Xe bus', 'Gửi xe'],
+    'Mua sắm': ['Mua quần áo', 'Siêu thị', 'Mua đồ gia dụng', 'Shopee', 'Giày dép'],
+    'Giải trí': ['Xem phim', 'Karaoke', 'Du lịch cuối tuần', 'Game'],
+    'Y tế': ['Khám bệnh', 'Mua thuốc', 'Nha khoa'],
+    'Học tập': ['Học phí', 'Mua sách', 'Khóa học online'],
+    'Hóa đơn': ['Tiền điện', 'Tiền nước', 'Internet', 'Điện thoại'],
+    'Khác': ['Quà tặng', 'Chi phí khác', 'Sửa chữa'],
+}
+
+
+class Command(BaseCommand):
+    help = 'Sinh N user với lịch sử giao dịch theo mùa, lệch theo danh mục (dùng bulk_create)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Số user cần tạo')
+        parser.add_argument('--transactions', type=int, default=10000, help='Số giao dịch chi tiêu mỗi user')
+        parser.add_argument('--months', type=int, default=24, help='Trải dữ liệu trong bao nhiêu tháng gần nhất')
+        parser.add_argument('--prefix', type=str, default='synth', help='Tiền tố username')
+        parser.add_argument('--password', type=str, default='synth12345')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['users'] <= 0 or options['transactions'] < 0 or options['months'] <= 0:
+            raise CommandError('--users, --months phải > 0 và --transactions >= 0')
+
+        rng = random.Random(options['seed'])
+        if not Category.objects.exists():
+            call_command('init_categories', stdout=self.stdout)
+        categories = {c.name: c for c in Category.objects.all()}
+        missing = [name for name in EXPENSE_PROFILES if name not in categories]
+        if missing:
+            raise CommandError(f'Thiếu danh mục: {", ".join(missing)}. Hãy chạy init_categories')
+
+        # Hash mật khẩu một lần cho tất cả user (PBKDF2 rất chậm)
+        password_hash = make_password(options['password'])
+
+        end_date = date.today()
+        start_date = end_date - timedelta(days=30 * options['months'])
+        total_days = (end_date - start_date).days
+
+        started = time.monotonic()
+        total_created = 0
+        for index in range(options['users']):
+            username = f"{options['prefix']}_{index:05d}"
+            user, created = User.objects.get_or_create(
+                username=username,
+                defaults={'email': f'{username}@example.com', 'password': password_hash}
+            )
+            if created:
+                UserPreferences.objects.get_or_create(user=user)
+
+            # Mỗi user có mức chi tiêu riêng
+            user_scale = rng.lognormvariate(0, 0.4)
+            rows = itertools.chain(
+                self._expense_rows(
+                    rng, user, categories, options['transactions'], start_date, total_days, user_scale
+                ),
+                self._income_rows(rng, user, categories, start_date, end_date, user_scale),
+            )
+
+            # Ghi theo từng batch để bộ nhớ không tăng theo số giao dịch
+            user_created = 0
+            while True:
+                batch = list(itertools.islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                with db_transaction.atomic():
+                    Transaction.objects.bulk_create(batch)
+                user_created += len(batch)
+            if created:
+                self._create_budgets(rng, user, categories, end_date, user_scale)
+
+            total_created += user_created
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'{username}: {user_created} giao dịch (tổng {total_created}, {total_created / elapsed:,.0f} dòng/giây)'
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nHoàn thành! Đã tạo {total_created} giao dịch cho {options["users"]} user '
+                f'trong {time.monotonic() - started:.1f}s. Mật khẩu: {options["password"]}'
+            )
+        )
+
+    def _expense_rows(self, rng, user, categories, count, start_date, total_days, user_scale):
+        """Sinh giao dịch chi tiêu: tần suất lệch theo danh mục, theo mùa và cuối tuần"""
+        names = list(EXPENSE_PROFILES)
+        weights = [EXPENSE_PROFILES[name][0] for name in names]
+        created = 0
+        while created < count:
+            day = start_date + timedelta(days=rng.randrange(total_days + 1))
+            name = rng.choices(names, weights)[0]
+            _, median, sigma, season = EXPENSE_PROFILES[name]
+            seasonal = season.get(day.month, 1.0)
+            weekend = 1.3 if day.weekday() >= 5 else 1.0
+
+            # Loại bỏ ngẫu nhiên để mật độ giao dịch theo mùa / cuối tuần
+            if rng.random() > seasonal * weekend / 2.4:
+                continue
+
+            amount = median * user_scale * rng.lognormvariate(0, sigma) * math.sqrt(seasonal)
+            created += 1
+            yield Transaction(
+                user=user,
+                category=categories[name],
+                type=categories[name].type,
+                amount=Decimal(max(1000, round(amount, -3))),
+                description=rng.choice(DESCRIPTIONS[name]),
+                transaction_date=day,
+            )
+
+    def _income_rows(self, rng, user, categories, start_date, end_date, user_scale):
+        """Sinh thu nhập hàng tháng (lương cố định, các khoản khác ngẫu nhiên)"""
+        month = date(start_date.year, start_date.month, 1)
+        while month <= end_date:
+            for name, median, per_month in INCOME_PROFILES:
+                if name not in categories or rng.random() > per_month:
+                    continue
+                bonus = 2.0 if name == 'Lương' and month.month == 1 else 1.0  # Thưởng Tết
+                day = month + timedelta(days=rng.randrange(28))
+                if day > end_date:
+                    continue
+                yield Transaction(
+                    user=user,
+                    category=categories[name],
+                    type=categories[name].type,
+                    amount=Decimal(round(median * user_scale * bonus * rng.lognormvariate(0, 0.2), -3)),
+                    description=name,
+                    transaction_date=day,
+                )
+            month = date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+    def _create_budgets(self, rng, user, categories, end_date, user_scale):
+        """Tạo ngân sách tháng cho vài danh mục chính"""
+        month_start = date(end_date.year, end_date.month, 1)
+        Budget.objects.bulk_create([
+            Budget(
+                user=user,
+                category=categories[name],
+                amount=Decimal(round(EXPENSE_PROFILES[name][1] * user_scale * 20 * rng.uniform(0.8, 1.2), -3)),
+                period='monthly',
+                start_date=month_start,
+                end_date=month_start + timedelta(days=30),
+            )
+            for name in ['Ăn uống', 'Di chuyển', 'Mua sắm', 'Giải trí']
+        ])
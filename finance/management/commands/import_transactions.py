@@ -0,0 +1,59 @@
+"""
+Management command để import giao dịch từ file CSV / OFX cho một user
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.import_service import ImportService
+
+
+class Command(BaseCommand):
+    help = 'Import giao dịch từ file CSV hoặc sao kê OFX (đọc theo stream, ghi bằng bulk_create)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', type=str)
+        parser.add_argument('path', type=str, help='Đường dẫn file CSV/OFX')
+        parser.add_argument('--format', dest='file_format', choices=['csv', 'ofx'], help='Mặc định: theo phần mở rộng')
+        parser.add_argument('--chunk-size', type=int, default=ImportService.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Không tìm thấy user: {options["username"]}')
+        
+        file_format = options['file_format']
+        if not file_format:
+            file_format = 'ofx' if options['path'].lower().endswith(('.ofx', '.qfx')) else 'csv'
+        
+        started = time.monotonic()
+        
+        def report(stats):
+            elapsed = time.monotonic() - started
+            rate = stats['processed_rows'] / elapsed if elapsed > 0 else 0
+            self.stdout.write(
+                f"Đã xử lý {stats['processed_rows']} dòng "
+                f"(tạo {stats['created_count']}, trùng {stats['duplicate_count']}, lỗi {stats['error_count']}) "
+                f"- {rate:,.0f} dòng/giây"
+            )
+        
+        with open(options['path'], 'rb') as f:
+            stats = ImportService.import_rows(
+                user,
+                ImportService.iter_file_rows(f, file_format),
+                progress=report,
+                chunk_size=options['chunk_size']
+            )
+        
+        for error in stats['errors']:
+            self.stdout.write(self.style.WARNING(f"Dòng {error['row']}: {error['error']}"))
+        
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\nHoàn thành! Tạo {stats['created_count']} giao dịch, bỏ qua {stats['duplicate_count']} "
+                f"giao dịch trùng trong {elapsed:.2f}s."
+            )
+        )
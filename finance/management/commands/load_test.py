@@ -0,0 +1,181 @@
+"""
+Management command để chạy load test các API endpoints chính
+(dùng chung với dữ liệu từ generate_synthetic_data)
+"""
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from rest_framework.authtoken.models import Token
+
+from finance.models import Category
+
+
+# Tên kịch bản -> (method, path, hàm tạo body)
+SCENARIOS = {
+    'statistics': ('GET', '/api/transactions/statistics/', None),
+    'ai_trends': ('GET', '/api/ai/trends/', None),
+    'ai_predictions': ('GET', '/api/ai/predictions/', None),
+    'ai_anomalies': ('GET', '/api/ai/anomalies/', None),
+    'ai_savings': ('GET', '/api/ai/savings-suggestions/', None),
+    'ai_insights': ('GET', '/api/ai/insights/', None),
+    'sync_all': ('GET', '/api/sync/all/', None),
+    'bulk_sync': ('POST', '/api/transactions/bulk_sync/', lambda ctx: {
+        'transactions': [
+            {
+                'amount': random.choice([25000, 50000, 120000]),
+                'category': ctx['category_id'],
+                'description': 'Load test',
+                'transaction_date': date.today().isoformat(),
+            }
+            for _ in range(5)
+        ],
+        'deleted_ids': [],
+    }),
+    'nlp_input': ('POST', '/api/transactions/nlp_input/', lambda ctx: {
+        'text': random.choice(['Hôm nay chi 50k ăn sáng', 'Chi 200k mua quần áo', 'Nhận lương 15 triệu']),
+    }),
+}
+
+
+def percentile(sorted_values, pct):
+    """Percentile theo nearest-rank trên list đã sắp xếp"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class Command(BaseCommand):
+    help = 'Load test các endpoints (statistics, AI, sync_all, bulk_sync, nlp_input), báo cáo throughput và p50/p95/p99'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url', type=str,
+            help='Gửi HTTP thật tới server này (vd: http://127.0.0.1:8000). Mặc định: gọi in-process bằng test Client'
+        )
+        parser.add_argument('--prefix', type=str, default='synth', help='Tiền tố username của user giả lập')
+        parser.add_argument('--user-count', type=int, default=10, help='Số user dùng để gửi request')
+        parser.add_argument('--requests', type=int, default=50, help='Số request cho mỗi kịch bản')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--scenarios', type=str, default=','.join(SCENARIOS),
+            help=f'Danh sách kịch bản, phân cách bằng dấu phẩy: {", ".join(SCENARIOS)}'
+        )
+        parser.add_argument('--json', dest='json_output', type=str, help='Ghi kết quả ra file JSON')
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = [name for name in scenarios if name not in SCENARIOS]
+        if unknown:
+            raise CommandError(f'Kịch bản không tồn tại: {", ".join(unknown)}')
+
+        users = list(User.objects.filter(username__startswith=f"{options['prefix']}_")[:options['user_count']])
+        if not users:
+            raise CommandError('Không có user giả lập. Hãy chạy generate_synthetic_data trước')
+        tokens = [Token.objects.get_or_create(user=user)[0].key for user in users]
+
+        category = Category.objects.filter(type='expense').first()
+        context = {'category_id': category.id if category else None}
+
+        tasks = [(name, random.choice(tokens)) for name in scenarios for _ in range(options['requests'])]
+        random.shuffle(tasks)
+
+        send = self._http_sender(options['base_url']) if options['base_url'] else self._client_sender()
+        results = {name: {'latencies': [], 'errors': 0} for name in scenarios}
+        lock = threading.Lock()
+
+        def run(task):
+            name, token = task
+            method, path, body_factory = SCENARIOS[name]
+            body = body_factory(context) if body_factory else None
+            started = time.perf_counter()
+            try:
+                ok = send(method, path, token, body)
+            except Exception:
+                ok = False
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with lock:
+                results[name]['latencies'].append(elapsed_ms)
+                if not ok:
+                    results[name]['errors'] += 1
+
+        self.stdout.write(
+            f'Chạy {len(tasks)} request với {options["concurrency"]} luồng, {len(users)} user...'
+        )
+        wall_started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(run, tasks))
+        wall = time.perf_counter() - wall_started
+
+        report = {'total_requests': len(tasks), 'wall_seconds': round(wall, 3),
+                  'throughput_rps': round(len(tasks) / wall, 2) if wall else 0, 'scenarios': {}}
+        self.stdout.write(f'\n{"Kịch bản":<16}{"n":>6}{"lỗi":>6}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"max ms":>10}')
+        for name in scenarios:
+            latencies = sorted(results[name]['latencies'])
+            row = {
+                'count': len(latencies),
+                'errors': results[name]['errors'],
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p95_ms': round(percentile(latencies, 95), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+                'max_ms': round(latencies[-1], 2) if latencies else 0,
+            }
+            report['scenarios'][name] = row
+            self.stdout.write(
+                f'{name:<16}{row["count"]:>6}{row["errors"]:>6}{row["p50_ms"]:>10.1f}'
+                f'{row["p95_ms"]:>10.1f}{row["p99_ms"]:>10.1f}{row["max_ms"]:>10.1f}'
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'\nThroughput: {report["throughput_rps"]} request/giây trong {wall:.2f}s')
+        )
+        if options['json_output']:
+            with open(options['json_output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+
+    def _http_sender(self, base_url):
+        """Gửi request HTTP thật tới server đang chạy"""
+        base_url = base_url.rstrip('/')
+
+        def send(method, path, token, body):
+            data = json.dumps(body).encode('utf-8') if body is not None else None
+            request = urllib.request.Request(base_url + path, data=data, method=method)
+            request.add_header('Authorization', f'Token {token}')
+            request.add_header('Content-Type', 'application/json')
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    response.read()
+                    return response.status < 400
+            except urllib.error.HTTPError as e:
+                e.read()
+                return False
+        return send
+
+    def _client_sender(self):
+        """Gọi in-process qua test Client (đi qua đầy đủ middleware, không cần server)"""
+        from django.test import Client
+        local = threading.local()
+
+        def send(method, path, token, body):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            headers = {'HTTP_AUTHORIZATION': f'Token {token}'}
+            try:
+                if method == 'GET':
+                    response = local.client.get(path, **headers)
+                else:
+                    response = local.client.post(path, data=json.dumps(body), content_type='application/json', **headers)
+                return response.status_code < 400
+            finally:
+                close_old_connections()
+        return send
@@ -0,0 +1,124 @@
+"""
+Management command quản lý partition của finance_transaction theo transaction_date (chỉ PostgreSQL)
+- status: liệt kê partition và số dòng
+- convert: chuyển bảng hiện tại sang bảng partition (chạy một lần, trong giờ bảo trì)
+- create: tạo trước các partition tương lai (chạy định kỳ, vd. cron hàng tháng)
+- detach: tách các partition cũ để lưu trữ / xóa
+- drop-legacy: xóa bảng cũ giữ lại sau khi convert
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from finance import partitioning
+
+
+class Command(BaseCommand):
+    help = 'Quản lý partition theo transaction_date của finance_transaction (PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['status', 'convert', 'create', 'detach', 'drop-legacy'])
+        parser.add_argument('--interval', choices=['month', 'year'],
+                            help='Độ dài mỗi partition (mặc định TRANSACTION_PARTITIONING["INTERVAL"])')
+        parser.add_argument('--premake', type=int, help='Số partition tương lai cần có sẵn')
+        parser.add_argument('--before', type=date.fromisoformat,
+                            help='detach: tách các partition kết thúc trước ngày này (YYYY-MM-DD)')
+        parser.add_argument('--keep', type=int,
+                            help='detach: giữ lại số partition gần nhất này (mặc định TRANSACTION_PARTITIONING["RETENTION"])')
+        parser.add_argument('--mode', choices=['archive', 'detach', 'drop'], default='archive',
+                            help='detach: chuyển sang schema lưu trữ, giữ thành bảng riêng hoặc xóa hẳn')
+        parser.add_argument('--archive-schema', type=str, help='Schema lưu trữ (mặc định TRANSACTION_PARTITIONING)')
+        parser.add_argument('--dry-run', action='store_true', help='detach: chỉ liệt kê partition sẽ tách')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partition chỉ hỗ trợ PostgreSQL')
+        config = partitioning.get_config()
+        interval = options['interval'] or config['INTERVAL']
+        premake = config['PREMAKE'] if options['premake'] is None else options['premake']
+
+        action = options['action']
+        if action == 'convert':
+            try:
+                result = partitioning.convert_to_partitioned(interval, premake)
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(f'Đã chép {result["rows"]} giao dịch vào {result["partitions"]} partition')
+            if result['dropped_foreign_keys']:
+                self.stdout.write(f'Đã bỏ khóa ngoại trỏ tới {partitioning.TABLE}: '
+                                  f'{", ".join(result["dropped_foreign_keys"])}')
+            self.stdout.write(self.style.SUCCESS(
+                f'\nHoàn thành! Bảng cũ giữ tại {partitioning.LEGACY_TABLE} '
+                f'(xóa bằng `partition_transactions drop-legacy` sau khi kiểm tra)'
+            ))
+            return
+
+        if action == 'drop-legacy':
+            if not partitioning.table_exists(partitioning.LEGACY_TABLE):
+                raise CommandError(f'Không có bảng {partitioning.LEGACY_TABLE}')
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE {connection.ops.quote_name(partitioning.LEGACY_TABLE)}')
+            self.stdout.write(self.style.SUCCESS(f'\nHoàn thành! Đã xóa {partitioning.LEGACY_TABLE}'))
+            return
+
+        if not partitioning.is_partitioned():
+            raise CommandError(f'{partitioning.TABLE} chưa được partition, chạy `partition_transactions convert` trước')
+
+        if action == 'status':
+            self._status()
+        elif action == 'create':
+            until = partitioning.add_periods(partitioning.period_start(date.today(), interval), premake, interval)
+            created = partitioning.ensure_partitions(until, interval)
+            for name in created:
+                self.stdout.write(f'  + {name}')
+            self.stdout.write(self.style.SUCCESS(
+                f'\nHoàn thành! Đã tạo {len(created)} partition, có sẵn tới {until.isoformat()}'
+            ))
+        else:
+            self._detach(options, config)
+
+    def _status(self):
+        partitions = partitioning.list_partitions()
+        with connection.cursor() as cursor:
+            self.stdout.write(f'{"Partition":<44}{"từ":<12}{"đến":<12}{"số dòng":>12}{"kích thước":>14}')
+            for partition in partitions:
+                name = connection.ops.quote_name(partition.name)
+                cursor.execute(f'SELECT COUNT(*), pg_total_relation_size(%s::regclass) FROM {name}', [partition.name])
+                rows, size = cursor.fetchone()
+                start = partition.start.isoformat() if partition.start else 'DEFAULT'
+                end = partition.end.isoformat() if partition.end else ''
+                self.stdout.write(f'{partition.name:<44}{start:<12}{end:<12}{rows:>12}{size / 1024 ** 2:>11.1f} MB')
+        if partitioning.table_exists(partitioning.LEGACY_TABLE):
+            self.stdout.write(f'Bảng cũ còn giữ: {partitioning.LEGACY_TABLE}')
+        self.stdout.write(self.style.SUCCESS(f'\nHoàn thành! {len(partitions)} partition'))
+
+    def _detach(self, options, config):
+        partitions = [p for p in partitioning.list_partitions() if not p.is_default]
+        keep = config['RETENTION'] if options['keep'] is None else options['keep']
+        if options['before']:
+            targets = [p for p in partitions if p.end <= options['before']]
+        elif keep is not None:
+            # Không tính các partition tương lai vào số kỳ được giữ
+            past = [p for p in partitions if p.start <= date.today()]
+            targets = past[:max(len(past) - keep, 0)]
+        else:
+            raise CommandError('Cần --before, --keep hoặc TRANSACTION_PARTITIONING["RETENTION"]')
+
+        schema = options['archive_schema'] or config['ARCHIVE_SCHEMA']
+        total = 0
+        for partition in targets:
+            if options['dry_run']:
+                self.stdout.write(f'  - {partition.name} ({partition.start} → {partition.end})')
+                continue
+            rows = partitioning.detach_partition(partition, options['mode'], schema)
+            total += rows
+            self.stdout.write(f'  - {partition.name}: {rows} giao dịch')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'\nHoàn thành! Sẽ tách {len(targets)} partition'))
+            return
+        where = {'archive': f'chuyển sang schema {schema}', 'detach': 'giữ thành bảng riêng', 'drop': 'xóa'}
+        self.stdout.write(self.style.SUCCESS(
+            f'\nHoàn thành! Đã tách {len(targets)} partition ({total} giao dịch), {where[options["mode"]]}'
+        ))
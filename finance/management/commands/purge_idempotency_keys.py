@@ -0,0 +1,19 @@
+"""
+Management command để xóa các Idempotency-Key đã hết hạn
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Xóa các Idempotency-Key đã hết hạn theo từng batch (nên chạy định kỳ bằng cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Số dòng mỗi batch')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size phải lớn hơn 0')
+        deleted = purge_expired(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'\nHoàn thành! Đã xóa {deleted} Idempotency-Key hết hạn'))
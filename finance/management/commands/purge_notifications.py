@@ -0,0 +1,95 @@
+"""
+Management command để xóa/lưu trữ notifications cũ theo chính sách retention
+"""
+import gzip
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from finance.notification_service import purge_notifications, archive_to_table
+
+
+class Command(BaseCommand):
+    help = 'Xóa notifications cũ theo từng batch, có thể lưu trữ vào bảng archive hoặc file'
+
+    def add_arguments(self, parser):
+        retention = getattr(settings, 'NOTIFICATION_RETENTION', {})
+        parser.add_argument(
+            '--read-days', type=int, default=retention.get('READ_DAYS', 90),
+            help='Xóa notifications đã đọc cũ hơn số ngày này'
+        )
+        parser.add_argument(
+            '--unread-days', type=int, default=retention.get('UNREAD_DAYS', 0),
+            help='Xóa cả notifications chưa đọc cũ hơn số ngày này (0 = giữ lại)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=retention.get('BATCH_SIZE', 1000),
+            help='Số dòng mỗi batch'
+        )
+        parser.add_argument(
+            '--archive', choices=['table', 'file', 'none'], default=retention.get('ARCHIVE', 'table'),
+            help='Nơi lưu trữ trước khi xóa'
+        )
+        parser.add_argument('--output', type=str, help='File .jsonl.gz khi dùng --archive=file')
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help='Nghỉ giữa các batch (giây) để giảm tải cho database'
+        )
+
+    def handle(self, *args, **options):
+        if options['read_days'] <= 0:
+            raise CommandError('--read-days phải lớn hơn 0')
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size phải lớn hơn 0')
+        
+        now = timezone.now()
+        read_before = now - timedelta(days=options['read_days'])
+        unread_before = now - timedelta(days=options['unread_days']) if options['unread_days'] > 0 else None
+        
+        archive_file = None
+        if options['archive'] == 'table':
+            archive = archive_to_table
+        elif options['archive'] == 'file':
+            if not options['output']:
+                raise CommandError('Cần --output khi dùng --archive=file')
+            archive_file = gzip.open(options['output'], 'at', encoding='utf-8')
+            
+            def archive(rows):
+                for row in rows:
+                    archive_file.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+                archive_file.flush()
+        else:
+            archive = None
+        
+        total = 0
+        started = time.monotonic()
+        try:
+            for deleted in purge_notifications(
+                read_before,
+                unread_before=unread_before,
+                batch_size=options['batch_size'],
+                archive=archive
+            ):
+                total += deleted
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'Đã xử lý {total} notifications ({total / elapsed:,.0f} dòng/giây)'
+                )
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+        finally:
+            if archive_file:
+                archive_file.close()
+        
+        elapsed = time.monotonic() - started
+        rate = total / elapsed if elapsed > 0 else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nHoàn thành! Đã xóa {total} notifications trong {elapsed:.2f}s ({rate:,.0f} dòng/giây).'
+            )
+        )
@@ -0,0 +1,55 @@
+"""
+Management command để đối soát bộ đếm notifications chưa đọc với dữ liệu thật
+"""
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db.models import Count, Q
+
+from finance.models import NotificationCounter
+
+
+class Command(BaseCommand):
+    help = 'Tính lại bộ đếm notifications chưa đọc và sửa các giá trị bị lệch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=str, help='Chỉ đối soát cho username này')
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ báo cáo, không sửa')
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(username=options['user'])
+        
+        # Một query duy nhất để lấy số thật của mọi user
+        actual = users.annotate(
+            unread=Count('notifications', filter=Q(notifications__is_read=False))
+        ).values_list('id', 'unread')
+        counters = {
+            c.user_id: c for c in NotificationCounter.objects.filter(user__in=users)
+        }
+        
+        to_create = []
+        to_update = []
+        for user_id, unread in actual.iterator(chunk_size=2000):
+            counter = counters.get(user_id)
+            if counter is None:
+                to_create.append(NotificationCounter(user_id=user_id, unread_count=unread))
+            elif counter.unread_count != unread:
+                self.stdout.write(
+                    self.style.WARNING(f'User {user_id}: {counter.unread_count} -> {unread}')
+                )
+                counter.unread_count = unread
+                counter.version += 1
+                to_update.append(counter)
+        
+        if not options['dry_run']:
+            NotificationCounter.objects.bulk_create(to_create, batch_size=1000)
+            NotificationCounter.objects.bulk_update(
+                to_update, ['unread_count', 'version'], batch_size=1000
+            )
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nHoàn thành! Tạo mới {len(to_create)} bộ đếm, sửa {len(to_update)} bộ đếm bị lệch.'
+            )
+        )
@@ -0,0 +1,27 @@
+"""
+Management command để đối soát Transaction.type với type của danh mục
+"""
+from django.core.management.base import BaseCommand
+
+from finance.models import Category
+from finance.transaction_types import sync_transaction_types
+
+
+class Command(BaseCommand):
+    help = 'Sửa Transaction.type bị lệch với Category.type theo từng batch (sau khi sửa dữ liệu bằng SQL, bulk_update...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--category', type=str, help='Chỉ đối soát cho danh mục có tên này')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Số giao dịch mỗi câu UPDATE')
+
+    def handle(self, *args, **options):
+        category_ids = None
+        if options['category']:
+            category_ids = list(Category.objects.filter(name=options['category']).values_list('id', flat=True))
+
+        fixed = 0
+        for count in sync_transaction_types(category_ids, batch_size=options['batch_size']):
+            fixed += count
+            self.stdout.write(f'Đã sửa {fixed} giao dịch...')
+
+        self.stdout.write(self.style.SUCCESS(f'\nHoàn thành! Sửa {fixed} giao dịch có type lệch với danh mục.'))
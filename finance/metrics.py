@@ -0,0 +1,366 @@
+"""
+Metrics tổng hợp cho capacity planning, xuất theo định dạng text của Prometheus (/api/metrics/)
+
+- Mỗi process (worker WSGI, thread nền) cộng dồn số liệu trong bộ nhớ
+  và định kỳ ghi ra file riêng <METRICS['DIR']>/<pid>_<id>.json (ghi atomic bằng os.replace)
+- Endpoint đọc file của mọi process và cộng lại: không cần Prometheus client hay dịch vụ ngoài
+- Counter/Histogram của process đã kết thúc vẫn được cộng (tổng không bị giảm khi worker restart);
+  Gauge chỉ tính các process còn sống
+- Xóa thư mục METRICS['DIR'] khi deploy (giống PROMETHEUS_MULTIPROC_DIR)
+"""
+import atexit
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+from django.conf import settings
+
+from .instrumentation import observe_span
+
+
+DEFAULT_METRICS = {
+    'ENABLED': True,
+    'DIR': os.path.join(tempfile.gettempdir(), 'finance_metrics'),
+    'FLUSH_INTERVAL': 1.0,  # Giây giữa hai lần ghi file của một process
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def get_config() -> dict:
+    return {**DEFAULT_METRICS, **getattr(settings, 'METRICS', {})}
+
+
+class Metric:
+    """Một metric có nhãn; giá trị theo bộ nhãn được giữ trong registry của process"""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        registry.register(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with registry.lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels):
+        """Dùng cho collector: đặt tổng của process từ bộ đếm có sẵn (vd. token_cache.stats)"""
+        with registry.lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with registry.lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with registry.lock:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    """Giá trị theo bộ nhãn: [số mẫu của từng bucket (không cộng dồn) ..., số mẫu > bucket cuối, tổng]"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with registry.lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            data[index] += 1
+            data[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+class Registry:
+    """Các metric của process và phần ghi/đọc file để tổng hợp giữa các process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Callable] = []
+        self._reset_process()
+
+    def _reset_process(self):
+        self.process_id = f'{os.getpid()}_{uuid.uuid4().hex[:8]}'
+        self._last_flush = 0.0
+
+    def register(self, metric: Metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'Metric {metric.name} đã được đăng ký')
+        self.metrics[metric.name] = metric
+
+    def add_collector(self, collector: Callable):
+        """collector() được gọi trước mỗi lần ghi file, dùng để chép số liệu có sẵn vào metric"""
+        self.collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        for collector in self.collectors:
+            collector()
+        with self.lock:
+            return {
+                name: [[list(key), value] for key, value in metric._values.items()]
+                for name, metric in self.metrics.items() if metric._values
+            }
+
+    def flush(self):
+        """Ghi số liệu của process ra file riêng"""
+        config = get_config()
+        if not config['ENABLED']:
+            return
+        self._last_flush = time.monotonic()
+        directory = config['DIR']
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{self.process_id}.json')
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'pid': os.getpid(), 'metrics': self.snapshot()}, f)
+        os.replace(tmp_path, path)
+
+    def maybe_flush(self):
+        """Ghi file nếu đã quá FLUSH_INTERVAL kể từ lần ghi trước (gọi sau mỗi request)"""
+        if time.monotonic() - self._last_flush >= get_config()['FLUSH_INTERVAL']:
+            self.flush()
+
+    def _read_processes(self):
+        """Số liệu của mọi process: file trên đĩa + số liệu hiện tại của process này"""
+        processes = {self.process_id: {'pid': os.getpid(), 'metrics': self.snapshot()}}
+        directory = get_config()['DIR']
+        if os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                process_id = filename[:-len('.json')]
+                if not filename.endswith('.json') or process_id in processes:
+                    continue
+                try:
+                    with open(os.path.join(directory, filename), encoding='utf-8') as f:
+                        processes[process_id] = json.load(f)
+                except (OSError, ValueError):
+                    continue
+        return processes.values()
+
+    def collect(self) -> Dict[str, Dict[tuple, object]]:
+        """Cộng số liệu của các process: tên metric -> {bộ nhãn: giá trị}"""
+        merged = {name: {} for name in self.metrics}
+        for process in self._read_processes():
+            alive = _pid_alive(process['pid'])
+            for name, samples in process['metrics'].items():
+                metric = self.metrics.get(name)
+                if metric is None or (metric.kind == 'gauge' and not alive):
+                    continue
+                values = merged[name]
+                for key, value in samples:
+                    key = tuple(key)
+                    if metric.kind == 'histogram':
+                        current = values.get(key)
+                        values[key] = value if current is None else [a + b for a, b in zip(current, value)]
+                    else:
+                        values[key] = values.get(key, 0) + value
+        return merged
+
+    def render(self) -> str:
+        """Định dạng text exposition của Prometheus"""
+        lines = []
+        for name, values in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for key in sorted(values):
+                labels = list(zip(metric.labelnames, key))
+                value = values[key]
+                if metric.kind != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (math.inf,), value[:-1]):
+                    cumulative += count
+                    le = '+Inf' if bound == math.inf else _format_value(bound)
+                    lines.append(f'{name}_bucket{_format_labels(labels + [("le", le)])} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value[-1])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value) -> str:
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+registry = Registry()
+
+
+# ---- Các metric của app ----
+
+HTTP_REQUEST_DURATION = Histogram(
+    'finance_http_request_duration_seconds',
+    'Thời gian xử lý request theo endpoint (tên URL), method và nhóm status',
+    ('endpoint', 'method', 'status')
+)
+OCR_INFERENCE = Histogram(
+    'finance_ocr_inference_seconds',
+    'Thời gian chạy model OCR (reader.readtext) cho một ảnh',
+    buckets=SLOW_BUCKETS
+)
+OCR_QUEUE_DEPTH = Gauge(
+    'finance_ocr_queue_depth',
+    'Số ảnh đang chờ hoặc đang chạy OCR'
+)
+NLP_PARSE = Histogram(
+    'finance_nlp_parse_seconds',
+    'Thời gian phân tích câu tiếng Việt (extract = nhập giao dịch, parse_query = câu hỏi)',
+    ('operation',),
+    buckets=FAST_BUCKETS
+)
+NOTIFICATION_CHECKS = Histogram(
+    'finance_notification_check_seconds',
+    'Thời gian mỗi lần kiểm tra thông báo; rate(_count) = số lần kiểm tra mỗi giây',
+    ('check',),
+    buckets=FAST_BUCKETS
+)
+AI_ANALYSIS = Histogram(
+    'finance_ai_analysis_seconds',
+    'Thời gian các phân tích của AIService',
+    ('analysis',)
+)
+IMPORT_JOBS_RUNNING = Gauge(
+    'finance_import_jobs_running',
+    'Số import job đang chạy nền'
+)
+IMPORT_JOB_DURATION = Histogram(
+    'finance_import_job_seconds',
+    'Thời gian chạy một import job theo kết quả',
+    ('status',),
+    buckets=SLOW_BUCKETS
+)
+CACHE_REQUESTS = Counter(
+    'finance_cache_requests_total',
+    'Số lần tra cache theo loại cache và kết quả (tỉ lệ hit = hit / tổng)',
+    ('cache', 'result')
+)
+
+
+def _observer(histogram: Histogram, **labels) -> Callable[[float], None]:
+    return lambda elapsed: histogram.observe(elapsed, **labels)
+
+
+# Các span của instrumentation được ghi vào histogram ở mọi request (không phụ thuộc lấy mẫu)
+observe_span('ocr.readtext', OCR_INFERENCE.observe)
+observe_span('nlp.extract', _observer(NLP_PARSE, operation='extract'))
+observe_span('nlp.parse_query', _observer(NLP_PARSE, operation='parse_query'))
+for _check in ('large_transaction', 'budget_exceeded', 'anomaly'):
+    observe_span(f'notify.{_check}', _observer(NOTIFICATION_CHECKS, check=_check))
+for _analysis in ('analyze_spending_trends', 'predict_next_month_spending', 'detect_anomalies',
+                  'suggest_savings_plan', 'update_spending_patterns'):
+    observe_span(f'ai.{_analysis}', _observer(AI_ANALYSIS, analysis=_analysis))
+
+
+def _collect_token_cache():
+    from .authentication import token_cache
+
+    stats = dict(token_cache.stats)
+    CACHE_REQUESTS.set_total(stats['local_hits'], cache='token', result='local_hit')
+    CACHE_REQUESTS.set_total(stats['shared_hits'], cache='token', result='shared_hit')
+    CACHE_REQUESTS.set_total(stats['misses'], cache='token', result='miss')
+
+
+registry.add_collector(_collect_token_cache)
+
+
+def _flush_at_exit():
+    try:
+        registry.flush()
+    except OSError:
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+if hasattr(os, 'register_at_fork'):
+    # Process con (gunicorn --preload) bắt đầu từ 0, không tính lại số liệu của process cha
+    def _reset_after_fork():
+        from .authentication import token_cache
+
+        registry.lock = threading.Lock()
+        for metric in registry.metrics.values():
+            metric._values = {}
+        registry._reset_process()
+        # _collect_token_cache ghi tổng từ token_cache.stats: cũng phải bắt đầu từ 0
+        token_cache._lock = threading.Lock()
+        token_cache.stats = dict.fromkeys(token_cache.stats, 0)
+
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,161 @@
+"""
+Middleware của app finance
+"""
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics, profiling, slow_queries
+from .instrumentation import RequestTimer, activate, deactivate, track_queries
+
+logger = logging.getLogger('finance.timing')
+profiling_logger = logging.getLogger('finance.profiling')
+
+
+DEFAULT_SERVER_TIMING = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 1.0,
+    'LOG': True,
+}
+
+
+class ServerTimingMiddleware:
+    """
+    Đo thời gian các request được lấy mẫu: tổng, SQL (số query + thời gian), render và các span.
+    Kết quả được gửi trong header Server-Timing (xem trong DevTools) và ghi log JSON một dòng.
+    ENABLED=False: middleware bị gỡ khỏi chuỗi xử lý, không tốn chi phí
+    """
+
+    def __init__(self, get_response):
+        config = {**DEFAULT_SERVER_TIMING, **getattr(settings, 'SERVER_TIMING', {})}
+        if not config['ENABLED'] or config['SAMPLE_RATE'] <= 0:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sample_rate = config['SAMPLE_RATE']
+        self.log = config['LOG']
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timer = RequestTimer()
+        token = activate(timer)
+        try:
+            with track_queries():
+                response = self.get_response(request)
+        finally:
+            deactivate(token)
+
+        total = timer.total
+        response['Server-Timing'] = self.server_timing_header(timer, total)
+        if self.log:
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 2),
+                'db_ms': round(timer.sql_time * 1000, 2),
+                'queries': timer.query_count,
+                'spans': {
+                    name: {'ms': round(elapsed * 1000, 2), 'count': count}
+                    for name, (elapsed, count) in timer.spans.items()
+                },
+            }, ensure_ascii=False))
+        return response
+
+    @staticmethod
+    def server_timing_header(timer, total) -> str:
+        entries = [
+            f'total;dur={total * 1000:.1f}',
+            f'db;dur={timer.sql_time * 1000:.1f};desc="{timer.query_count} queries"',
+        ]
+        for name, (elapsed, count) in timer.spans.items():
+            entries.append(f'{name};dur={elapsed * 1000:.1f}' + (f';desc="x{count}"' if count > 1 else ''))
+        return ', '.join(entries)
+
+
+class MetricsMiddleware:
+    """
+    Ghi thời gian mọi request vào histogram finance_http_request_duration_seconds
+    (nhãn endpoint là tên URL để số bộ nhãn không tăng theo id trong path)
+    và định kỳ ghi số liệu của process ra file (finance/metrics.py)
+    """
+
+    def __init__(self, get_response):
+        if not metrics.get_config()['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            match = request.resolver_match
+            metrics.HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                endpoint=match.view_name if match else 'unmatched',
+                method=request.method,
+                status=f'{status // 100}xx'
+            )
+            metrics.registry.maybe_flush()
+
+
+class ProfilerMiddleware:
+    """
+    Chạy request dưới cProfile khi staff yêu cầu (X-Profile: 1 / ?_profile=1) hoặc trúng mẫu,
+    lưu kết quả vào RequestProfile (finance/profiling.py). Request của staff nhận lại
+    header X-Profile-Id để tìm profile trong admin
+    """
+
+    def __init__(self, get_response):
+        if not profiling.get_config()['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = profiling.get_config()
+        trigger, user = profiling.should_profile(request, config)
+        if trigger is None:
+            return self.get_response(request)
+
+        recorders = [profiling.QueryRecorder(connection.alias, config['MAX_QUERIES']) for connection in connections.all()]
+        with ExitStack() as stack:
+            for connection, recorder in zip(connections.all(), recorders):
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response, profiler, duration = profiling.run_profiled(self.get_response, request)
+
+        try:
+            profile = profiling.save_profile(request, response, user, trigger, profiler, duration, recorders, config)
+        except Exception:
+            # Lỗi khi lưu profile không được làm hỏng response của request
+            profiling_logger.exception('Không lưu được profile của %s', request.path)
+            return response
+        if trigger != 'sampled':
+            response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+
+class SlowQueryLogMiddleware:
+    """Gắn request hiện tại để slow query log biết câu SQL chậm thuộc endpoint nào"""
+
+    def __init__(self, get_response):
+        if not slow_queries.get_config()['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = slow_queries.current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            slow_queries.current_request.reset(token)
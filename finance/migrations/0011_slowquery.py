@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:20
+
+import finance.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0010_requestprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40, unique=True)),
+                ('normalized_sql', models.TextField()),
+                ('sample_sql', models.TextField()),
+                ('sample_params', models.TextField(blank=True)),
+                ('plan', models.TextField(blank=True)),
+                ('plan_captured_at', models.DateTimeField(blank=True, null=True)),
+                ('endpoints', models.JSONField(blank=True, default=finance.models.default_list)),
+                ('calls', models.PositiveIntegerField(default=0)),
+                ('total_time_ms', models.FloatField(default=0)),
+                ('max_time_ms', models.FloatField(default=0)),
+                ('first_seen', models.DateTimeField(auto_now_add=True)),
+                ('last_seen', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'ordering': ['-total_time_ms'],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0011_slowquery'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(fields=['user', 'start_date', 'end_date'], name='budget_user_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(fields=['user', 'created_at'], name='budget_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'transaction_date', 'created_at'], include=('amount', 'category'), name='tx_user_date_cover_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'category', 'transaction_date'], name='tx_user_category_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'updated_at', 'created_at'], name='tx_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('import_hash__isnull', False)), fields=['user', 'import_hash'], name='tx_user_import_hash_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='finance_tra_user_id_bed389_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='finance_tra_user_id_be5f56_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='finance_tra_user_id_f47d42_idx',
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+BATCH_SIZE = 5000
+
+
+def backfill_type(apps, schema_editor):
+    """
+    Cột mới mặc định là expense: chỉ cần sửa giao dịch thuộc danh mục thu nhập,
+    theo từng batch id (migration không atomic nên mỗi batch commit riêng trên Postgres)
+    """
+    Category = apps.get_model('finance', 'Category')
+    Transaction = apps.get_model('finance', 'Transaction')
+    income_ids = list(Category.objects.filter(type='income').values_list('id', flat=True))
+    if not income_ids:
+        return
+
+    last_id = 0
+    while True:
+        ids = list(
+            Transaction.objects.filter(category_id__in=income_ids, type='expense', id__gt=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:BATCH_SIZE]
+        )
+        if not ids:
+            return
+        last_id = ids[-1]
+        Transaction.objects.filter(id__in=ids).update(type='income')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('finance', '0012_transaction_budget_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='type',
+            field=models.CharField(choices=[('income', 'Thu nhập'), ('expense', 'Chi tiêu')], default='expense', max_length=10),
+        ),
+        migrations.RunPython(backfill_type, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='tx_user_date_cover_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'transaction_date', 'created_at'], include=('amount', 'category', 'type'), name='tx_user_date_cover_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'type', 'transaction_date'], include=('amount',), name='tx_user_type_date_idx'),
+        ),
+    ]
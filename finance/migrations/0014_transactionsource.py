@@ -0,0 +1,83 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:40
+
+import django.db.models.deletion
+import finance.models
+from django.db import migrations, models
+
+
+BATCH_SIZE = 2000
+
+
+def move_to_source(apps, schema_editor):
+    """
+    Chép original_nlp_input sang TransactionSource theo từng batch id
+    (migration không atomic nên mỗi batch commit riêng trên Postgres)
+    Text OCR được ghép từ nhiều dòng, câu NLP chỉ có một dòng
+    """
+    Transaction = apps.get_model('finance', 'Transaction')
+    TransactionSource = apps.get_model('finance', 'TransactionSource')
+    last_id = 0
+    while True:
+        rows = list(
+            Transaction.objects.filter(id__gt=last_id, original_nlp_input__isnull=False)
+            .exclude(original_nlp_input='')
+            .order_by('id')
+            .values_list('id', 'original_nlp_input')[:BATCH_SIZE]
+        )
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        TransactionSource.objects.bulk_create(
+            [
+                TransactionSource(transaction_id=pk, kind='ocr' if '\n' in text else 'nlp', text=text)
+                for pk, text in rows
+            ],
+            ignore_conflicts=True
+        )
+
+
+def move_back(apps, schema_editor):
+    """Chép ngược text về cột original_nlp_input (các khối OCR không còn chỗ lưu)"""
+    Transaction = apps.get_model('finance', 'Transaction')
+    TransactionSource = apps.get_model('finance', 'TransactionSource')
+    last_id = 0
+    while True:
+        rows = list(
+            TransactionSource.objects.filter(transaction_id__gt=last_id)
+            .order_by('transaction_id')
+            .values_list('transaction_id', 'text')[:BATCH_SIZE]
+        )
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        Transaction.objects.bulk_update(
+            [Transaction(id=pk, original_nlp_input=text) for pk, text in rows],
+            ['original_nlp_input']
+        )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('finance', '0013_transaction_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionSource',
+            fields=[
+                ('transaction', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='source', serialize=False, to='finance.transaction')),
+                ('kind', models.CharField(choices=[('nlp', 'Câu nhập liệu'), ('ocr', 'Hóa đơn OCR'), ('client', 'Từ ứng dụng')], default='client', max_length=10)),
+                ('text', models.TextField(blank=True)),
+                ('blocks', models.JSONField(blank=True, default=finance.models.default_list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(move_to_source, move_back),
+        migrations.RemoveField(
+            model_name='transaction',
+            name='original_nlp_input',
+        ),
+    ]
@@ -46,8 +46,16 @@ class Transaction(models.Model):
     description = models.TextField(blank=True)
     transaction_date = models.DateField()
     
-    # Lưu thông tin từ NLP nếu có
-    original_nlp_input = models.TextField(blank=True, null=True)
+    # Thu/chi, denormalize từ category.type để tổng hợp không cần join finance_category
+    # (giao dịch chưa có danh mục giữ type từ NLP/OCR/import, mặc định là chi)
+    type = models.CharField(
+        max_length=10,
+        choices=[('income', 'Thu nhập'), ('expense', 'Chi tiêu')],
+        default='expense'
+    )
+    
+    # Hash để chống trùng khi import từ file (CSV/OFX)
+    import_hash = models.CharField(max_length=40, blank=True, null=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -55,14 +63,68 @@ class Transaction(models.Model):
     class Meta:
         ordering = ['-transaction_date', '-created_at']
         indexes = [
-            models.Index(fields=['user', 'transaction_date']),
-            models.Index(fields=['user', 'category']),
+            # Danh sách, cửa sổ phân tích và báo cáo theo khoảng ngày (khớp ordering);
+            # INCLUDE amount, category, type để tổng hợp chỉ đọc index (Postgres)
+            models.Index(
+                fields=['user', 'transaction_date', 'created_at'],
+                include=['amount', 'category', 'type'],
+                name='tx_user_date_cover_idx',
+            ),
+            # Tổng thu / tổng chi trong một kỳ chỉ đọc index (Postgres)
+            models.Index(
+                fields=['user', 'type', 'transaction_date'],
+                include=['amount'],
+                name='tx_user_type_date_idx',
+            ),
+            # Chi tiêu theo danh mục trong một kỳ (kiểm tra ngân sách, spending pattern)
+            models.Index(fields=['user', 'category', 'transaction_date'], name='tx_user_category_date_idx'),
+            # Đồng bộ mobile: updated_at > last_sync, sắp xếp theo updated_at, created_at
+            models.Index(fields=['user', 'updated_at', 'created_at'], name='tx_user_updated_idx'),
+            # Chống trùng khi import: phần lớn giao dịch không có import_hash
+            models.Index(
+                fields=['user', 'import_hash'],
+                condition=models.Q(import_hash__isnull=False),
+                name='tx_user_import_hash_idx',
+            ),
         ]
     
+    def save(self, *args, **kwargs):
+        # type luôn theo danh mục (tra trong category registry, không thêm query)
+        if self.category_id:
+            from .transaction_types import type_for_category
+            self.type = type_for_category(self.category_id, self.type)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'category' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'type'}
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.user.username} - {self.amount} - {self.transaction_date}"
 
 
+class TransactionSource(models.Model):
+    """
+    Dữ liệu gốc của giao dịch (câu NLP, text và các khối OCR)
+    Tách khỏi Transaction để dòng giao dịch hẹp: chỉ đọc ở endpoint chi tiết
+    """
+    transaction = models.OneToOneField(
+        Transaction, on_delete=models.CASCADE, primary_key=True, related_name='source'
+    )
+    kind = models.CharField(
+        max_length=10,
+        choices=[('nlp', 'Câu nhập liệu'), ('ocr', 'Hóa đơn OCR'), ('client', 'Từ ứng dụng')],
+        default='client'
+    )
+    # Câu nhập liệu hoặc toàn bộ text OCR (Postgres tự nén giá trị lớn bằng TOAST)
+    text = models.TextField(blank=True)
+    # Kết quả OCR đầy đủ: [{'text', 'bbox': [[x, y] x 4], 'confidence'}]
+    blocks = models.JSONField(default=default_list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.transaction_id} - {self.kind}"
+
+
 class Budget(models.Model):
     """Ngân sách theo danh mục"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='budgets')
@@ -87,6 +149,12 @@ class Budget(models.Model):
     
     class Meta:
         ordering = ['-start_date']
+        indexes = [
+            # Ngân sách còn hiệu lực: start_date <= ngày <= end_date
+            models.Index(fields=['user', 'start_date', 'end_date'], name='budget_user_period_idx'),
+            # Đồng bộ mobile: created_at > last_sync
+            models.Index(fields=['user', 'created_at'], name='budget_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.category.name} - {self.amount}"
@@ -225,4 +293,164 @@ class Notification(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.user.username} - {self.title} - {self.created_at}"
\ No newline at end of file
+        return f"{self.user.username} - {self.title} - {self.created_at}"
+
+
+class NotificationCounter(models.Model):
+    """Bộ đếm notifications chưa đọc của người dùng (denormalized)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_counter')
+    
+    unread_count = models.PositiveIntegerField(default=0)
+    # Tăng mỗi khi danh sách notifications thay đổi, dùng làm ETag
+    version = models.PositiveBigIntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.unread_count} chưa đọc"
+
+
+class NotificationArchive(models.Model):
+    """Notifications cũ đã được lưu trữ (bảng gọn, không index phụ, chỉ ghi thêm)"""
+    notification_id = models.BigIntegerField()
+    # Không dùng ForeignKey để tránh ràng buộc và index trên bảng lưu trữ
+    user_id = models.IntegerField()
+    
+    type = models.CharField(max_length=50)
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    is_read = models.BooleanField(default=False)
+    
+    created_at = models.DateTimeField()
+    read_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.title} - {self.created_at}"
+
+
+class ImportJob(models.Model):
+    """Tác vụ import giao dịch từ file (CSV/OFX)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='import_jobs')
+    
+    STATUS_CHOICES = [
+        ('pending', 'Đang chờ'),
+        ('running', 'Đang xử lý'),
+        ('completed', 'Hoàn thành'),
+        ('failed', 'Thất bại'),
+    ]
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('ofx', 'OFX'),
+    ]
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    file = models.FileField(upload_to='imports/', blank=True)
+    file_name = models.CharField(max_length=255, blank=True)
+    
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    duplicate_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=default_list, blank=True)  # Chỉ giữ một số lỗi đầu tiên
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.file_name} - {self.status}"
+
+
+class IdempotencyKey(models.Model):
+    """Kết quả của một request có header Idempotency-Key (để trả lại khi client gửi lại)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    
+    # Endpoint + hash nội dung request, để phát hiện dùng lại key cho request khác
+    endpoint = models.CharField(max_length=100)
+    request_hash = models.CharField(max_length=64)
+    
+    # Chưa có response_status = request đầu tiên vẫn đang xử lý
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        unique_together = ['user', 'key']
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.endpoint} - {self.key}"
+
+
+class RequestProfile(models.Model):
+    """Kết quả chạy một request dưới cProfile (kèm các câu SQL và EXPLAIN), xem/tải trong admin"""
+    TRIGGER_CHOICES = [
+        ('header', 'Header X-Profile'),
+        ('query', 'Query param _profile'),
+        ('sampled', 'Lấy mẫu'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='request_profiles')
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES)
+    
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    query_string = models.TextField(blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField(default=0)
+    sql_time_ms = models.FloatField(default=0)
+    
+    # Top hàm theo thời gian cộng dồn (pstats) và dữ liệu pstats đầy đủ (file .prof)
+    stats_text = models.TextField(blank=True)
+    profile_data = models.BinaryField()
+    # [{sql, params, time_ms, explain}]
+    queries = models.JSONField(default=default_list, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.method} {self.path} - {self.duration_ms:.0f}ms"
+
+
+class SlowQuery(models.Model):
+    """Câu SQL chậm hơn ngưỡng, gộp theo fingerprint (SQL đã chuẩn hóa, bỏ giá trị tham số)"""
+    fingerprint = models.CharField(max_length=40, unique=True)
+    normalized_sql = models.TextField()
+    
+    # Mẫu chậm nhất và kế hoạch thực thi của nó
+    sample_sql = models.TextField()
+    sample_params = models.TextField(blank=True)
+    plan = models.TextField(blank=True)
+    plan_captured_at = models.DateTimeField(null=True, blank=True)
+    
+    # Các endpoint (tên URL) đã chạy câu SQL này
+    endpoints = models.JSONField(default=default_list, blank=True)
+    
+    calls = models.PositiveIntegerField(default=0)
+    total_time_ms = models.FloatField(default=0)
+    max_time_ms = models.FloatField(default=0)
+    
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        ordering = ['-total_time_ms']
+    
+    def __str__(self):
+        return f"{self.fingerprint[:8]} - {self.calls} lần, max {self.max_time_ms:.0f}ms"
+    
+    @property
+    def avg_time_ms(self):
+        return self.total_time_ms / self.calls if self.calls else 0
@@ -5,6 +5,8 @@ import re
 from datetime import datetime, timedelta
 from decimal import Decimal
 from typing import Dict, Optional, Tuple, List
+from .category_registry import category_registry
+from .instrumentation import timed
 from .models import Category
 
 
@@ -38,6 +40,7 @@ class NLPService:
     }
     
     @staticmethod
+    @timed('nlp.extract')
     def extract_transaction_info(text: str) -> Dict:
         """
         Trích xuất thông tin giao dịch từ câu nhập liệu tự nhiên
@@ -138,6 +141,7 @@ class NLPService:
         return result
     
     @staticmethod
+    @timed('nlp.parse_query')
     def parse_query(text: str) -> Dict:
         """
         Phân tích câu truy vấn tự nhiên
@@ -212,7 +216,10 @@ class NLPService:
     
     @staticmethod
     def get_or_create_category(name: str, category_type: str = 'expense') -> Category:
-        """Lấy hoặc tạo category"""
+        """Lấy hoặc tạo category (tra registry trước, chỉ chạm database khi chưa có)"""
+        category = category_registry.get_by_name(name)
+        if category is not None:
+            return category
         category, created = Category.objects.get_or_create(
             name=name,
             defaults={
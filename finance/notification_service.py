@@ -1,10 +1,89 @@
 """Service để tạo và quản lý notifications"""
 from django.utils import timezone
-from django.db.models import Sum, Q
+from django.db import transaction as db_transaction
+from django.db.models import Sum, Q, F
+from django.db.models.functions import Greatest
 from datetime import datetime, timedelta
 from decimal import Decimal
 
-from .models import Notification, Transaction, Budget, UserPreferences
+from .models import Notification, NotificationCounter, NotificationArchive, Transaction, Budget
+from .instrumentation import timed
+from .preferences import get_preferences
+
+
+def _get_counter(user):
+    """Lấy bộ đếm của user, khởi tạo từ dữ liệu thật nếu chưa có. Trả về (counter, created)"""
+    return NotificationCounter.objects.get_or_create(
+        user=user,
+        defaults={
+            'unread_count': Notification.objects.filter(user=user, is_read=False).count()
+        }
+    )
+
+
+def adjust_unread_count(user, delta=0):
+    """
+    Cập nhật bộ đếm notifications chưa đọc sau khi thay đổi dữ liệu
+    delta: số notifications chưa đọc tăng thêm (có thể âm hoặc 0)
+    """
+    counter, created = _get_counter(user)
+    if created:
+        # Bộ đếm vừa được tính từ dữ liệu hiện tại, đã bao gồm thay đổi này
+        return
+    NotificationCounter.objects.filter(pk=counter.pk).update(
+        unread_count=Greatest(F('unread_count') + delta, 0),
+        version=F('version') + 1,
+        updated_at=timezone.now()
+    )
+
+
+def mark_all_notifications_read(user) -> int:
+    """
+    Đánh dấu mọi notification chưa đọc của user là đã đọc và đặt bộ đếm về 0
+    Giữ khóa dòng bộ đếm trong suốt transaction: notification tạo trong lúc đó chỉ
+    cộng vào bộ đếm sau khi bộ đếm đã về 0. Trả về số notifications đã đánh dấu
+    """
+    with db_transaction.atomic():
+        counter, _ = NotificationCounter.objects.select_for_update().get_or_create(user=user)
+        count = Notification.objects.filter(user=user, is_read=False).update(
+            is_read=True,
+            read_at=timezone.now()
+        )
+        NotificationCounter.objects.filter(pk=counter.pk).update(
+            unread_count=0,
+            version=F('version') + 1,
+            updated_at=timezone.now()
+        )
+    return count
+
+
+def _apply_purged_counts(rows):
+    """Cập nhật bộ đếm của các user có notifications vừa bị xóa"""
+    unread_by_user = {}
+    for row in rows:
+        unread_by_user.setdefault(row['user_id'], 0)
+        if not row['is_read']:
+            unread_by_user[row['user_id']] += 1
+    
+    now = timezone.now()
+    for user_id, unread in unread_by_user.items():
+        NotificationCounter.objects.filter(user_id=user_id).update(
+            unread_count=Greatest(F('unread_count') - unread, 0),
+            version=F('version') + 1,
+            updated_at=now
+        )
+
+
+def get_unread_count(user):
+    """Lấy số lượng notifications chưa đọc (O(1), đọc từ bộ đếm)"""
+    counter, _ = _get_counter(user)
+    return counter.unread_count
+
+
+def get_notifications_etag(user):
+    """ETag cho danh sách notifications, đổi mỗi khi bộ đếm thay đổi"""
+    counter, _ = _get_counter(user)
+    return f'"n{user.pk}-{counter.version}-{counter.unread_count}"'
 
 
 def create_notification(user, notification_type, title, message, related_transaction=None, related_budget=None, send_email=False):
@@ -18,6 +97,7 @@ def create_notification(user, notification_type, title, message, related_transac
         related_budget=related_budget,
         email_sent=False
     )
+    adjust_unread_count(user, 1)
     
     # TODO: Gửi email nếu send_email=True
     # if send_email:
@@ -26,12 +106,13 @@ def create_notification(user, notification_type, title, message, related_transac
     return notification
 
 
+@timed('notify.large_transaction')
 def check_large_transaction(transaction):
     """Kiểm tra và tạo notification nếu giao dịch lớn"""
     try:
-        preferences = UserPreferences.objects.get(user=transaction.user)
+        preferences = get_preferences(transaction.user)
         
-        if not preferences.notify_large_transaction:
+        if preferences is None or not preferences.notify_large_transaction:
             return
         
         threshold = preferences.large_transaction_threshold
@@ -45,18 +126,17 @@ def check_large_transaction(transaction):
                 related_transaction=transaction,
                 send_email=preferences.notify_large_transaction
             )
-    except UserPreferences.DoesNotExist:
-        pass
     except Exception as e:
         print(f"Error checking large transaction: {e}")
 
 
+@timed('notify.budget_exceeded')
 def check_budget_exceeded(user, category=None):
     """Kiểm tra và tạo notification nếu vượt ngân sách"""
     try:
-        preferences = UserPreferences.objects.get(user=user)
+        preferences = get_preferences(user)
         
-        if not preferences.notify_budget_exceeded:
+        if preferences is None or not preferences.notify_budget_exceeded:
             return
         
         today = timezone.now().date()
@@ -95,7 +175,7 @@ def check_budget_exceeded(user, category=None):
                 category=budget.category,
                 transaction_date__gte=start_date,
                 transaction_date__lte=end_date,
-                category__type='expense'
+                type='expense'
             ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
             
             if total_spent > budget.amount:
@@ -108,18 +188,17 @@ def check_budget_exceeded(user, category=None):
                     related_budget=budget,
                     send_email=preferences.notify_budget_exceeded
                 )
-    except UserPreferences.DoesNotExist:
-        pass
     except Exception as e:
         print(f"Error checking budget exceeded: {e}")
 
 
+@timed('notify.anomaly')
 def create_anomaly_notification(user, anomaly_data):
     """Tạo notification cho anomaly được phát hiện"""
     try:
-        preferences = UserPreferences.objects.get(user=user)
+        preferences = get_preferences(user)
         
-        if not preferences.notify_anomaly_detected:
+        if preferences is None or not preferences.notify_anomaly_detected:
             return
         
         transaction = anomaly_data.get('transaction')
@@ -132,8 +211,56 @@ def create_anomaly_notification(user, anomaly_data):
                 related_transaction=transaction,
                 send_email=preferences.notify_anomaly_detected
             )
-    except UserPreferences.DoesNotExist:
-        pass
     except Exception as e:
         print(f"Error creating anomaly notification: {e}")
 
+
+ARCHIVE_FIELDS = ['id', 'user_id', 'type', 'title', 'message', 'is_read', 'created_at', 'read_at']
+
+
+def archive_to_table(rows):
+    """Lưu các notifications vào bảng NotificationArchive"""
+    NotificationArchive.objects.bulk_create([
+        NotificationArchive(
+            notification_id=row['id'],
+            user_id=row['user_id'],
+            type=row['type'],
+            title=row['title'],
+            message=row['message'],
+            is_read=row['is_read'],
+            created_at=row['created_at'],
+            read_at=row['read_at'],
+        )
+        for row in rows
+    ])
+
+
+def purge_notifications(read_before, unread_before=None, batch_size=1000, archive=None):
+    """
+    Xóa notifications cũ theo từng batch nhỏ để không khóa bảng lâu
+    - read_before: xóa notifications đã đọc tạo trước thời điểm này
+    - unread_before: xóa cả notifications chưa đọc tạo trước thời điểm này (None = giữ lại)
+    - archive: callable nhận list các dict (ARCHIVE_FIELDS) để lưu trữ trước khi xóa
+    Generator: yield số dòng đã xóa sau mỗi batch
+    """
+    condition = Q(is_read=True, created_at__lt=read_before)
+    if unread_before:
+        condition |= Q(is_read=False, created_at__lt=unread_before)
+    
+    while True:
+        with db_transaction.atomic():
+            rows = list(
+                Notification.objects.filter(condition)
+                .select_for_update(skip_locked=True)
+                .order_by('id')
+                .values(*ARCHIVE_FIELDS)[:batch_size]
+            )
+            if not rows:
+                return
+            
+            if archive:
+                archive(rows)
+            Notification.objects.filter(id__in=[row['id'] for row in rows]).delete()
+            _apply_purged_counts(rows)
+        
+        yield len(rows)
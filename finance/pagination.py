@@ -0,0 +1,81 @@
+"""
+Phân trang cho các danh sách API (transactions, notifications, budgets)
+"""
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class FlexiblePagination(PageNumberPagination):
+    """
+    Phân trang theo trang (mặc định, tương thích cũ) hoặc theo limit/offset
+    Query params:
+    - page: số trang (kích thước trang = PAGE_SIZE)
+    - limit, offset: lấy `limit` dòng bắt đầu từ `offset` (limit tối đa MAX_LIMIT)
+    - omit_count=1: bỏ câu COUNT(*), chỉ lấy thêm một dòng để biết còn trang sau
+    """
+    limit_query_param = 'limit'
+    offset_query_param = 'offset'
+    omit_count_query_param = 'omit_count'
+    max_limit = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        self.request = request
+        self.omit_count = params.get(self.omit_count_query_param) in ('1', 'true')
+        self.use_limit = self.limit_query_param in params or self.offset_query_param in params
+
+        if not self.use_limit and not self.omit_count:
+            self.count = None
+            return super().paginate_queryset(queryset, request, view)
+
+        if self.use_limit:
+            self.limit = self._parse_int(params.get(self.limit_query_param), self.page_size, self.max_limit) or self.page_size
+            self.offset = self._parse_int(params.get(self.offset_query_param), 0)
+        else:
+            self.limit = self.page_size
+            self.offset = (self._parse_int(params.get(self.page_query_param), 1) or 1) * self.page_size - self.page_size
+
+        if self.omit_count:
+            # Lấy thừa một dòng thay cho COUNT(*)
+            self.count = None
+            rows = list(queryset[self.offset:self.offset + self.limit + 1])
+            self.has_next = len(rows) > self.limit
+            return rows[:self.limit]
+
+        self.count = queryset.count()
+        self.has_next = self.offset + self.limit < self.count
+        return list(queryset[self.offset:self.offset + self.limit])
+
+    def get_paginated_response(self, data):
+        if not self.use_limit and not self.omit_count:
+            return super().get_paginated_response(data)
+
+        body = {}
+        if self.count is not None:
+            body['count'] = self.count
+        body['next'] = self._build_link(self.offset + self.limit) if self.has_next else None
+        body['previous'] = self._build_link(max(self.offset - self.limit, 0)) if self.offset > 0 else None
+        body['results'] = data
+        return Response(body)
+
+    def _build_link(self, offset):
+        url = self.request.build_absolute_uri()
+        if self.use_limit:
+            url = replace_query_param(url, self.limit_query_param, self.limit)
+            return replace_query_param(url, self.offset_query_param, offset)
+        page = offset // self.page_size + 1
+        if page == 1:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, page)
+
+    @staticmethod
+    def _parse_int(value, default, maximum=None):
+        """Parse số nguyên không âm, sai định dạng thì dùng mặc định"""
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            return default
+        if number < 0:
+            return default
+        return min(number, maximum) if maximum else number
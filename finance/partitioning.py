@@ -0,0 +1,335 @@
+"""
+Partition bảng finance_transaction theo transaction_date (Postgres declarative partitioning)
+
+- Tùy chọn: bảng chỉ chuyển sang partition khi chạy `manage.py partition_transactions convert`,
+  các migration và database khác (SQLite khi dev/test) không đổi
+- ORM không đổi: mọi query vẫn đi qua bảng cha finance_transaction, Postgres tự bỏ qua
+  các partition nằm ngoài khoảng ngày của query (partition pruning)
+- Khóa chính của bảng partition là (id, transaction_date); id vẫn lấy từ sequence nên không trùng
+- Postgres không cho khóa ngoại trỏ tới riêng cột id của bảng partition: khóa ngoại từ
+  TransactionSource / Notification bị bỏ, on_delete vẫn do ORM thực hiện như trước
+"""
+import re
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.db.models import CASCADE
+
+from .models import Transaction
+
+
+DEFAULT_TRANSACTION_PARTITIONING = {
+    'INTERVAL': 'month',                  # Độ dài mỗi partition: 'month' hoặc 'year'
+    'PREMAKE': 3,                         # Số partition tương lai luôn được tạo sẵn
+    'RETENTION': None,                    # Số partition gần nhất được giữ (None = giữ tất cả)
+    'ARCHIVE_SCHEMA': 'finance_archive',  # Schema chứa các partition đã tách ra để lưu trữ
+}
+
+TABLE = Transaction._meta.db_table
+# Bảng cũ (không partition) được giữ lại sau khi chuyển đổi để đối chiếu / quay lại
+LEGACY_TABLE = f'{TABLE}_unpartitioned'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+BOUND_RE = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})'\) TO \('(\d{4}-\d{2}-\d{2})'\)")
+
+
+class Partition(NamedTuple):
+    name: str
+    start: Optional[date]  # None: partition DEFAULT
+    end: Optional[date]    # Không bao gồm
+
+    @property
+    def is_default(self) -> bool:
+        return self.start is None
+
+
+def get_config() -> dict:
+    config = {**DEFAULT_TRANSACTION_PARTITIONING, **getattr(settings, 'TRANSACTION_PARTITIONING', {})}
+    if config['INTERVAL'] not in ('month', 'year'):
+        raise ValueError(f"TRANSACTION_PARTITIONING['INTERVAL'] phải là 'month' hoặc 'year': {config['INTERVAL']!r}")
+    return config
+
+
+def _qn(name: str) -> str:
+    return connection.ops.quote_name(name)
+
+
+def period_start(day: date, interval: str) -> date:
+    return day.replace(day=1) if interval == 'month' else date(day.year, 1, 1)
+
+
+def next_period(start: date, interval: str) -> date:
+    if interval == 'month':
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return date(start.year + 1, 1, 1)
+
+
+def add_periods(start: date, count: int, interval: str) -> date:
+    for _ in range(count):
+        start = next_period(start, interval)
+    return start
+
+
+def partition_name(start: date, interval: str) -> str:
+    if interval == 'month':
+        return f'{TABLE}_y{start.year}m{start.month:02d}'
+    return f'{TABLE}_y{start.year}'
+
+
+def is_partitioned() -> bool:
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [TABLE])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def table_exists(name: str) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [name])
+        return cursor.fetchone()[0]
+
+
+def list_partitions() -> List[Partition]:
+    """Các partition của finance_transaction theo thứ tự thời gian (DEFAULT ở cuối)"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) '
+            'FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = to_regclass(%s)',
+            [TABLE]
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = BOUND_RE.search(bound or '')
+        if match:
+            partitions.append(Partition(name, date.fromisoformat(match[1]), date.fromisoformat(match[2])))
+        else:
+            partitions.append(Partition(name, None, None))
+    return sorted(partitions, key=lambda p: (p.is_default, p.start or date.max))
+
+
+def index_aliases(index_name: str) -> List[str]:
+    """Tên index và các index con trên từng partition (Postgres tự đặt tên khi tạo index trên bảng cha)"""
+    if not is_partitioned():
+        return [index_name]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = to_regclass(%s)',
+            [index_name]
+        )
+        return [index_name] + [row[0] for row in cursor.fetchall()]
+
+
+def _create_partition(cursor, start: date, end: date, name: str):
+    # Ngày lấy từ date nên ghép trực tiếp được (DDL không nhận tham số)
+    cursor.execute(
+        f'CREATE TABLE {_qn(name)} PARTITION OF {_qn(TABLE)} '
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+def ensure_partitions(until: date, interval: Optional[str] = None, since: Optional[date] = None) -> List[str]:
+    """
+    Tạo các partition còn thiếu từ kỳ của `since` (mặc định: hôm nay) tới kỳ chứa `until`
+    Giao dịch đã rơi vào partition DEFAULT trong khoảng đó được chuyển sang partition mới
+    Trả về tên các partition đã tạo
+    """
+    interval = interval or get_config()['INTERVAL']
+    existing = list_partitions()
+    ranges = [(p.start, p.end) for p in existing if not p.is_default]
+    has_default = any(p.is_default for p in existing)
+
+    created = []
+    start = period_start(since or date.today(), interval)
+    while start <= until:
+        end = next_period(start, interval)
+        # Bỏ qua kỳ đã có partition (kể cả khi đổi INTERVAL giữa chừng)
+        if not any(s < end and start < e for s, e in ranges):
+            name = partition_name(start, interval)
+            with db_transaction.atomic(), connection.cursor() as cursor:
+                moved = False
+                if has_default:
+                    cursor.execute(
+                        f'SELECT EXISTS (SELECT 1 FROM {_qn(DEFAULT_PARTITION)} '
+                        f'WHERE transaction_date >= %s AND transaction_date < %s)',
+                        [start, end]
+                    )
+                    moved = cursor.fetchone()[0]
+                if moved:
+                    # Không tạo được partition khi DEFAULT đang chứa dòng thuộc khoảng của nó
+                    cursor.execute(f'ALTER TABLE {_qn(TABLE)} DETACH PARTITION {_qn(DEFAULT_PARTITION)}')
+                    _create_partition(cursor, start, end, name)
+                    cursor.execute(
+                        f'INSERT INTO {_qn(TABLE)} SELECT * FROM {_qn(DEFAULT_PARTITION)} '
+                        f'WHERE transaction_date >= %s AND transaction_date < %s',
+                        [start, end]
+                    )
+                    cursor.execute(
+                        f'DELETE FROM {_qn(DEFAULT_PARTITION)} WHERE transaction_date >= %s AND transaction_date < %s',
+                        [start, end]
+                    )
+                    cursor.execute(f'ALTER TABLE {_qn(TABLE)} ATTACH PARTITION {_qn(DEFAULT_PARTITION)} DEFAULT')
+                else:
+                    _create_partition(cursor, start, end, name)
+            ranges.append((start, end))
+            created.append(name)
+        start = end
+    return created
+
+
+def convert_to_partitioned(interval: Optional[str] = None, premake: Optional[int] = None) -> Dict:
+    """
+    Chuyển finance_transaction sang bảng partition theo transaction_date trong một transaction
+    (khóa bảng suốt quá trình chép dữ liệu: chạy trong giờ bảo trì)
+    1. Đổi tên bảng cũ thành finance_transaction_unpartitioned (cùng index, sequence)
+    2. Tạo bảng cha cùng cột, khóa chính (id, transaction_date), sequence mới cho id
+    3. Tạo partition từ kỳ của giao dịch cũ nhất tới PREMAKE kỳ sau hôm nay, và partition DEFAULT
+    4. Chép dữ liệu, tạo lại các index (giữ tên cho migration sau này) và khóa ngoại
+    """
+    config = get_config()
+    interval = interval or config['INTERVAL']
+    premake = config['PREMAKE'] if premake is None else premake
+    if connection.vendor != 'postgresql':
+        raise ValueError('Partition chỉ hỗ trợ PostgreSQL')
+    if is_partitioned():
+        raise ValueError(f'{TABLE} đã được partition')
+    if table_exists(LEGACY_TABLE):
+        raise ValueError(f'Bảng {LEGACY_TABLE} đã tồn tại (xóa bằng `partition_transactions drop-legacy`)')
+
+    columns = ', '.join(_qn(field.column) for field in Transaction._meta.concrete_fields)
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {_qn(TABLE)} IN ACCESS EXCLUSIVE MODE')
+
+        # Định nghĩa index, khóa chính, khóa ngoại của bảng cũ
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s',
+            [TABLE]
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'u', 'f')",
+            [TABLE]
+        )
+        constraints = cursor.fetchall()
+        primary_key = next(name for name, kind, _ in constraints if kind == 'p')
+        unique = [name for name, kind, _ in constraints if kind == 'u']
+        unique += [name for name, definition in indexes
+                   if definition.startswith('CREATE UNIQUE') and name != primary_key]
+        if unique:
+            # Ràng buộc unique trên bảng partition phải chứa transaction_date
+            raise ValueError(f'Không hỗ trợ ràng buộc unique trên {TABLE}: {", ".join(unique)}')
+        foreign_keys = [(name, definition) for name, kind, definition in constraints if kind == 'f']
+        cursor.execute(
+            "SELECT conname, conrelid::regclass::text FROM pg_constraint "
+            "WHERE confrelid = to_regclass(%s) AND contype = 'f'",
+            [TABLE]
+        )
+        referencing = cursor.fetchall()
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [TABLE, 'id'])
+        old_sequence = cursor.fetchone()[0]
+
+        # 1. Bảng cũ
+        for name, _ in indexes:
+            cursor.execute(f'ALTER INDEX {_qn(name)} RENAME TO {_qn(_legacy_name(name))}')
+        cursor.execute(f'ALTER TABLE {_qn(TABLE)} RENAME TO {_qn(LEGACY_TABLE)}')
+        if old_sequence:
+            cursor.execute(f'ALTER SEQUENCE {old_sequence} RENAME TO {_qn(f"{LEGACY_TABLE}_id_seq")}')
+
+        # 2. Bảng cha (LIKE không chép identity: id dùng sequence riêng, Django vẫn tìm được qua
+        # pg_get_serial_sequence khi reset sequence)
+        sequence = f'{TABLE}_id_seq'
+        cursor.execute(
+            f'CREATE TABLE {_qn(TABLE)} (LIKE {_qn(LEGACY_TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS '
+            f'INCLUDING STORAGE INCLUDING COMMENTS) PARTITION BY RANGE (transaction_date)'
+        )
+        cursor.execute(f'CREATE SEQUENCE {_qn(sequence)} AS bigint OWNED BY {_qn(TABLE)}.id')
+        cursor.execute(
+            f'SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {_qn(LEGACY_TABLE)}), 0) + 1, false)', [sequence]
+        )
+        cursor.execute(f"ALTER TABLE {_qn(TABLE)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        cursor.execute(f'ALTER TABLE {_qn(TABLE)} ADD CONSTRAINT {_qn(primary_key)} PRIMARY KEY (id, transaction_date)')
+
+        # 3. Partition
+        cursor.execute(f'SELECT MIN(transaction_date), MAX(transaction_date) FROM {_qn(LEGACY_TABLE)}')
+        first, last = cursor.fetchone()
+        today = date.today()
+        until = max(last or today, add_periods(period_start(today, interval), premake, interval))
+        start = period_start(min(first or today, today), interval)
+        partitions = 0
+        while start <= until:
+            end = next_period(start, interval)
+            _create_partition(cursor, start, end, partition_name(start, interval))
+            partitions += 1
+            start = end
+        cursor.execute(f'CREATE TABLE {_qn(DEFAULT_PARTITION)} PARTITION OF {_qn(TABLE)} DEFAULT')
+
+        # 4. Dữ liệu, index, khóa ngoại
+        cursor.execute(f'INSERT INTO {_qn(TABLE)} ({columns}) SELECT {columns} FROM {_qn(LEGACY_TABLE)}')
+        rows = cursor.rowcount
+        for name, definition in indexes:
+            if name != primary_key:
+                # indexdef lấy trước khi đổi tên nên trỏ tới bảng cha mới
+                cursor.execute(definition)
+        for name, definition in foreign_keys:
+            # Bảng cũ chỉ là bản chụp: bỏ khóa ngoại để không chặn việc xóa user / category
+            cursor.execute(f'ALTER TABLE {_qn(LEGACY_TABLE)} DROP CONSTRAINT {_qn(name)}')
+            cursor.execute(f'ALTER TABLE {_qn(TABLE)} ADD CONSTRAINT {_qn(name)} {definition}')
+        for name, table in referencing:
+            cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT {_qn(name)}')
+        cursor.execute(f'ANALYZE {_qn(TABLE)}')
+
+    return {'rows': rows, 'partitions': partitions + 1, 'dropped_foreign_keys': [name for name, _ in referencing]}
+
+
+def _legacy_name(name: str) -> str:
+    # Tên định danh Postgres tối đa 63 byte
+    return f'{name[:50]}_unpart'
+
+
+def detach_partition(partition: Partition, mode: str = 'archive', schema: Optional[str] = None) -> int:
+    """
+    Tách một partition khỏi finance_transaction, trả về số giao dịch trong partition
+    - mode='archive': chuyển sang schema lưu trữ
+    - mode='detach': giữ thành bảng độc lập cùng schema
+    - mode='drop': xóa hẳn
+    Các bảng tham chiếu được xử lý như on_delete của ORM: CASCADE thì xóa (archive / detach chép
+    các dòng con như TransactionSource sang bảng <partition>_<model> trước), SET_NULL thì bỏ liên kết
+    """
+    if partition.is_default:
+        raise ValueError('Không tách partition DEFAULT')
+    schema = schema or get_config()['ARCHIVE_SCHEMA']
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {_qn(TABLE)} DETACH PARTITION {_qn(partition.name)}')
+        cursor.execute(f'SELECT COUNT(*) FROM {_qn(partition.name)}')
+        rows = cursor.fetchone()[0]
+        if mode == 'archive':
+            cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {_qn(schema)}')
+
+        ids = f'SELECT id FROM {_qn(partition.name)}'
+        for relation in Transaction._meta.related_objects:
+            table = _qn(relation.related_model._meta.db_table)
+            column = _qn(relation.field.column)
+            if relation.on_delete is CASCADE:
+                if mode != 'drop':
+                    # Giữ lại các dòng con (dữ liệu gốc NLP / OCR) cạnh bảng của partition
+                    copy = _qn(f'{partition.name}_{relation.related_model._meta.model_name}')
+                    if mode == 'archive':
+                        copy = f'{_qn(schema)}.{copy}'
+                    cursor.execute(f'CREATE TABLE {copy} AS SELECT * FROM {table} WHERE {column} IN ({ids})')
+                cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({ids})')
+            else:
+                cursor.execute(f'UPDATE {table} SET {column} = NULL WHERE {column} IN ({ids})')
+
+        if mode == 'archive':
+            cursor.execute(f'ALTER TABLE {_qn(partition.name)} SET SCHEMA {_qn(schema)}')
+        elif mode == 'drop':
+            cursor.execute(f'DROP TABLE {_qn(partition.name)}')
+    return rows
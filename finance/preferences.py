@@ -0,0 +1,73 @@
+"""
+Truy cập UserPreferences có cache: memo trên user của request hiện tại
+và cache dùng chung giữa các request (làm mới khi preferences được lưu)
+"""
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .metrics import CACHE_REQUESTS
+from .models import UserPreferences
+
+
+# Thuộc tính trên instance User dùng làm memo trong một request
+_MEMO_ATTR = '_finance_preferences'
+# Đánh dấu user chưa có preferences (phân biệt với cache miss)
+_MISSING = '__missing__'
+
+
+def _cache_key(user_id: int) -> str:
+    return f'prefs:{user_id}'
+
+
+def _to_values(preferences: UserPreferences) -> dict:
+    return {field.attname: getattr(preferences, field.attname) for field in preferences._meta.concrete_fields}
+
+
+def _from_values(values: dict) -> UserPreferences:
+    names = list(values)
+    return UserPreferences.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+def get_preferences(user, create: bool = False) -> Optional[UserPreferences]:
+    """
+    Lấy preferences của user: memo -> cache -> database
+    create=True: tạo preferences mặc định nếu chưa có (giống get_or_create)
+    Trả về None nếu chưa có và create=False
+    """
+    memo = getattr(user, _MEMO_ATTR, None)
+    if isinstance(memo, UserPreferences):
+        CACHE_REQUESTS.inc(cache='preferences', result='memo_hit')
+        return memo
+    if memo == _MISSING and not create:
+        CACHE_REQUESTS.inc(cache='preferences', result='memo_hit')
+        return None
+
+    values = cache.get(_cache_key(user.pk))
+    if values == _MISSING and not create:
+        CACHE_REQUESTS.inc(cache='preferences', result='shared_hit')
+        preferences = None
+    elif values is not None and values != _MISSING:
+        CACHE_REQUESTS.inc(cache='preferences', result='shared_hit')
+        preferences = _from_values(values)
+    else:
+        CACHE_REQUESTS.inc(cache='preferences', result='miss')
+        if create:
+            preferences, _ = UserPreferences.objects.get_or_create(user=user)
+        else:
+            preferences = UserPreferences.objects.filter(user=user).first()
+        cache.set(
+            _cache_key(user.pk),
+            _to_values(preferences) if preferences else _MISSING,
+            getattr(settings, 'PREFERENCES_CACHE_TIMEOUT', 300)
+        )
+
+    setattr(user, _MEMO_ATTR, preferences if preferences else _MISSING)
+    return preferences
+
+
+def invalidate_preferences(user_id: int):
+    """Xóa cache dùng chung (memo của request đang chạy do nơi lưu tự cập nhật)"""
+    cache.delete(_cache_key(user_id))
@@ -0,0 +1,159 @@
+"""
+Profiler theo yêu cầu cho request thật (bật qua ProfilerMiddleware, không cần deploy lại)
+
+- Staff gửi header X-Profile: 1 hoặc query param ?_profile=1
+- Hoặc lấy mẫu: REQUEST_PROFILER['SAMPLE_RATE'], giới hạn theo PATHS / USER_IDS
+  (vd. chỉ /api/ai/savings-suggestions/ của một user đang báo chậm)
+
+Mỗi lần chạy lưu một RequestProfile: pstats (tải về dạng .prof, xem bằng snakeviz / flameprof),
+top hàm theo thời gian cộng dồn, các câu SQL kèm thời gian và EXPLAIN
+"""
+import cProfile
+import io
+import marshal
+import pstats
+import random
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from .authentication import authenticate_request
+from .instrumentation import explain
+from .models import RequestProfile
+
+
+HEADER = 'X-Profile'
+QUERY_PARAM = '_profile'
+
+DEFAULT_REQUEST_PROFILER = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 0.0,       # Tỉ lệ request được lấy mẫu (0 = chỉ profile khi staff yêu cầu)
+    'PATHS': [],              # Tiền tố path được lấy mẫu (rỗng = mọi path)
+    'USER_IDS': [],           # Chỉ lấy mẫu request của các user này (rỗng = mọi user)
+    'MAX_QUERIES': 500,       # Số câu SQL tối đa được lưu
+    'MAX_EXPLAINS': 20,       # Chỉ EXPLAIN các câu SQL chậm nhất
+    'STATS_LIMIT': 60,        # Số dòng của bảng top hàm
+    'KEEP': 200,              # Số profile giữ lại (cũ hơn bị xóa)
+}
+
+
+def get_config() -> dict:
+    return {**DEFAULT_REQUEST_PROFILER, **getattr(settings, 'REQUEST_PROFILER', {})}
+
+
+def requested_trigger(request):
+    """'header' / 'query' nếu request yêu cầu profile, ngược lại None (chưa kiểm tra quyền)"""
+    if request.headers.get(HEADER, '').lower() in ('1', 'true'):
+        return 'header'
+    if request.GET.get(QUERY_PARAM, '').lower() in ('1', 'true'):
+        return 'query'
+    return None
+
+
+def should_profile(request, config):
+    """
+    Quyết định profile request hay không: trả về (trigger, user) hoặc (None, None)
+    Chỉ xác thực user khi request có yêu cầu profile hoặc trúng mẫu
+    """
+    trigger = requested_trigger(request)
+    if trigger is not None:
+        user = authenticate_request(request)
+        if user is not None and user.is_staff:
+            return trigger, user
+        return None, None
+
+    if config['SAMPLE_RATE'] <= 0 or random.random() >= config['SAMPLE_RATE']:
+        return None, None
+    if config['PATHS'] and not request.path.startswith(tuple(config['PATHS'])):
+        return None, None
+    user = authenticate_request(request)
+    if config['USER_IDS'] and (user is None or user.pk not in config['USER_IDS']):
+        return None, None
+    return 'sampled', user
+
+
+class QueryRecorder:
+    """connection.execute_wrapper: ghi lại câu SQL, tham số và thời gian của từng query"""
+
+    def __init__(self, alias, limit):
+        self.alias = alias
+        self.limit = limit
+        self.queries = []
+        self.count = 0
+        self.total_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.total_time += elapsed
+            if len(self.queries) < self.limit:
+                self.queries.append({
+                    'alias': self.alias,
+                    'sql': sql,
+                    'params': None if many else params,
+                    'time_ms': round(elapsed * 1000, 3),
+                })
+
+
+def run_profiled(get_response, request):
+    """Chạy request dưới cProfile, trả về (response, profiler, thời gian)"""
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        response = get_response(request)
+    finally:
+        profiler.disable()
+    return response, profiler, time.perf_counter() - started
+
+
+def _explain_queries(queries, limit):
+    """EXPLAIN các câu SELECT chậm nhất (mỗi câu SQL một lần)"""
+    explained = {}
+    for query in sorted(queries, key=lambda q: q['time_ms'], reverse=True):
+        if len(explained) >= limit:
+            break
+        if query['sql'] in explained or (query['params'] is None and '%s' in query['sql']):
+            continue
+        try:
+            explained[query['sql']] = explain(connections[query['alias']], query['sql'], query['params'])
+        except DatabaseError as e:
+            explained[query['sql']] = f'EXPLAIN lỗi: {e}'
+    for query in queries:
+        query['explain'] = explained.get(query['sql'], '')
+        query['params'] = [str(value)[:200] for value in query['params'] or ()]
+    return queries
+
+
+def save_profile(request, response, user, trigger, profiler, duration, recorders, config):
+    """Lưu RequestProfile và xóa các profile cũ vượt quá KEEP"""
+    profiler.create_stats()
+    # Dump trước: pstats.Stats(profiler) lấy đi profiler.stats
+    profile_data = marshal.dumps(profiler.stats)
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(config['STATS_LIMIT'])
+
+    queries = [query for recorder in recorders for query in recorder.queries]
+    profile = RequestProfile.objects.create(
+        user=user if user is not None and user.is_authenticated else None,
+        trigger=trigger,
+        method=request.method,
+        path=request.path[:500],
+        query_string=request.META.get('QUERY_STRING', ''),
+        status_code=response.status_code,
+        duration_ms=round(duration * 1000, 2),
+        query_count=sum(recorder.count for recorder in recorders),
+        sql_time_ms=round(sum(recorder.total_time for recorder in recorders) * 1000, 2),
+        stats_text=stream.getvalue(),
+        profile_data=profile_data,
+        queries=_explain_queries(queries, config['MAX_EXPLAINS']),
+    )
+
+    stale_ids = RequestProfile.objects.order_by('-created_at').values_list('id', flat=True)[config['KEEP']:]
+    RequestProfile.objects.filter(id__in=list(stale_ids)).delete()
+    return profile
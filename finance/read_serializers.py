@@ -0,0 +1,98 @@
+"""
+Đường đọc nhanh cho các danh sách lớn: dùng values() thay cho model instances
+Kết quả giống hệt serializer.data của ModelSerializer tương ứng, kể cả việc bỏ key
+khi quan hệ NULL (vd. category_name của giao dịch không có category)
+"""
+from typing import Dict, List, Optional, Tuple
+
+from rest_framework import serializers
+from rest_framework.fields import empty
+
+from .instrumentation import timed
+
+
+def serializer_lookups(serializer) -> Dict[str, str]:
+    """
+    Ánh xạ tên field của serializer -> lookup trong database
+    (category_name -> category__name, related_budget.id -> related_budget)
+    Field không đọc được từ cột (source='*', SerializerMethodField) bị bỏ qua
+    """
+    lookups = {}
+    for name, field in serializer.fields.items():
+        if field.write_only or field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+            continue
+        parts = field.source.split('.')
+        if len(parts) == 2 and parts[1] in ('id', 'pk'):
+            lookups[name] = parts[0]
+        else:
+            lookups[name] = '__'.join(parts)
+    return lookups
+
+
+class ValuesReader:
+    """
+    Serialize queryset bằng values(): một query, không tạo model instance,
+    mỗi giá trị chỉ đi qua to_representation của field tương ứng
+    """
+
+    def __init__(self, serializer_class, fields: Optional[List[str]] = None):
+        serializer = serializer_class(fields=fields) if fields else serializer_class()
+        lookups = serializer_lookups(serializer)
+        missing = [name for name in serializer.fields if name not in lookups and not serializer.fields[name].write_only]
+        if missing:
+            raise ValueError(f'Không đọc được bằng values(): {", ".join(missing)}')
+
+        self.columns: List[Tuple[str, str, object]] = [
+            (name, lookup, self._converter(serializer.fields[name]))
+            for name, lookup in lookups.items()
+        ]
+        # Field đọc qua quan hệ (source='category.name'): khi quan hệ NULL serializer bỏ hẳn key
+        # (SkipField) thay vì trả null; đọc thêm cột khóa ngoại để biết quan hệ có NULL không
+        self.optional: List[Tuple[str, str]] = [
+            (name, lookups[name].split('__')[0])
+            for name, field in serializer.fields.items()
+            if name in lookups and '__' in lookups[name] and self._skipped_when_null(field)
+        ]
+
+    @staticmethod
+    def _skipped_when_null(field) -> bool:
+        """Giống Field.get_attribute của DRF: không default, không allow_null, không bắt buộc -> SkipField"""
+        return field.default is empty and not field.allow_null and not field.required
+
+    @staticmethod
+    def _converter(field):
+        """Hàm chuyển giá trị database sang dạng JSON giống serializer (None = giữ nguyên)"""
+        if isinstance(field, (serializers.RelatedField, serializers.IntegerField,
+                              serializers.BooleanField, serializers.JSONField)):
+            return None
+        if isinstance(field, serializers.CharField):
+            return None
+        if isinstance(field, serializers.DateField) and not isinstance(field, serializers.DateTimeField):
+            return lambda value: value.isoformat()
+        return field.to_representation
+
+    def values(self, queryset):
+        """Queryset trả về dict chỉ gồm các cột cần thiết (dùng được với paginator)"""
+        lookups = [lookup for _, lookup, _ in self.columns]
+        return queryset.values(*dict.fromkeys(lookups + [guard for _, guard in self.optional]))
+
+    @timed('serialize')
+    def convert(self, rows) -> List[Dict]:
+        """Đổi các dòng values() sang dict theo tên field của serializer"""
+        columns = self.columns
+        items = [
+            {
+                name: row[lookup] if convert is None or row[lookup] is None else convert(row[lookup])
+                for name, lookup, convert in columns
+            }
+            for row in rows
+        ]
+        if self.optional:
+            for row, item in zip(rows, items):
+                for name, guard in self.optional:
+                    if row[guard] is None:
+                        del item[name]
+        return items
+
+    def read(self, queryset) -> List[Dict]:
+        return self.convert(self.values(queryset))
@@ -0,0 +1,40 @@
+"""
+JSON renderer nhanh dựa trên orjson (nếu đã cài), kết quả giống JSONRenderer của DRF
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .instrumentation import span
+
+try:
+    import orjson
+except ImportError:  # orjson là tùy chọn, không có thì dùng renderer mặc định của DRF
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Render bằng orjson: datetime/date/UUID được mã hóa native,
+    các kiểu còn lại (Decimal, lazy string, QuerySet...) đi qua encoder của DRF
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with span('render'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Browsable API / ?indent= cần định dạng đẹp: dùng renderer gốc
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+        return orjson.dumps(
+            data,
+            default=JSONEncoder().default,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+        )
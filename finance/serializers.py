@@ -1,7 +1,21 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from .models import Category, Transaction, Budget, SpendingPattern, UserPreferences, Notification
+from .models import (
+    Category, Transaction, TransactionSource, Budget, SpendingPattern, UserPreferences, Notification, ImportJob
+)
+
+
+class SparseFieldsMixin:
+    """
+    Cho phép chỉ serialize một phần fields: Serializer(..., fields=['id', 'amount'])
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -43,17 +57,19 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     category_icon = serializers.CharField(source='category.icon', read_only=True)
     category_color = serializers.CharField(source='category.color', read_only=True)
     category_type = serializers.CharField(source='category.type', read_only=True)
+    # Chỉ nhận khi ghi (lưu vào TransactionSource); đọc lại ở TransactionDetailSerializer
+    original_nlp_input = serializers.CharField(write_only=True, required=False, allow_blank=True, allow_null=True)
 
     class Meta:
         model = Transaction
         fields = [
             'id', 'category', 'category_name', 'category_icon', 'category_color', 'category_type',
-            'amount', 'description', 'transaction_date', 'original_nlp_input',
+            'type', 'amount', 'description', 'transaction_date', 'original_nlp_input',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
@@ -65,8 +81,34 @@ class TransactionSerializer(serializers.ModelSerializer):
             # Note: We'll handle income/expense logic in views
         return attrs
 
+    def create(self, validated_data):
+        original_input = validated_data.pop('original_nlp_input', None)
+        transaction = super().create(validated_data)
+        if original_input:
+            TransactionSource.objects.create(transaction=transaction, kind='client', text=original_input)
+        return transaction
+
+    def update(self, instance, validated_data):
+        original_input = validated_data.pop('original_nlp_input', None)
+        transaction = super().update(instance, validated_data)
+        if original_input:
+            TransactionSource.objects.update_or_create(
+                transaction=transaction, defaults={'kind': 'client', 'text': original_input}
+            )
+        return transaction
+
+
+class TransactionDetailSerializer(TransactionSerializer):
+    """Chi tiết một giao dịch: kèm dữ liệu gốc (câu NLP, text và các khối OCR) từ TransactionSource"""
+    original_nlp_input = serializers.CharField(source='source.text', read_only=True, default=None)
+    source_kind = serializers.CharField(source='source.kind', read_only=True, default=None)
+    ocr_blocks = serializers.JSONField(source='source.blocks', read_only=True, default=None)
 
-class BudgetSerializer(serializers.ModelSerializer):
+    class Meta(TransactionSerializer.Meta):
+        fields = TransactionSerializer.Meta.fields + ['source_kind', 'ocr_blocks']
+
+
+class BudgetSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
 
     class Meta:
@@ -123,10 +165,10 @@ class UserPreferencesSerializer(serializers.ModelSerializer):
         return value
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer cho Notification"""
-    related_transaction_id = serializers.IntegerField(source='related_transaction.id', read_only=True, allow_null=True)
-    related_budget_id = serializers.IntegerField(source='related_budget.id', read_only=True, allow_null=True)
+    related_transaction_id = serializers.IntegerField(read_only=True, allow_null=True)
+    related_budget_id = serializers.IntegerField(read_only=True, allow_null=True)
     
     class Meta:
         model = Notification
@@ -137,3 +179,15 @@ class NotificationSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'read_at', 'email_sent']
 
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    """Serializer cho trạng thái ImportJob"""
+    
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'status', 'file_format', 'file_name',
+            'processed_rows', 'created_count', 'duplicate_count', 'error_count', 'errors',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,71 @@
+"""
+Signal handlers để làm mới các cache (và dữ liệu denormalize) khi dữ liệu gốc thay đổi
+Mỗi thay đổi xóa cache của process hiện tại, rồi báo cho các process khác qua invalidation_bus
+"""
+from django.contrib.auth import get_user_model
+from django.core.signals import request_started
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import invalidation_bus
+from .authentication import token_cache, invalidate_user_tokens
+from .category_registry import category_registry
+from .models import Category, UserPreferences
+from .preferences import invalidate_preferences
+from .transaction_types import sync_transaction_types
+
+
+# Sự kiện từ process khác -> xóa cache cục bộ
+invalidation_bus.register('user_tokens', token_cache.invalidate_remote)
+invalidation_bus.register('categories', lambda key: category_registry.invalidate())
+invalidation_bus.register('preferences', invalidate_preferences)
+
+
+@receiver(request_started)
+def start_invalidation_listener(sender, **kwargs):
+    """Chỉ process phục vụ request mới cần nghe sự kiện (không chạy khi migrate, shell...)"""
+    invalidation_bus.start_listener()
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Đăng xuất / thu hồi token: xóa khỏi cache ngay"""
+    token_cache.invalidate(instance.key)
+    # Gửi hash của token (không gửi token gốc qua NOTIFY)
+    invalidation_bus.publish('user_tokens', {
+        'user_id': instance.user_id,
+        'keys': [token_cache.shared_key(instance.key)],
+    })
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_saved_user_tokens(sender, instance, created, **kwargs):
+    """Đổi mật khẩu, khóa tài khoản...: user trong cache không còn đúng"""
+    if not created:
+        keys = invalidate_user_tokens(instance.pk)
+        invalidation_bus.publish('user_tokens', {'user_id': instance.pk, 'keys': keys})
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_registry(sender, **kwargs):
+    """Category thay đổi: registry nạp lại ở lần dùng tiếp theo"""
+    category_registry.invalidate()
+    invalidation_bus.publish('categories')
+
+
+@receiver(post_save, sender=Category)
+def sync_category_transaction_types(sender, instance, created, **kwargs):
+    """Đổi type của danh mục: cập nhật Transaction.type (theo batch, sau khi commit)"""
+    if not created:
+        db_transaction.on_commit(lambda: sum(sync_transaction_types([instance.pk])))
+
+
+@receiver(post_save, sender=UserPreferences)
+@receiver(post_delete, sender=UserPreferences)
+def invalidate_saved_preferences(sender, instance, **kwargs):
+    """Preferences được cập nhật (PUT/PATCH, admin...): xóa bản cache"""
+    invalidate_preferences(instance.user_id)
+    invalidation_bus.publish('preferences', instance.user_id)
@@ -0,0 +1,193 @@
+"""
+Nhật ký câu SQL chậm: execute wrapper được gắn vào mọi kết nối database,
+câu nào chạy lâu hơn SLOW_QUERY_LOG['THRESHOLD_MS'] được ghi vào SlowQuery
+kèm EXPLAIN (ANALYZE, BUFFERS) trên Postgres, gộp theo fingerprint của SQL đã chuẩn hóa
+
+Mỗi fingerprint chỉ chạy EXPLAIN lần đầu gặp và sau mỗi PLAN_REFRESH giây (trong một process)
+"""
+import contextvars
+import hashlib
+import logging
+import re
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, transaction as db_transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .instrumentation import explain
+from .models import SlowQuery
+
+logger = logging.getLogger('finance.slow_queries')
+
+
+DEFAULT_SLOW_QUERY_LOG = {
+    'ENABLED': True,
+    'THRESHOLD_MS': 200,
+    'EXPLAIN_ANALYZE': True,  # Postgres: EXPLAIN (ANALYZE, BUFFERS), chạy lại câu SELECT chậm
+    'PLAN_REFRESH': 3600,     # Giây trước khi chụp lại kế hoạch của cùng một fingerprint
+    'MAX_ENDPOINTS': 20,      # Số endpoint tối đa lưu cho một fingerprint
+}
+
+# Request đang xử lý (gắn bởi SlowQueryLogMiddleware) để biết endpoint của câu SQL
+current_request = contextvars.ContextVar('finance_slow_query_request', default=None)
+# Đang ghi log / EXPLAIN: bỏ qua các câu SQL của chính nhật ký
+_recording = contextvars.ContextVar('finance_slow_query_recording', default=False)
+
+# fingerprint -> thời điểm chụp kế hoạch gần nhất; (fingerprint, endpoint) đã lưu (trong process)
+_plan_times = {}
+_seen_endpoints = set()
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def get_config() -> dict:
+    return {**DEFAULT_SLOW_QUERY_LOG, **getattr(settings, 'SLOW_QUERY_LOG', {})}
+
+
+def normalize_sql(sql: str) -> str:
+    """Bỏ giá trị cụ thể: chuỗi, số, %s -> ?, IN (?, ?, ?) -> IN (...)"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_LIST_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql: str) -> str:
+    return hashlib.sha1(normalized_sql.encode('utf-8')).hexdigest()
+
+
+def _current_endpoint() -> str:
+    request = current_request.get()
+    if request is None:
+        return ''
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else request.path
+
+
+class SlowQueryWrapper:
+    """connection.execute_wrapper cho một kết nối"""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            config = get_config()
+            if elapsed_ms >= config['THRESHOLD_MS'] and not _recording.get():
+                token = _recording.set(True)
+                try:
+                    record(self.alias, sql, None if many else params, elapsed_ms, config)
+                except Exception:
+                    # Nhật ký không bao giờ được làm hỏng câu SQL của ứng dụng
+                    logger.exception('Không ghi được slow query')
+                finally:
+                    _recording.reset(token)
+
+
+def record(alias, sql, params, elapsed_ms, config):
+    normalized = normalize_sql(sql)
+    key = fingerprint(normalized)
+    endpoint = _current_endpoint()
+    logger.warning('Slow query %.1f ms [%s] %s', elapsed_ms, endpoint or '-', normalized[:500])
+
+    connection = connections[alias]
+    now = time.monotonic()
+    plan = None
+    if now - _plan_times.get(key, -config['PLAN_REFRESH']) >= config['PLAN_REFRESH']:
+        _plan_times[key] = now
+        try:
+            # Savepoint: EXPLAIN lỗi không làm hỏng transaction đang chạy
+            with db_transaction.atomic(using=alias):
+                plan = explain(connection, sql, params, analyze=config['EXPLAIN_ANALYZE'])
+        except DatabaseError as e:
+            plan = f'EXPLAIN lỗi: {e}'
+
+    values = {
+        'sql': sql,
+        'params': '' if params is None else repr(params)[:2000],
+        'elapsed_ms': elapsed_ms,
+        'plan': plan,
+        'endpoint': endpoint,
+    }
+    if connection.in_atomic_block:
+        # Ghi sau khi transaction của ứng dụng commit (rollback thì bỏ qua)
+        db_transaction.on_commit(lambda: _save(alias, key, normalized, values, config), using=alias)
+    else:
+        _save(alias, key, normalized, values, config)
+
+
+def _save(alias, key, normalized, values, config):
+    token = _recording.set(True)
+    try:
+        _upsert(alias, key, normalized, values, config)
+    except DatabaseError:
+        logger.exception('Không ghi được slow query')
+    finally:
+        _recording.reset(token)
+
+
+def _upsert(alias, key, normalized, values, config):
+    now = timezone.now()
+    queryset = SlowQuery.objects.using(alias).filter(fingerprint=key)
+    updated = queryset.update(
+        calls=F('calls') + 1,
+        total_time_ms=F('total_time_ms') + values['elapsed_ms'],
+        max_time_ms=Greatest(F('max_time_ms'), values['elapsed_ms']),
+        last_seen=now,
+    )
+    if not updated:
+        try:
+            with db_transaction.atomic(using=alias):
+                SlowQuery.objects.using(alias).create(
+                    fingerprint=key, normalized_sql=normalized,
+                    sample_sql=values['sql'], sample_params=values['params'],
+                    plan=values['plan'] or '', plan_captured_at=now if values['plan'] is not None else None,
+                    endpoints=[values['endpoint']] if values['endpoint'] else [],
+                    calls=1, total_time_ms=values['elapsed_ms'], max_time_ms=values['elapsed_ms'], last_seen=now,
+                )
+            _seen_endpoints.add((key, values['endpoint']))
+            return
+        except IntegrityError:
+            # Process khác vừa tạo cùng fingerprint
+            queryset.update(calls=F('calls') + 1, total_time_ms=F('total_time_ms') + values['elapsed_ms'],
+                            max_time_ms=Greatest(F('max_time_ms'), values['elapsed_ms']), last_seen=now)
+
+    if values['plan'] is not None:
+        queryset.update(sample_sql=values['sql'], sample_params=values['params'],
+                        plan=values['plan'], plan_captured_at=now)
+
+    if values['endpoint'] and (key, values['endpoint']) not in _seen_endpoints:
+        _seen_endpoints.add((key, values['endpoint']))
+        with db_transaction.atomic(using=alias):
+            slow_query = queryset.select_for_update().first()
+            if slow_query and values['endpoint'] not in slow_query.endpoints \
+                    and len(slow_query.endpoints) < config['MAX_ENDPOINTS']:
+                slow_query.endpoints.append(values['endpoint'])
+                slow_query.save(update_fields=['endpoints'])
+
+
+@receiver(connection_created)
+def install(sender, connection, **kwargs):
+    """
+    Gắn wrapper vào mỗi kết nối database mới
+    Kết nối thường được mở bên trong một connection.execute_wrapper() (track_queries, profiler...):
+    execute_wrappers là stack nên wrapper cố định phải nằm ở đáy, nếu không lệnh pop() khi
+    thoát khối đó sẽ gỡ nhầm SlowQueryWrapper và để lại wrapper của khối trên kết nối
+    """
+    if not get_config()['ENABLED']:
+        return
+    if not any(isinstance(wrapper, SlowQueryWrapper) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.insert(0, SlowQueryWrapper(connection.alias))
@@ -0,0 +1,46 @@
+"""
+Giữ cột Transaction.type (thu/chi) khớp với Category.type
+Các phép tổng hợp lọc theo Transaction.type nên không cần join finance_category
+"""
+from typing import Iterable, Iterator, Optional
+
+from django.utils import timezone
+
+from .category_registry import category_registry
+from .models import Category, Transaction
+
+
+def type_for_category(category_id, default: str = 'expense') -> str:
+    """type của giao dịch thuộc danh mục này (danh mục không còn tồn tại: giữ default)"""
+    category = category_registry.get(category_id)
+    if category is None:
+        category = Category.objects.filter(pk=category_id).only('type').first()
+    return category.type if category else default
+
+
+def sync_transaction_types(category_ids: Optional[Iterable[int]] = None, batch_size: int = 5000) -> Iterator[int]:
+    """
+    Sửa type của các giao dịch lệch với danh mục theo từng batch (mỗi batch một câu UPDATE ngắn)
+    - category_ids: chỉ xét các danh mục này (None = tất cả)
+    Cập nhật cả updated_at để thiết bị mobile đồng bộ lại các giao dịch bị đổi
+    Generator: yield số dòng đã sửa sau mỗi batch
+    """
+    categories = Category.objects.all()
+    if category_ids is not None:
+        categories = categories.filter(pk__in=list(category_ids))
+
+    for category_id, category_type in categories.values_list('id', 'type'):
+        last_id = 0
+        while True:
+            ids = list(
+                Transaction.objects.filter(category_id=category_id, id__gt=last_id)
+                .exclude(type=category_type)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            yield Transaction.objects.filter(id__in=ids, category_id=category_id).update(
+                type=category_type, updated_at=timezone.now()
+            )
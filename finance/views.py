@@ -1,26 +1,43 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.authtoken.models import Token
-from django.contrib.auth import authenticate
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Sum, Q, Count
 from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
+import threading
 
-from .models import Category, Transaction, Budget, SpendingPattern, UserPreferences, Notification
+from .models import Category, Transaction, TransactionSource, Budget, SpendingPattern, Notification, ImportJob
 from .serializers import (
     UserSerializer, UserRegistrationSerializer,
-    CategorySerializer, TransactionSerializer,
+    CategorySerializer, TransactionSerializer, TransactionDetailSerializer,
     BudgetSerializer, SpendingPatternSerializer,
-    UserPreferencesSerializer, NotificationSerializer
+    UserPreferencesSerializer, NotificationSerializer, ImportJobSerializer
 )
+from .category_registry import category_registry
+from .filters import filter_transactions
+from .idempotency import idempotent
+from . import metrics as app_metrics
+from .pagination import FlexiblePagination
+from .preferences import get_preferences
+from .read_serializers import ValuesReader, serializer_lookups
+from .export_service import ExportService
+from .import_service import ImportService
 from .nlp_service import NLPService
 from .ai_service import AIService
+from .dashboard_service import DashboardService
 from .ocr_service import OCRService
-from .notification_service import check_large_transaction, check_budget_exceeded, create_anomaly_notification
+from .notification_service import (
+    check_large_transaction, check_budget_exceeded, create_anomaly_notification,
+    adjust_unread_count, mark_all_notifications_read, get_unread_count, get_notifications_etag
+)
 
 
 @api_view(['GET'])
@@ -34,18 +51,25 @@ def api_root(request):
             'auth': {
                 'register': '/api/auth/register/',
                 'login': '/api/auth/login/',
+                'logout': '/api/auth/logout/',
+                'change_password': '/api/auth/change-password/',
                 'profile': '/api/auth/profile/',
             },
             'transactions': '/api/transactions/',
             'categories': '/api/categories/',
             'statistics': '/api/transactions/statistics/',
+            'export': '/api/transactions/export/',
+            'import': '/api/transactions/import/',
             'ai': {
                 'trends': '/api/ai/trends/',
                 'predictions': '/api/ai/predictions/',
                 'anomalies': '/api/ai/anomalies/',
                 'savings': '/api/ai/savings-suggestions/',
+                'insights': '/api/ai/insights/',
             },
             'chatbot': '/api/chatbot/',
+            'dashboard': '/api/dashboard/',
+            'metrics': '/api/metrics/',
         }
     })
 
@@ -89,6 +113,37 @@ def login(request):
     )
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def logout(request):
+    """Đăng xuất mọi thiết bị: thu hồi token của user (mỗi user chỉ có một token)"""
+    Token.objects.filter(user=request.user).delete()
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def change_password(request):
+    """Đổi mật khẩu: token cũ bị thu hồi, trả về token mới"""
+    old_password = request.data.get('old_password')
+    new_password = request.data.get('new_password')
+    # request.user lấy từ token cache không có hash mật khẩu: đọc lại từ database
+    user = get_user_model().objects.get(pk=request.user.pk)
+    
+    if not old_password or not user.check_password(old_password):
+        return Response({'error': 'Mật khẩu hiện tại không đúng'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        validate_password(new_password or '', user)
+    except ValidationError as e:
+        return Response({'error': list(e.messages)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    user.set_password(new_password)
+    user.save(update_fields=['password'])
+    Token.objects.filter(user=user).delete()
+    token = Token.objects.create(user=user)
+    return Response({'token': token.key})
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_profile(request):
@@ -101,7 +156,7 @@ def user_profile(request):
 def user_preferences(request):
     """Lấy hoặc cập nhật preferences của user"""
     try:
-        preferences, created = UserPreferences.objects.get_or_create(user=request.user)
+        preferences = get_preferences(request.user, create=True)
         
         if request.method == 'GET':
             serializer = UserPreferencesSerializer(preferences)
@@ -141,7 +196,7 @@ def generate_custom_report(request):
     from django.db.models import Sum, Count
     from collections import defaultdict
     
-    preferences, _ = UserPreferences.objects.get_or_create(user=request.user)
+    preferences = get_preferences(request.user, create=True)
     
     # Lấy tham số từ request hoặc dùng defaults từ preferences
     period = request.data.get('period', preferences.default_report_period)
@@ -185,26 +240,27 @@ def generate_custom_report(request):
         queryset = queryset.filter(category_id__in=categories)
     
     # Tính toán thống kê
-    total_income = queryset.filter(category__type='income').aggregate(
+    total_income = queryset.filter(type='income').aggregate(
         total=Sum('amount')
     )['total'] or Decimal('0')
     
-    total_expense = queryset.filter(category__type='expense').aggregate(
+    total_expense = queryset.filter(type='expense').aggregate(
         total=Sum('amount')
     )['total'] or Decimal('0')
     
     balance = total_income - total_expense
     
     # Thống kê theo category
-    category_stats = queryset.values('category__name', 'category__type').annotate(
+    # Nhóm theo type của giao dịch để giao dịch chưa có danh mục vẫn được tính
+    category_stats = queryset.values('category__name', 'type').annotate(
         total=Sum('amount'),
         count=Count('id')
     ).order_by('-total')
     
     # Thống kê theo ngày
     daily_stats = queryset.values('transaction_date').annotate(
-        income=Sum('amount', filter=Q(category__type='income')),
-        expense=Sum('amount', filter=Q(category__type='expense'))
+        income=Sum('amount', filter=Q(type='income')),
+        expense=Sum('amount', filter=Q(type='expense'))
     ).order_by('transaction_date')
     
     report = {
@@ -222,7 +278,7 @@ def generate_custom_report(request):
         'category_breakdown': [
             {
                 'category': item['category__name'] or 'Khác',
-                'type': item['category__type'],
+                'type': item['type'],
                 'total': float(item['total']),
                 'count': item['count'],
             }
@@ -246,6 +302,56 @@ def generate_custom_report(request):
     return Response(report)
 
 
+class SparseFieldsViewMixin:
+    """
+    Hỗ trợ ?fields=id,amount,... trên list/retrieve:
+    serializer chỉ trả về các fields được chọn và queryset chỉ nạp các cột tương ứng.
+    list đọc bằng values() (ValuesReader) thay vì tạo model instance cho từng dòng
+    """
+    fields_query_param = 'fields'
+
+    def get_sparse_fields(self):
+        if self.request is None or self.request.method != 'GET':
+            return None
+        value = self.request.query_params.get(self.fields_query_param)
+        if not value:
+            return None
+        return [name.strip() for name in value.split(',') if name.strip()]
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_sparse_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields = self.get_sparse_fields()
+        if not fields:
+            return queryset
+
+        # Ánh xạ fields của serializer sang cột database (category_name -> category__name)
+        columns, related = {'id'}, set()
+        for lookup in serializer_lookups(self.get_serializer_class()(fields=fields)).values():
+            parts = lookup.split('__')
+            columns.add(parts[0])
+            if len(parts) > 1:
+                related.add(parts[0])
+                columns.add(lookup)
+        # Chỉ join các quan hệ có field được chọn (only() không cho join quan hệ đã bị bỏ qua)
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+    def list(self, request, *args, **kwargs):
+        reader = ValuesReader(self.get_serializer_class(), self.get_sparse_fields())
+        queryset = reader.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.convert(page))
+        return Response(reader.convert(queryset))
+
+
 class CategoryViewSet(viewsets.ModelViewSet):
     """ViewSet cho Category"""
     serializer_class = CategorySerializer
@@ -255,35 +361,35 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return Category.objects.all()
     
     def list(self, request):
-        """Lấy danh sách categories"""
-        categories = Category.objects.all()
-        serializer = self.get_serializer(categories, many=True)
-        return Response(serializer.data)
+        """Lấy danh sách categories (từ registry, JSON đã render sẵn)"""
+        snapshot = category_registry.snapshot()
+        if request.accepted_renderer.format == 'json':
+            return HttpResponse(snapshot.json, content_type='application/json')
+        return Response(list(snapshot.data))
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     """ViewSet cho Transaction"""
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = FlexiblePagination
     
     def get_queryset(self):
         user = self.request.user
-        queryset = Transaction.objects.filter(user=user)
-        
-        # Filter theo category
-        category_id = self.request.query_params.get('category', None)
-        if category_id:
-            queryset = queryset.filter(category_id=category_id)
-        
-        # Filter theo khoảng thời gian
-        start_date = self.request.query_params.get('start_date', None)
-        end_date = self.request.query_params.get('end_date', None)
-        if start_date:
-            queryset = queryset.filter(transaction_date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(transaction_date__lte=end_date)
-        
-        return queryset
+        queryset = Transaction.objects.filter(user=user).select_related('category')
+        if self.action == 'retrieve':
+            queryset = queryset.select_related('source')
+        return filter_transactions(queryset, self.request.query_params)
+    
+    def get_serializer_class(self):
+        # Dữ liệu gốc (TransactionSource) chỉ trả về ở endpoint chi tiết
+        if self.action == 'retrieve':
+            return TransactionDetailSerializer
+        return TransactionSerializer
+    
+    @idempotent('transactions.create')
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
     
     def perform_create(self, serializer):
         transaction = serializer.save(user=self.request.user)
@@ -320,6 +426,7 @@ class TransactionViewSet(viewsets.ModelViewSet):
             pass
     
     @action(detail=False, methods=['post'])
+    @idempotent('transactions.nlp_input')
     def nlp_input(self, request):
         """Xử lý nhập liệu bằng ngôn ngữ tự nhiên"""
         text = request.data.get('text', '').strip()
@@ -356,11 +463,12 @@ class TransactionViewSet(viewsets.ModelViewSet):
             transaction = Transaction.objects.create(
                 user=request.user,
                 category=category,
+                type=nlp_result['type'],
                 amount=nlp_result['amount'],
                 description=nlp_result['description'],
                 transaction_date=nlp_result['date'],
-                original_nlp_input=text,
             )
+            TransactionSource.objects.create(transaction=transaction, kind='nlp', text=text)
             
             # Kiểm tra và tạo notifications
             check_large_transaction(transaction)
@@ -429,11 +537,11 @@ class TransactionViewSet(viewsets.ModelViewSet):
         
         # Tính tổng thu, chi
         total_income = transactions.filter(
-            category__type='income'
+            type='income'
         ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
         
         total_expense = transactions.filter(
-            category__type='expense'
+            type='expense'
         ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
         
         balance = total_income - total_expense
@@ -448,8 +556,8 @@ class TransactionViewSet(viewsets.ModelViewSet):
         
         # Thống kê theo ngày
         daily_stats = transactions.values('transaction_date').annotate(
-            income=Sum('amount', filter=Q(category__type='income')),
-            expense=Sum('amount', filter=Q(category__type='expense'))
+            income=Sum('amount', filter=Q(type='income')),
+            expense=Sum('amount', filter=Q(type='expense'))
         ).order_by('transaction_date')
         
         return Response({
@@ -474,6 +582,7 @@ class TransactionViewSet(viewsets.ModelViewSet):
         })
     
     @action(detail=False, methods=['post'])
+    @idempotent('transactions.ocr_receipt')
     def ocr_receipt(self, request):
         """Xử lý ảnh hóa đơn và trích xuất thông tin giao dịch bằng OCR"""
         if 'image' not in request.FILES:
@@ -540,10 +649,17 @@ class TransactionViewSet(viewsets.ModelViewSet):
             transaction = Transaction.objects.create(
                 user=request.user,
                 category=category,
+                type=transaction_info.get('type', 'expense'),
                 amount=transaction_info['amount'],
                 description=transaction_info.get('description', ocr_result.get('merchant_name', 'Từ hóa đơn')),
                 transaction_date=transaction_info.get('date'),
-                original_nlp_input=ocr_result.get('raw_text', '')[:500],  # Lưu text OCR
+            )
+            # Lưu toàn bộ text OCR và các khối kèm bbox
+            TransactionSource.objects.create(
+                transaction=transaction,
+                kind='ocr',
+                text=ocr_result.get('raw_text', ''),
+                blocks=ocr_result.get('blocks', []),
             )
             
             # Kiểm tra và tạo notifications
@@ -600,26 +716,27 @@ class TransactionViewSet(viewsets.ModelViewSet):
                     # Chuyển sang timezone aware nếu cần
                     if timezone.is_naive(last_sync):
                         last_sync = timezone.make_aware(last_sync)
-                    queryset = queryset.filter(
-                        Q(updated_at__gt=last_sync) | Q(created_at__gt=last_sync)
-                    )
+                    # updated_at (auto_now) luôn >= created_at nên chỉ cần lọc updated_at,
+                    # dùng được index (user, updated_at) thay vì OR trên hai cột
+                    queryset = queryset.filter(updated_at__gt=last_sync)
             except (ValueError, TypeError):
                 pass
         
         # Sắp xếp và giới hạn
         queryset = queryset.order_by('-updated_at', '-created_at')[:limit]
         
-        serializer = self.get_serializer(queryset, many=True)
+        data = ValuesReader(TransactionSerializer).read(queryset)
         
         # Trả về thêm metadata
         return Response({
-            'transactions': serializer.data,
-            'count': len(serializer.data),
+            'transactions': data,
+            'count': len(data),
             'server_time': timezone.now().isoformat(),
-            'has_more': len(serializer.data) == limit,
+            'has_more': len(data) == limit,
         })
     
     @action(detail=False, methods=['post'])
+    @idempotent('transactions.bulk_sync')
     def bulk_sync(self, request):
         """
         Đồng bộ bulk cho mobile - gửi nhiều transactions cùng lúc
@@ -711,6 +828,61 @@ class TransactionViewSet(viewsets.ModelViewSet):
             }
         }, status=status.HTTP_200_OK)
     
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Xuất giao dịch dạng stream (bộ nhớ không tăng theo số dòng)
+        Query params:
+        - file_format: csv (mặc định), ndjson hoặc xlsx
+        - category, start_date, end_date: giống danh sách giao dịch
+        """
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in ExportService.FORMATS:
+            return Response(
+                {'error': f'Định dạng không hỗ trợ. Chọn một trong: {", ".join(ExportService.FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            return ExportService.stream_response(self.get_queryset(), file_format)
+        except ImportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_file(self, request):
+        """
+        Import giao dịch từ file CSV hoặc sao kê OFX (xử lý nền)
+        Form data:
+        - file: file CSV (cột date, amount, description, category, type) hoặc OFX
+        - file_format: csv (mặc định) hoặc ofx
+        Trả về job, theo dõi tiến độ tại /api/imports/<id>/
+        """
+        if 'file' not in request.FILES:
+            return Response(
+                {'error': 'Vui lòng upload file CSV hoặc OFX'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        upload = request.FILES['file']
+        file_format = request.data.get('file_format')
+        if not file_format:
+            file_format = 'ofx' if upload.name.lower().endswith(('.ofx', '.qfx')) else 'csv'
+        if file_format not in dict(ImportJob.FORMAT_CHOICES):
+            return Response(
+                {'error': 'Định dạng không hỗ trợ. Chọn csv hoặc ofx'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        job = ImportJob.objects.create(
+            user=request.user,
+            file_format=file_format,
+            file=upload,
+            file_name=upload.name[:255],
+        )
+        threading.Thread(target=ImportService.run_job, args=(job.id,), daemon=True).start()
+        
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+    
     @action(detail=False, methods=['post'])
     def nlp_query(self, request):
         """Truy vấn bằng ngôn ngữ tự nhiên"""
@@ -734,12 +906,12 @@ class TransactionViewSet(viewsets.ModelViewSet):
         
         # Filter theo loại giao dịch nếu có thể xác định
         if is_expense_query:
-            queryset = queryset.filter(category__type='expense')
+            queryset = queryset.filter(type='expense')
         elif is_income_query:
-            queryset = queryset.filter(category__type='income')
+            queryset = queryset.filter(type='income')
         
         if query_result['category']:
-            category = Category.objects.filter(name=query_result['category']).first()
+            category = category_registry.get_by_name(query_result['category'])
             if category:
                 queryset = queryset.filter(category=category)
         
@@ -802,15 +974,40 @@ class TransactionViewSet(viewsets.ModelViewSet):
         return Response(result)
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     """ViewSet cho Notification"""
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = FlexiblePagination
     
     def get_queryset(self):
         """Chỉ trả về notifications của user hiện tại"""
         return Notification.objects.filter(user=self.request.user)
     
+    def list(self, request, *args, **kwargs):
+        """Danh sách notifications, hỗ trợ If-None-Match dựa trên bộ đếm"""
+        etag = get_notifications_etag(request.user)
+        if request.headers.get('If-None-Match') == etag:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        
+        response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+    
+    def perform_create(self, serializer):
+        notification = serializer.save(user=self.request.user)
+        adjust_unread_count(self.request.user, 0 if notification.is_read else 1)
+    
+    def perform_update(self, serializer):
+        was_read = serializer.instance.is_read
+        notification = serializer.save()
+        adjust_unread_count(self.request.user, int(was_read) - int(notification.is_read))
+    
+    def perform_destroy(self, instance):
+        was_read = instance.is_read
+        instance.delete()
+        adjust_unread_count(self.request.user, 0 if was_read else -1)
+    
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         """Đánh dấu notification là đã đọc"""
@@ -818,43 +1015,47 @@ class NotificationViewSet(viewsets.ModelViewSet):
         if notification.user != request.user:
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        notification.is_read = True
-        notification.read_at = timezone.now()
-        notification.save()
+        # Cập nhật có điều kiện: hai request đồng thời chỉ một request giảm bộ đếm
+        marked = Notification.objects.filter(pk=notification.pk, user=request.user, is_read=False).update(
+            is_read=True,
+            read_at=timezone.now()
+        )
+        if marked:
+            adjust_unread_count(request.user, -1)
+        notification.refresh_from_db(fields=['is_read', 'read_at'])
         
         return Response(NotificationSerializer(notification).data)
     
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """Đánh dấu tất cả notifications là đã đọc"""
-        count = Notification.objects.filter(
-            user=request.user,
-            is_read=False
-        ).update(
-            is_read=True,
-            read_at=timezone.now()
-        )
+        count = mark_all_notifications_read(request.user)
         
         return Response({'marked_read': count})
     
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         """Lấy số lượng notifications chưa đọc"""
-        count = Notification.objects.filter(
-            user=request.user,
-            is_read=False
-        ).count()
-        
-        return Response({'unread_count': count})
+        return Response({'unread_count': get_unread_count(request.user)})
+
 
+class ImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet xem trạng thái các tác vụ import"""
+    serializer_class = ImportJobSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return ImportJob.objects.filter(user=self.request.user)
 
-class BudgetViewSet(viewsets.ModelViewSet):
+
+class BudgetViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     """ViewSet cho Budget"""
     serializer_class = BudgetSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = FlexiblePagination
     
     def get_queryset(self):
-        return Budget.objects.filter(user=self.request.user)
+        return Budget.objects.filter(user=self.request.user).select_related('category')
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -885,13 +1086,13 @@ class BudgetViewSet(viewsets.ModelViewSet):
                 pass
         
         queryset = queryset.order_by('-created_at')[:limit]
-        serializer = self.get_serializer(queryset, many=True)
+        data = ValuesReader(BudgetSerializer).read(queryset)
         
         return Response({
-            'budgets': serializer.data,
-            'count': len(serializer.data),
+            'budgets': data,
+            'count': len(data),
             'server_time': timezone.now().isoformat(),
-            'has_more': len(serializer.data) == limit,
+            'has_more': len(data) == limit,
         })
 
 
@@ -923,43 +1124,55 @@ def sync_all(request):
     # Sync Transactions
     transactions_qs = Transaction.objects.filter(user=request.user)
     if last_sync:
-        transactions_qs = transactions_qs.filter(
-            Q(updated_at__gt=last_sync) | Q(created_at__gt=last_sync)
-        )
+        # Giống TransactionViewSet.sync: updated_at >= created_at
+        transactions_qs = transactions_qs.filter(updated_at__gt=last_sync)
     transactions_qs = transactions_qs.order_by('-updated_at', '-created_at')[:transactions_limit]
-    transactions_serializer = TransactionSerializer(transactions_qs, many=True)
+    transactions_data = ValuesReader(TransactionSerializer).read(transactions_qs)
     
     # Sync Budgets
     budgets_qs = Budget.objects.filter(user=request.user)
     if last_sync:
         budgets_qs = budgets_qs.filter(created_at__gt=last_sync)
     budgets_qs = budgets_qs.order_by('-created_at')[:budgets_limit]
-    budgets_serializer = BudgetSerializer(budgets_qs, many=True)
+    budgets_data = ValuesReader(BudgetSerializer).read(budgets_qs)
     
     # Sync Categories (tất cả vì là shared)
-    categories_qs = Category.objects.all()
-    categories_serializer = CategorySerializer(categories_qs, many=True)
+    categories_data = list(category_registry.snapshot().data)
     
     return Response({
         'transactions': {
-            'data': transactions_serializer.data,
-            'count': len(transactions_serializer.data),
-            'has_more': len(transactions_serializer.data) == transactions_limit,
+            'data': transactions_data,
+            'count': len(transactions_data),
+            'has_more': len(transactions_data) == transactions_limit,
         },
         'budgets': {
-            'data': budgets_serializer.data,
-            'count': len(budgets_serializer.data),
-            'has_more': len(budgets_serializer.data) == budgets_limit,
+            'data': budgets_data,
+            'count': len(budgets_data),
+            'has_more': len(budgets_data) == budgets_limit,
         },
         'categories': {
-            'data': categories_serializer.data,
-            'count': len(categories_serializer.data),
+            'data': categories_data,
+            'count': len(categories_data),
         },
         'server_time': timezone.now().isoformat(),
         'last_sync': last_sync.isoformat() if last_sync else None,
     })
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard(request):
+    """
+    Dữ liệu dashboard trong một request
+    Widgets lấy từ UserPreferences.dashboard_widgets (hoặc query param widgets=a,b,c)
+    Các phân tích dùng chung một lần quét giao dịch thay vì mỗi endpoint một lần
+    """
+    requested = [w.strip() for w in request.query_params.get('widgets', '').split(',') if w.strip()]
+    preferences = get_preferences(request.user)
+    widgets = DashboardService.resolve_widgets(requested, preferences)
+    return Response(DashboardService.build(request.user, widgets))
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def ai_trends(request):
@@ -1013,7 +1226,7 @@ def chatbot(request):
         query_result = NLPService.parse_query(message)
         transactions = Transaction.objects.filter(
             user=request.user,
-            category__type='expense'  # Chỉ lấy chi tiêu
+            type='expense'  # Chỉ lấy chi tiêu
         )
         
         # Nếu không có time_period trong query, mặc định là tháng này
@@ -1037,7 +1250,7 @@ def chatbot(request):
             )
         
         if query_result['category']:
-            category = Category.objects.filter(name=query_result['category']).first()
+            category = category_registry.get_by_name(query_result['category'])
             if category:
                 transactions = transactions.filter(category=category)
         
@@ -1057,7 +1270,7 @@ def chatbot(request):
         query_result = NLPService.parse_query(message)
         transactions = Transaction.objects.filter(
             user=request.user,
-            category__type='income'
+            type='income'
         )
         
         # Nếu không có time_period trong query, mặc định là tháng này
@@ -1111,10 +1324,10 @@ def chatbot(request):
         else:
             time_info = ""
         
-        total_income = transactions.filter(category__type='income').aggregate(
+        total_income = transactions.filter(type='income').aggregate(
             total=Sum('amount')
         )['total'] or Decimal('0')
-        total_expense = transactions.filter(category__type='expense').aggregate(
+        total_expense = transactions.filter(type='expense').aggregate(
             total=Sum('amount')
         )['total'] or Decimal('0')
         balance = total_income - total_expense
@@ -1192,3 +1405,12 @@ def chatbot(request):
         'response': response,
     })
 
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """
+    Metrics của mọi worker theo định dạng text của Prometheus (chỉ staff)
+    Prometheus scrape bằng token của tài khoản staff: authorization: {type: Token, credentials: ...}
+    """
+    return HttpResponse(app_metrics.registry.render(), content_type=app_metrics.CONTENT_TYPE)
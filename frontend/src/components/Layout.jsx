@@ -53,7 +53,7 @@ function Layout() {
   
   const fetchNotifications = async () => {
     try {
-      const response = await api.get('/notifications/?limit=10')
+      const response = await api.get('/notifications/?limit=10&omit_count=1&fields=id,title,message,is_read,created_at')
       setNotifications(response.data.results || response.data)
     } catch (error) {
       console.error('Error fetching notifications:', error)
@@ -52,6 +52,8 @@ export function AuthProvider({ children }) {
   }
 
   const logout = () => {
+    // Chỉ đăng xuất trên thiết bị này: mỗi user chỉ có một token dùng chung cho mọi thiết bị,
+    // thu hồi trên server (/auth/logout/) sẽ đăng xuất cả các phiên khác
     localStorage.removeItem('token')
     delete api.defaults.headers.common['Authorization']
     setUser(null)
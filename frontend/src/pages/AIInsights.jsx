@@ -30,16 +30,12 @@ function AIInsights() {
 
   const fetchAllInsights = async () => {
     try {
-      const [trendsRes, predictionsRes, anomaliesRes, savingsRes] = await Promise.all([
-        api.get('/ai/trends/'),
-        api.get('/ai/predictions/'),
-        api.get('/ai/anomalies/'),
-        api.get('/ai/savings-suggestions/'),
-      ])
-      setTrends(trendsRes.data)
-      setPredictions(predictionsRes.data)
-      setAnomalies(anomaliesRes.data.anomalies || [])
-      setSavings(savingsRes.data)
+      // Server chạy song song 4 phân tích và trả về trong một response
+      const response = await api.get('/ai/insights/')
+      setTrends(response.data.trends)
+      setPredictions(response.data.predictions)
+      setAnomalies(response.data.anomalies || [])
+      setSavings(response.data.savings)
     } catch (error) {
       console.error('Error fetching insights:', error)
     } finally {
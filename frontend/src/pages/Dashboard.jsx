@@ -18,16 +18,11 @@ function Dashboard() {
 
   const fetchDashboardData = async () => {
     try {
-      const endDate = format(new Date(), 'yyyy-MM-dd')
-      const startDate = format(new Date(Date.now() - 30 * 24 * 60 * 60 * 1000), 'yyyy-MM-dd')
+      // Một request duy nhất cho tất cả widgets của dashboard (theo cài đặt dashboard_widgets của người dùng)
+      const response = await api.get('/dashboard/')
 
-      const [statsRes, transactionsRes] = await Promise.all([
-        api.get(`/transactions/statistics/?start_date=${startDate}&end_date=${endDate}`),
-        api.get('/transactions/?limit=5'),
-      ])
-
-      setStats(statsRes.data)
-      setRecentTransactions(transactionsRes.data.results || transactionsRes.data)
+      setStats(response.data.data)
+      setRecentTransactions(response.data.data.recent_transactions || [])
     } catch (error) {
       console.error('Error fetching dashboard data:', error)
     } finally {
@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,6 +49,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'finance.middleware.MetricsMiddleware',
+    'finance.middleware.ServerTimingMiddleware',
+    'finance.middleware.SlowQueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -53,6 +60,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'finance.middleware.ProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'mysite.urls'
@@ -133,12 +141,17 @@ FRONTEND_DIR = BASE_DIR / 'static' / 'frontend'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'finance.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # JSON renderer dùng orjson nếu có (nhanh hơn nhiều với danh sách lớn)
+    'DEFAULT_RENDERER_CLASSES': [
+        'finance.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 }
@@ -161,6 +174,9 @@ else:
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Cho phép client trên trình duyệt gửi header Idempotency-Key
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+
 # CSRF settings - exempt API endpoints
 CSRF_TRUSTED_ORIGINS = [
     "http://localhost:3000",
@@ -178,3 +194,101 @@ CSRF_COOKIE_SAMESITE = 'Lax'
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Notification retention (dùng cho lệnh purge_notifications)
+NOTIFICATION_RETENTION = {
+    'READ_DAYS': 90,      # Xóa notifications đã đọc sau 90 ngày
+    'UNREAD_DAYS': 365,   # Xóa notifications chưa đọc sau 1 năm (0 = giữ lại)
+    'BATCH_SIZE': 1000,   # Số dòng xóa trong mỗi transaction
+    'ARCHIVE': 'table',   # table | file | none
+}
+
+# OCR: nạp trước model EasyOCR khi khởi động (chỉ bật cho worker chuyên xử lý OCR,
+# bằng biến môi trường OCR_PRELOAD=1; các worker khác không phải import torch/easyocr)
+OCR_PRELOAD = os.environ.get('OCR_PRELOAD') == '1'
+
+# Số luồng tối đa để chạy song song các phân tích AI (/api/ai/insights/),
+# cũng là số kết nối database tối đa mà các phân tích này dùng cùng lúc
+AI_ANALYSIS_WORKERS = 4
+
+# Cache token -> user cho CachedTokenAuthentication
+# LOCAL_*: LRU trong mỗi process (giây), SHARED_TTL: cache dùng chung trong CACHES[CACHE_ALIAS]
+# Tầng dùng chung chỉ bật khi CACHES[CACHE_ALIAS] là cache ngoài process (Redis, Memcached...);
+# với LocMemCache mặc định chỉ có LRU cục bộ, được xóa qua CACHE_INVALIDATION khi thu hồi token
+TOKEN_AUTH_CACHE = {
+    'LOCAL_SIZE': 1024,
+    'LOCAL_TTL': 60,
+    'SHARED_TTL': 300,
+    'CACHE_ALIAS': 'default',
+}
+
+# Thời gian (giây) giữ UserPreferences trong cache dùng chung
+PREFERENCES_CACHE_TIMEOUT = 300
+
+# Bus làm mới cache giữa các process/worker qua Postgres LISTEN/NOTIFY (finance/invalidation_bus.py)
+CACHE_INVALIDATION = {
+    'ENABLED': True,
+    'CHANNEL': 'finance_cache_invalidation',
+}
+
+# Idempotency-Key cho transactions create / nlp_input / ocr_receipt / bulk_sync
+IDEMPOTENCY = {
+    'TTL_HOURS': 24,      # Thời gian giữ response để trả lại khi client gửi lại
+    'LOCK_TIMEOUT': 300,  # Sau thời gian này (giây), request đang xử lý bị coi là bỏ dở
+}
+
+# Đo thời gian request (header Server-Timing + log JSON qua logger finance.timing)
+# SAMPLE_RATE: tỉ lệ request được đo (0..1); ENABLED=False để tắt hoàn toàn
+SERVER_TIMING = {
+    'ENABLED': True,
+    'SAMPLE_RATE': float(os.environ.get('SERVER_TIMING_SAMPLE_RATE', '1.0')),
+    'LOG': True,
+}
+
+# Metrics Prometheus tổng hợp từ mọi worker (/api/metrics/, finance/metrics.py)
+# Mỗi process ghi số liệu ra file trong DIR; xóa thư mục này khi deploy
+METRICS = {
+    'ENABLED': True,
+    'DIR': os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'finance_metrics')),
+    'FLUSH_INTERVAL': 1.0,
+}
+
+# Profiler theo yêu cầu (finance/profiling.py): staff gửi header X-Profile: 1 hoặc ?_profile=1
+# SAMPLE_RATE > 0: profile ngẫu nhiên các request khớp PATHS / USER_IDS; xem kết quả trong admin
+REQUEST_PROFILER = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 0.0,
+    'PATHS': [],
+    'USER_IDS': [],
+}
+
+# Nhật ký câu SQL chậm (finance/slow_queries.py): câu nào lâu hơn THRESHOLD_MS được lưu vào SlowQuery
+# kèm EXPLAIN (ANALYZE, BUFFERS) trên Postgres, xem trong admin
+SLOW_QUERY_LOG = {
+    'ENABLED': True,
+    'THRESHOLD_MS': 200,
+    'EXPLAIN_ANALYZE': True,
+}
+
+# Partition finance_transaction theo transaction_date (finance/partitioning.py, chỉ Postgres, tùy chọn)
+# Bật bằng `manage.py partition_transactions convert`; chạy `partition_transactions create` định kỳ
+# để luôn có PREMAKE partition tương lai, `partition_transactions detach` để tách các kỳ cũ hơn RETENTION
+TRANSACTION_PARTITIONING = {
+    'INTERVAL': 'month',
+    'PREMAKE': 3,
+    'RETENTION': None,
+    'ARCHIVE_SCHEMA': 'finance_archive',
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'finance.timing': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'finance.slow_queries': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+        'finance.profiling': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}